@@ -0,0 +1,150 @@
+"""
+Benchmark for the exam student-status query
+
+Compares the old per-student lookups (two queries per registration) with
+students_status_for_exam (one joined query) on an in-memory SQLite database.
+
+Run from the backend directory:
+
+    python benchmark_students_status.py --sizes 50 300 1000 5000
+
+Importing main creates the backend tables in sinav_guvenlik.db, as
+starting the server does; the benchmark itself never touches that file.
+"""
+import argparse
+import statistics
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+import models
+from main import students_status_for_exam
+
+
+def per_student_status(db, exam_id):
+    """The previous implementation, kept as the baseline"""
+    registrations = db.query(models.ExamRegistration).filter(
+        models.ExamRegistration.exam_id == exam_id
+    ).all()
+
+    students_status = []
+    for reg in registrations:
+        student = reg.student
+        session = db.query(models.ActiveSession).filter(
+            models.ActiveSession.exam_id == exam_id,
+            models.ActiveSession.student_id == student.id
+        ).first()
+
+        stats = None
+        if session:
+            stats = db.query(models.StudentStats).filter(
+                models.StudentStats.session_id == session.id
+            ).first()
+
+        is_active = False
+        last_heartbeat = None
+        if session:
+            last_heartbeat = session.last_heartbeat
+            is_active = (datetime.now() - session.last_heartbeat).total_seconds() < 30 and session.is_active
+
+        students_status.append({
+            "student_id": student.student_id,
+            "student_name": student.full_name,
+            "is_active": is_active,
+            "last_heartbeat": last_heartbeat or datetime.now(),
+            "total_violations": stats.total_violations if stats else 0,
+            "face_violations": stats.face_violations if stats else 0,
+            "eye_violations": stats.eye_violations if stats else 0,
+            "mouth_violations": stats.mouth_violations if stats else 0,
+            "multi_face_violations": stats.multi_face_violations if stats else 0,
+            "object_violations": stats.object_violations if stats else 0,
+            "audio_violations": stats.audio_violations if stats else 0
+        })
+    return students_status
+
+
+def seed(db, registrations, session_ratio):
+    """One exam with ``registrations`` students; ``session_ratio`` of them have a session and stats"""
+    now = datetime.now()
+    teacher = models.Teacher(username="bench", password_hash="x", full_name="Bench", email="bench@example.com")
+    db.add(teacher)
+    db.flush()
+    exam = models.Exam(
+        teacher_id=teacher.id, exam_name="Bench", exam_code="BENCH",
+        start_time=now, end_time=now + timedelta(hours=2), duration_minutes=120
+    )
+    db.add(exam)
+    db.flush()
+
+    for i in range(registrations):
+        student = models.Student(student_id=f"S{i:06d}", full_name=f"Student {i}", email=f"s{i}@example.com")
+        db.add(student)
+        db.flush()
+        db.add(models.ExamRegistration(exam_id=exam.id, student_id=student.id))
+        if i < registrations * session_ratio:
+            session = models.ActiveSession(
+                exam_id=exam.id, student_id=student.id,
+                session_start=now, last_heartbeat=now - timedelta(seconds=i % 60), is_active=True
+            )
+            db.add(session)
+            db.flush()
+            db.add(models.StudentStats(
+                session_id=session.id, exam_id=exam.id, student_id=student.id,
+                total_violations=i % 7, face_violations=i % 3, last_updated=now
+            ))
+    db.commit()
+    return exam.id
+
+
+def measure(engine, db, func, exam_id, repeat):
+    """(queries per call, median ms, results) for ``func(db, exam_id)``"""
+    counter = {"queries": 0}
+
+    def count(*_):
+        counter["queries"] += 1
+
+    event.listen(engine, "before_cursor_execute", count)
+    timings = []
+    try:
+        for _ in range(repeat):
+            db.expire_all()
+            counter["queries"] = 0
+            start = time.perf_counter()
+            results = func(db, exam_id)
+            timings.append((time.perf_counter() - start) * 1000)
+    finally:
+        event.remove(engine, "before_cursor_execute", count)
+    return counter["queries"], statistics.median(timings), results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the exam student-status query")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[50, 300, 1000, 3000])
+    parser.add_argument("--session-ratio", type=float, default=0.8, help="fraction of students with an active session")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'registrations':>13} | {'old queries':>11} {'old ms':>9} | {'new queries':>11} {'new ms':>9} | speedup")
+    for size in args.sizes:
+        engine = create_engine("sqlite://")
+        models.Base.metadata.create_all(bind=engine)
+        db = sessionmaker(bind=engine)()
+        try:
+            exam_id = seed(db, size, args.session_ratio)
+            old_queries, old_ms, old = measure(engine, db, per_student_status, exam_id, args.repeat)
+            new_queries, new_ms, new = measure(engine, db, students_status_for_exam, exam_id, args.repeat)
+        finally:
+            db.close()
+            engine.dispose()
+
+        # Same payload apart from the "now" fallback for students without a session
+        strip = lambda rows: [{k: v for k, v in r.items() if k != "last_heartbeat"} for r in rows]
+        if strip(old) != strip(new):
+            print(f"❌ Results differ for {size} registrations")
+        print(f"{size:>13} | {old_queries:>11} {old_ms:>9.1f} | {new_queries:>11} {new_ms:>9.1f} | {old_ms / new_ms:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,17 @@
 """
 FastAPI Backend Server for Güvenli Sınav Monitoring System
 """
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect, Depends, HTTPException, status
+from fastapi import FastAPI, WebSocket, WebSocketDisconnect, Depends, HTTPException, Query, status
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import bindparam, func, insert, update
 from sqlalchemy.orm import Session
 from datetime import datetime, timedelta
 from typing import List, Optional
 import json
 import asyncio
+import threading
 from pydantic import BaseModel
 
 from database import get_db, engine, Base, SessionLocal
@@ -57,10 +60,70 @@ app.add_middleware(
 )
 
 # مدير الاتصالات WebSocket
+BROADCAST_INTERVAL = 5  # ثوانٍ بين تحديثات حالة الطلاب للمراقبين
+
+class ExamBroadcastState:
+    """
+    آخر لقطة لحالة طلاب اختبار واحد مع رقم إصدار لكل طالب
+    
+    يزداد version عند كل تغيير. كل طالب يحمل رقم الإصدار الذي تغيّر فيه آخر مرة،
+    فيحصل كل مراقب على الطلاب الذين تغيّروا بعد آخر إصدار أكّده (ack) فقط.
+    تغيّر last_heartbeat وحده لا يُعدّ تغييراً؛ is_active يعكس حالة الاتصال.
+    الطلاب المحذوفون يبقون في removed حتى يؤكّد كل المراقبين إصداراً لاحقاً (prune).
+    """
+    
+    def __init__(self):
+        self.version = 0
+        self.rows = {}      # {student_id: row}
+        self.changed = {}   # {student_id: version}
+        self.removed = {}   # {student_id: version}
+    
+    @staticmethod
+    def _state(row):
+        return {k: v for k, v in row.items() if k != "last_heartbeat"}
+    
+    def update(self, rows):
+        """تطبيق لقطة جديدة؛ يعيد True إذا تغيّر شيء"""
+        rows = {row["student_id"]: row for row in jsonable_encoder(rows)}
+        version = self.version + 1
+        changed = False
+        for student_id, row in rows.items():
+            previous = self.rows.get(student_id)
+            if previous is None or self._state(previous) != self._state(row):
+                self.changed[student_id] = version
+                self.removed.pop(student_id, None)
+                changed = True
+        for student_id in set(self.rows) - set(rows):
+            self.changed.pop(student_id, None)
+            self.removed[student_id] = version
+            changed = True
+        self.rows = rows
+        if changed:
+            self.version = version
+        return changed
+    
+    def prune(self, acked):
+        """حذف الطلاب المحذوفين الذين أكّد كل المراقبين إصداراً بعد حذفهم"""
+        for student_id in [sid for sid, v in self.removed.items() if v <= acked]:
+            del self.removed[student_id]
+    
+    def delta(self, since):
+        """رسالة بالطلاب الذين تغيّروا (أو حُذفوا) بعد الإصدار since"""
+        return {
+            "type": "students_snapshot" if since == 0 else "students_delta",
+            "version": self.version,
+            "since": since,
+            "data": [self.rows[sid] for sid, v in self.changed.items() if v > since],
+            "removed": [sid for sid, v in self.removed.items() if v > since] if since else []
+        }
+
 class ConnectionManager:
     def __init__(self):
         self.active_connections: dict = {}  # {exam_id: {student_id: websocket}}
         self.teacher_connections: dict = {}  # {exam_id: [websockets]}
+        self.teacher_versions: dict = {}  # {websocket: آخر إصدار أكّده المراقب}
+        self.exam_states: dict = {}  # {exam_id: ExamBroadcastState}
+        self.broadcasters: dict = {}  # {exam_id: asyncio.Task}
     
     async def connect_student(self, websocket: WebSocket, exam_id: str, student_id: str):
         await websocket.accept()
@@ -73,6 +136,15 @@ class ConnectionManager:
         if exam_id not in self.teacher_connections:
             self.teacher_connections[exam_id] = []
         self.teacher_connections[exam_id].append(websocket)
+        self.teacher_versions[websocket] = 0
+        
+        # مُذيع واحد لكل اختبار، مهما كان عدد المراقبين
+        task = self.broadcasters.get(exam_id)
+        if task is None or task.done():
+            self.broadcasters[exam_id] = asyncio.create_task(self._broadcast_exam(exam_id))
+        elif exam_id in self.exam_states:
+            # لقطة كاملة فورية للمراقب الجديد
+            await self._send_update(websocket, exam_id, self.exam_states[exam_id].delta(0))
     
     def disconnect_student(self, exam_id: str, student_id: str):
         if exam_id in self.active_connections:
@@ -82,6 +154,54 @@ class ConnectionManager:
         if exam_id in self.teacher_connections:
             if websocket in self.teacher_connections[exam_id]:
                 self.teacher_connections[exam_id].remove(websocket)
+        self.teacher_versions.pop(websocket, None)
+    
+    def acknowledge(self, websocket: WebSocket, version: int):
+        """المراقب استلم كل شيء حتى هذا الإصدار"""
+        if websocket in self.teacher_versions:
+            self.teacher_versions[websocket] = max(0, int(version))
+    
+    async def _send_update(self, websocket: WebSocket, exam_id, message: dict):
+        try:
+            await websocket.send_json(message)
+        except Exception:
+            self.disconnect_teacher(websocket, exam_id)
+    
+    async def _broadcast_exam(self, exam_id):
+        """
+        حلقة الإذاعة لاختبار واحد: لقطة واحدة لكل دورة لجميع المراقبين
+        
+        كل دورة تفتح جلسة قاعدة بيانات قصيرة العمر (في خيط منفصل حتى لا توقف
+        حلقة الأحداث) ثم تغلقها، وتتوقف الحلقة عند مغادرة آخر مراقب.
+        """
+        state = self.exam_states.setdefault(exam_id, ExamBroadcastState())
+        try:
+            while self.teacher_connections.get(exam_id):
+                try:
+                    rows = await asyncio.to_thread(_load_students_status, exam_id)
+                    state.update(rows)
+                except Exception as e:
+                    print(f"Error loading students status for exam {exam_id}: {e}")
+                
+                # المراقب الذي لم يؤكّد شيئاً بعد يستلم لقطة كاملة لا تحتاج removed
+                teachers = self.teacher_connections.get(exam_id, [])
+                if teachers:
+                    state.prune(min(self.teacher_versions.get(ws, 0) or state.version for ws in teachers))
+                
+                # المراقبون الذين أكّدوا نفس الإصدار يتشاركون الرسالة نفسها
+                messages = {}
+                for websocket in list(self.teacher_connections.get(exam_id, [])):
+                    since = self.teacher_versions.get(websocket, 0)
+                    if since >= state.version and since > 0:
+                        continue
+                    if since not in messages:
+                        messages[since] = state.delta(since)
+                    await self._send_update(websocket, exam_id, messages[since])
+                
+                await asyncio.sleep(BROADCAST_INTERVAL)
+        finally:
+            self.broadcasters.pop(exam_id, None)
+            self.exam_states.pop(exam_id, None)
     
     async def broadcast_to_teachers(self, exam_id: str, message: dict):
         """إرسال رسالة لجميع المراقبين المتصلين بالاختبار"""
@@ -94,6 +214,120 @@ class ConnectionManager:
 
 manager = ConnectionManager()
 
+# ==================== Heartbeat Write-Behind ====================
+
+HEARTBEAT_FLUSH_INTERVAL = 2  # ثوانٍ بين دفعات كتابة النبضات
+HEARTBEAT_SESSION_TTL = 300  # ثوانٍ بلا نبضات قبل حذف الجلسة من الذاكرة
+
+class HeartbeatBuffer:
+    """
+    جدول "آخر ظهور" في الذاكرة للنبضات، يُكتب إلى ActiveSession على دفعات
+    
+    - session_for/remember: ذاكرة (رقم الطالب، رمز الاختبار) -> session id، فلا تحتاج
+      النبضة المعتادة أي استعلام. تُحذف منها عند flush الجلسات التي لم تصل منها نبضة
+      منذ session_ttl ثانية (انتهى الاختبار أو غادر الطالب)، فلا تنمو بلا حد
+    - record: يحتفظ بآخر نبضة لكل جلسة فقط
+    - flush: يكتب كل الجلسات المعلقة في transaction واحدة (executemany)
+    
+    دلالات الأعطال: عند توقف الخادم فجأة تضيع النبضات التي لم تُكتب بعد، أي آخر
+    HEARTBEAT_FLUSH_INTERVAL ثانية على الأكثر. لا يُفقد أي شيء آخر، لأن إنشاء الجلسات
+    والانتهاكات يبقى متزامناً. النبضة التالية من العميل (كل 5 ثوانٍ) تصحح
+    last_heartbeat، ونافذة النشاط 30 ثانية أطول بكثير من التأخير. عند فشل الكتابة
+    تعود الدفعة إلى الذاكرة ويُعاد المحاولة، وعند الإيقاف المنظم (shutdown) يُكتب
+    ما تبقى.
+    """
+    
+    def __init__(self, interval: float = HEARTBEAT_FLUSH_INTERVAL, session_ttl: float = HEARTBEAT_SESSION_TTL):
+        self.interval = interval
+        self.session_ttl = session_ttl
+        self.sessions = {}  # {(student_id, exam_code): (session id, آخر نبضة)}
+        self.pending = {}   # {session id: (last_heartbeat, is_active)}
+        self.lock = threading.Lock()
+        self.task = None
+    
+    def session_for(self, student_id: str, exam_code: str):
+        key = (student_id, exam_code)
+        with self.lock:
+            entry = self.sessions.get(key)
+            if entry is None:
+                return None
+            self.sessions[key] = (entry[0], datetime.now())
+            return entry[0]
+    
+    def remember(self, student_id: str, exam_code: str, session_id: int):
+        with self.lock:
+            self.sessions[(student_id, exam_code)] = (session_id, datetime.now())
+    
+    def forget_student(self, student_id: str):
+        """بعد حذف طالب: النبضة التالية تمر عبر المسار المتزامن"""
+        with self.lock:
+            for key in [k for k in self.sessions if k[0] == student_id]:
+                self.sessions.pop(key, None)
+    
+    def _prune(self):
+        """حذف الجلسات التي انقطعت نبضاتها (المستدعي يمسك القفل)"""
+        cutoff = datetime.now() - timedelta(seconds=self.session_ttl)
+        for key in [k for k, (_, seen) in self.sessions.items() if seen < cutoff]:
+            del self.sessions[key]
+    
+    def record(self, session_id: int, is_active: bool):
+        with self.lock:
+            self.pending[session_id] = (datetime.now(), is_active)
+    
+    def flush(self):
+        """كتابة كل النبضات المعلقة؛ يعيد عدد الجلسات المحدَّثة"""
+        with self.lock:
+            batch, self.pending = self.pending, {}
+            self._prune()
+        if not batch:
+            return 0
+        
+        db = SessionLocal()
+        try:
+            db.execute(
+                update(models.ActiveSession.__table__)
+                .where(models.ActiveSession.__table__.c.id == bindparam("session_id"))
+                .values(last_heartbeat=bindparam("heartbeat"), is_active=bindparam("active")),
+                [
+                    {"session_id": session_id, "heartbeat": heartbeat, "active": active}
+                    for session_id, (heartbeat, active) in batch.items()
+                ]
+            )
+            db.commit()
+        except Exception:
+            db.rollback()
+            # إعادة الدفعة دون الكتابة فوق نبضات أحدث وصلت أثناء المحاولة
+            with self.lock:
+                for session_id, value in batch.items():
+                    self.pending.setdefault(session_id, value)
+            raise
+        finally:
+            db.close()
+        return len(batch)
+    
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await asyncio.to_thread(self.flush)
+            except Exception as e:
+                print(f"Error flushing heartbeats: {e}")
+    
+    def start(self):
+        if self.task is None or self.task.done():
+            self.task = asyncio.create_task(self._run())
+    
+    async def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            self.task = None
+        try:
+            await asyncio.to_thread(self.flush)
+        except Exception as e:
+            print(f"Error flushing heartbeats on shutdown: {e}")
+
+heartbeats = HeartbeatBuffer()
+
 # ==================== Pydantic Models ====================
 
 class ViolationCreate(BaseModel):
@@ -411,6 +645,7 @@ async def delete_student(student_id: str, db: Session = Depends(get_db)):
     # حذف الطالب
     db.delete(student)
     db.commit()
+    heartbeats.forget_student(student_id)
     
     return {
         "message": f"تم حذف الطالب {student_id} بنجاح"
@@ -444,116 +679,162 @@ async def get_all_students(db: Session = Depends(get_db)):
     
     return students_list
 
-@app.get("/api/dashboard/stats")
-async def get_dashboard_stats(db: Session = Depends(get_db)):
-    """الحصول على إحصائيات النظام الكاملة"""
-    # عدد الأساتذة
-    teachers_count = db.query(models.Teacher).count()
-    teachers = db.query(models.Teacher).all()
+DASHBOARD_SECTIONS = ("summary", "teachers", "exams", "registrations", "active_sessions", "violations")
+
+
+def _iso(value):
+    return value.isoformat() if value else None
+
+
+def _dashboard_summary(db: Session):
+    """كل العدادات في استعلام واحد"""
+    row = db.query(
+        db.query(func.count(models.Teacher.id)).scalar_subquery(),
+        db.query(func.count(models.Exam.id)).scalar_subquery(),
+        db.query(func.count(models.Student.id)).scalar_subquery(),
+        db.query(func.count(models.ExamRegistration.id)).scalar_subquery(),
+        db.query(func.count(models.ActiveSession.id)).filter(models.ActiveSession.is_active == True).scalar_subquery(),
+        db.query(func.count(models.Violation.id)).scalar_subquery(),
+    ).one()
+    return {
+        "teachers_count": row[0],
+        "exams_count": row[1],
+        "students_count": row[2],
+        "registrations_count": row[3],
+        "active_sessions_count": row[4],
+        "violations_count": row[5]
+    }
+
+
+def _dashboard_page(query, id_column, cursor, limit):
+    """صفحة واحدة مرتبة من الأحدث (id تنازلياً)؛ next_cursor هو آخر id في الصفحة"""
+    if cursor is not None:
+        query = query.filter(id_column < cursor)
+    rows = query.order_by(id_column.desc()).limit(limit + 1).all()
+    next_cursor = rows[limit - 1][0] if len(rows) > limit else None
+    return rows[:limit], next_cursor
+
+
+def _dashboard_section(db: Session, section, cursor, limit):
+    """قائمة قسم واحد مع المؤشر التالي، بجدول مدمج (join) بدلاً من استعلام لكل صف"""
+    if section == "teachers":
+        rows, next_cursor = _dashboard_page(
+            db.query(models.Teacher.id, models.Teacher.username, models.Teacher.full_name, models.Teacher.email),
+            models.Teacher.id, cursor, limit
+        )
+        return [{
+            "id": r.id,
+            "username": r.username,
+            "full_name": r.full_name,
+            "email": r.email
+        } for r in rows], next_cursor
     
-    # عدد الاختبارات
-    exams_count = db.query(models.Exam).count()
-    exams = db.query(models.Exam).all()
+    if section == "exams":
+        rows, next_cursor = _dashboard_page(
+            db.query(models.Exam.id, models.Exam.exam_name, models.Exam.exam_code, models.Exam.duration_minutes,
+                     models.Exam.status, models.Exam.start_time, models.Exam.end_time),
+            models.Exam.id, cursor, limit
+        )
+        return [{
+            "id": r.id,
+            "exam_name": r.exam_name,
+            "exam_code": r.exam_code,
+            "duration_minutes": r.duration_minutes,
+            "status": r.status,
+            "start_time": _iso(r.start_time),
+            "end_time": _iso(r.end_time)
+        } for r in rows], next_cursor
     
-    # عدد الطلاب
-    students_count = db.query(models.Student).count()
+    if section == "registrations":
+        rows, next_cursor = _dashboard_page(
+            db.query(models.ExamRegistration.id, models.Student.student_id, models.Student.full_name,
+                     models.Exam.exam_code, models.Exam.exam_name, models.ExamRegistration.status,
+                     models.ExamRegistration.registered_at)
+            .join(models.Student, models.Student.id == models.ExamRegistration.student_id)
+            .join(models.Exam, models.Exam.id == models.ExamRegistration.exam_id),
+            models.ExamRegistration.id, cursor, limit
+        )
+        return [{
+            "student_id": r.student_id,
+            "student_name": r.full_name,
+            "exam_code": r.exam_code,
+            "exam_name": r.exam_name,
+            "status": r.status,
+            "registered_at": _iso(r.registered_at)
+        } for r in rows], next_cursor
     
-    # عدد التسجيلات
-    registrations_count = db.query(models.ExamRegistration).count()
-    registrations = db.query(models.ExamRegistration).all()
+    if section == "active_sessions":
+        rows, next_cursor = _dashboard_page(
+            db.query(models.ActiveSession.id, models.Student.student_id, models.Student.full_name,
+                     models.Exam.exam_code, models.Exam.exam_name, models.ActiveSession.session_start,
+                     models.ActiveSession.last_heartbeat)
+            .join(models.Student, models.Student.id == models.ActiveSession.student_id)
+            .join(models.Exam, models.Exam.id == models.ActiveSession.exam_id)
+            .filter(models.ActiveSession.is_active == True),
+            models.ActiveSession.id, cursor, limit
+        )
+        return [{
+            "student_id": r.student_id,
+            "student_name": r.full_name,
+            "exam_code": r.exam_code,
+            "exam_name": r.exam_name,
+            "started_at": _iso(r.session_start),
+            "last_heartbeat": _iso(r.last_heartbeat)
+        } for r in rows], next_cursor
     
-    # عدد الجلسات النشطة
-    active_sessions_count = db.query(models.ActiveSession).filter(
-        models.ActiveSession.is_active == True
-    ).count()
-    active_sessions = db.query(models.ActiveSession).filter(
-        models.ActiveSession.is_active == True
-    ).all()
-    
-    # عدد الانتهاكات
-    violations_count = db.query(models.Violation).count()
-    violations = db.query(models.Violation).all()
-    
-    # تفاصيل الأساتذة
-    teachers_list = [{
-        "id": t.id,
-        "username": t.username,
-        "full_name": t.full_name,
-        "email": t.email
-    } for t in teachers]
-    
-    # تفاصيل الاختبارات
-    exams_list = [{
-        "id": e.id,
-        "exam_name": e.exam_name,
-        "exam_code": e.exam_code,
-        "duration_minutes": e.duration_minutes,
-        "status": e.status,
-        "start_time": e.start_time.isoformat() if e.start_time else None,
-        "end_time": e.end_time.isoformat() if e.end_time else None
-    } for e in exams]
-    
-    # تفاصيل التسجيلات
-    registrations_list = []
-    for reg in registrations:
-        student = db.query(models.Student).filter(models.Student.id == reg.student_id).first()
-        exam = db.query(models.Exam).filter(models.Exam.id == reg.exam_id).first()
-        if student and exam:
-            registrations_list.append({
-                "student_id": student.student_id,
-                "student_name": student.full_name,
-                "exam_code": exam.exam_code,
-                "exam_name": exam.exam_name,
-                "status": reg.status,
-                "registered_at": reg.registered_at.isoformat() if reg.registered_at else None
-            })
-    
-    # تفاصيل الجلسات النشطة
-    sessions_list = []
-    for session in active_sessions:
-        student = db.query(models.Student).filter(models.Student.id == session.student_id).first()
-        exam = db.query(models.Exam).filter(models.Exam.id == session.exam_id).first()
-        if student and exam:
-            sessions_list.append({
-                "student_id": student.student_id,
-                "student_name": student.full_name,
-                "exam_code": exam.exam_code,
-                "exam_name": exam.exam_name,
-                "started_at": session.started_at.isoformat() if session.started_at else None,
-                "last_heartbeat": session.last_heartbeat.isoformat() if session.last_heartbeat else None
-            })
-    
-    # تفاصيل الانتهاكات
-    violations_list = []
-    for violation in violations:
-        student = db.query(models.Student).filter(models.Student.id == violation.student_id).first()
-        exam = db.query(models.Exam).filter(models.Exam.id == violation.exam_id).first()
-        if student and exam:
-            violations_list.append({
-                "student_id": student.student_id,
-                "student_name": student.full_name,
-                "exam_code": exam.exam_code,
-                "violation_type": violation.violation_type,
-                "severity": violation.severity,
-                "description": violation.description,
-                "detected_at": violation.detected_at.isoformat() if violation.detected_at else None
-            })
+    rows, next_cursor = _dashboard_page(
+        db.query(models.Violation.id, models.Student.student_id, models.Student.full_name,
+                 models.Exam.exam_code, models.Violation.violation_type, models.Violation.severity,
+                 models.Violation.description, models.Violation.timestamp)
+        .join(models.Student, models.Student.id == models.Violation.student_id)
+        .join(models.Exam, models.Exam.id == models.Violation.exam_id),
+        models.Violation.id, cursor, limit
+    )
+    return [{
+        "student_id": r.student_id,
+        "student_name": r.full_name,
+        "exam_code": r.exam_code,
+        "violation_type": r.violation_type,
+        "severity": r.severity,
+        "description": r.description,
+        "detected_at": _iso(r.timestamp)
+    } for r in rows], next_cursor
+
+
+@app.get("/api/dashboard/stats")
+async def get_dashboard_stats(
+    sections: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=500),
+    cursor: Optional[int] = None,
+    db: Session = Depends(get_db)
+):
+    """
+    إحصائيات النظام
     
-    return {
-        "summary": {
-            "teachers_count": teachers_count,
-            "exams_count": exams_count,
-            "students_count": students_count,
-            "registrations_count": registrations_count,
-            "active_sessions_count": active_sessions_count,
-            "violations_count": violations_count
-        },
-        "teachers": teachers_list,
-        "exams": exams_list,
-        "registrations": registrations_list,
-        "active_sessions": sessions_list,
-        "violations": violations_list
-    }
+    - sections: أقسام مفصولة بفواصل (summary,teachers,exams,registrations,active_sessions,violations)؛ الافتراضي الكل
+    - sections=summary: العدادات فقط (المسار السريع)
+    - limit: عدد الصفوف في كل قسم، من الأحدث
+    - cursor: قيمة next_cursor من الصفحة السابقة؛ يتطلب قسم قائمة واحداً (وإلا 400)
+    """
+    requested = [s.strip() for s in sections.split(",") if s.strip()] if sections else list(DASHBOARD_SECTIONS)
+    unknown = [s for s in requested if s not in DASHBOARD_SECTIONS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"أقسام غير معروفة: {', '.join(unknown)}")
+    list_sections = [s for s in requested if s != "summary"]
+    if cursor is not None and len(list_sections) > 1:
+        # كل قسم له مؤشره الخاص، فلا يصح تطبيق مؤشر واحد على عدة أقسام
+        raise HTTPException(status_code=400, detail="cursor يُستخدم مع قسم قائمة واحد فقط")
+    
+    result = {}
+    if "summary" in requested:
+        result["summary"] = _dashboard_summary(db)
+    
+    next_cursors = {}
+    for section in list_sections:
+        result[section], next_cursors[section] = _dashboard_section(db, section, cursor, limit)
+    if next_cursors:
+        result["next_cursors"] = next_cursors
+    return result
 
 @app.get("/api/exams/{exam_code}/verify-student/{student_id}")
 async def verify_student_registration(exam_code: str, student_id: str, db: Session = Depends(get_db)):
@@ -585,6 +866,38 @@ async def verify_student_registration(exam_code: str, student_id: str, db: Sessi
     else:
         return {"registered": False, "message": "الطالب غير مسجل في هذا الاختبار"}
 
+@app.get("/api/exams/{exam_code}/registered-students")
+async def get_registered_students(exam_code: str, db: Session = Depends(get_db)):
+    """الطلاب المسجلون في الاختبار (تستخدمه معارض التعرف على الوجوه لكل اختبار)"""
+    exam = db.query(models.Exam).filter(models.Exam.exam_code == exam_code.strip().upper()).first()
+    if not exam:
+        raise HTTPException(status_code=404, detail="الاختبار غير موجود")
+    
+    rows = db.query(models.Student.student_id, models.Student.full_name, models.Student.email).join(
+        models.ExamRegistration, models.ExamRegistration.student_id == models.Student.id
+    ).filter(models.ExamRegistration.exam_id == exam.id).all()
+    
+    return [{"id": sid, "name": name, "email": email} for sid, name, email in rows]
+
+def violation_stats_column(violation_type: str):
+    """عمود العداد في StudentStats لنوع الانتهاك (بالإضافة إلى total_violations)، أو None"""
+    if 'face' in violation_type:
+        return "face_violations"
+    if 'eye' in violation_type or 'looking' in violation_type:
+        return "eye_violations"
+    if 'mouth' in violation_type:
+        return "mouth_violations"
+    if 'multiple' in violation_type:
+        return "multi_face_violations"
+    if 'phone' in violation_type or 'book' in violation_type or 'person' in violation_type:
+        return "object_violations"
+    if 'audio' in violation_type:
+        return "audio_violations"
+    return None
+
+STATS_COUNTERS = ("face_violations", "eye_violations", "mouth_violations",
+                  "multi_face_violations", "object_violations", "audio_violations")
+
 @app.post("/api/violations")
 async def create_violation(violation: ViolationCreate, db: Session = Depends(get_db)):
     """تسجيل انتهاك جديد"""
@@ -622,18 +935,9 @@ async def create_violation(violation: ViolationCreate, db: Session = Depends(get
     stats = db.query(models.StudentStats).filter(models.StudentStats.session_id == session.id).first()
     if stats:
         stats.total_violations += 1
-        if 'face' in violation.violation_type:
-            stats.face_violations += 1
-        elif 'eye' in violation.violation_type or 'looking' in violation.violation_type:
-            stats.eye_violations += 1
-        elif 'mouth' in violation.violation_type:
-            stats.mouth_violations += 1
-        elif 'multiple' in violation.violation_type:
-            stats.multi_face_violations += 1
-        elif 'phone' in violation.violation_type or 'book' in violation.violation_type or 'person' in violation.violation_type:
-            stats.object_violations += 1
-        elif 'audio' in violation.violation_type:
-            stats.audio_violations += 1
+        column = violation_stats_column(violation.violation_type)
+        if column:
+            setattr(stats, column, getattr(stats, column) + 1)
         stats.last_updated = datetime.now()
     
     db.commit()
@@ -650,9 +954,144 @@ async def create_violation(violation: ViolationCreate, db: Session = Depends(get
     
     return {"status": "success", "violation_id": new_violation.id}
 
+MAX_VIOLATION_BATCH = 500
+
+@app.post("/api/violations/batch")
+async def create_violations_batch(violations: List[ViolationCreate], db: Session = Depends(get_db)):
+    """
+    تسجيل دفعة من الانتهاكات (قد تخص عدة طلاب واختبارات)
+    
+    المفاتيح تُحل باستعلام واحد لكل جدول، والانتهاكات تُدرج بعبارة واحدة (executemany مع
+    RETURNING؛ على MySQL الذي لا يدعم RETURNING تُدرج صفاً صفاً في نفس الـ transaction)،
+    وعدادات StudentStats تُحدَّث بزيادات SQL مجمّعة لكل جلسة، ثم تُرسل رسالة
+    WebSocket واحدة لكل اختبار. النتيجة لكل عنصر بنفس ترتيب الطلب.
+    """
+    if len(violations) > MAX_VIOLATION_BATCH:
+        raise HTTPException(status_code=400, detail=f"الحد الأقصى {MAX_VIOLATION_BATCH} انتهاك في الدفعة")
+    if not violations:
+        return {"status": "success", "results": []}
+    
+    # حل المفاتيح دفعة واحدة
+    students = {
+        s.student_id: s for s in db.query(models.Student.id, models.Student.student_id, models.Student.full_name)
+        .filter(models.Student.student_id.in_({v.student_id for v in violations})).all()
+    }
+    exams = {
+        e.exam_code: e for e in db.query(models.Exam.id, models.Exam.exam_code)
+        .filter(models.Exam.exam_code.in_({v.exam_code for v in violations})).all()
+    }
+    sessions = {}
+    if students and exams:
+        for row in db.query(
+            models.ActiveSession.exam_id, models.ActiveSession.student_id, func.min(models.ActiveSession.id)
+        ).filter(
+            models.ActiveSession.exam_id.in_({e.id for e in exams.values()}),
+            models.ActiveSession.student_id.in_({s.id for s in students.values()}),
+            models.ActiveSession.is_active == True
+        ).group_by(models.ActiveSession.exam_id, models.ActiveSession.student_id).all():
+            sessions[(row[0], row[1])] = row[2]
+    
+    now = datetime.now()
+    results = [None] * len(violations)
+    rows, accepted = [], []
+    for index, violation in enumerate(violations):
+        student = students.get(violation.student_id)
+        exam = exams.get(violation.exam_code)
+        if not student or not exam:
+            results[index] = {"index": index, "status": "error", "detail": "الطالب أو الاختبار غير موجود"}
+            continue
+        session_id = sessions.get((exam.id, student.id))
+        if session_id is None:
+            results[index] = {"index": index, "status": "error", "detail": "لا توجد جلسة نشطة"}
+            continue
+        rows.append({
+            "session_id": session_id,
+            "exam_id": exam.id,
+            "student_id": student.id,
+            "violation_type": violation.violation_type,
+            "severity": violation.severity,
+            "description": violation.description,
+            "confidence_score": violation.confidence_score,
+            "timestamp": now
+        })
+        accepted.append((index, violation, student, exam, session_id))
+    
+    if rows:
+        if db.bind.dialect.insert_returning:
+            violation_ids = db.scalars(
+                insert(models.Violation).returning(models.Violation.id, sort_by_parameter_order=True),
+                rows
+            ).all()
+        else:
+            # MySQL (USE_SQLITE=false) has no INSERT ... RETURNING: insert row by row
+            # in the same transaction to get each id
+            violation_ids = [
+                db.execute(insert(models.Violation.__table__).values(**row)).inserted_primary_key[0]
+                for row in rows
+            ]
+        
+        # زيادات مجمّعة: صف واحد من المعاملات لكل جلسة
+        increments = {}
+        for _, violation, _, _, session_id in accepted:
+            counts = increments.setdefault(session_id, dict.fromkeys(("total_violations",) + STATS_COUNTERS, 0))
+            counts["total_violations"] += 1
+            column = violation_stats_column(violation.violation_type)
+            if column:
+                counts[column] += 1
+        stats_table = models.StudentStats.__table__
+        db.execute(
+            update(stats_table)
+            .where(stats_table.c.session_id == bindparam("stats_session_id"))
+            .values(
+                last_updated=bindparam("updated_at"),
+                **{column: stats_table.c[column] + bindparam(f"inc_{column}") for column in ("total_violations",) + STATS_COUNTERS}
+            ),
+            [
+                {"stats_session_id": session_id, "updated_at": now, **{f"inc_{k}": v for k, v in counts.items()}}
+                for session_id, counts in increments.items()
+            ]
+        )
+        db.commit()
+        
+        for (index, *_), violation_id in zip(accepted, violation_ids):
+            results[index] = {"index": index, "status": "success", "violation_id": violation_id}
+    
+    # رسالة مجمّعة واحدة لكل اختبار
+    by_exam = {}
+    for _, violation, student, exam, _ in accepted:
+        by_exam.setdefault(exam.id, []).append({
+            "student_id": student.student_id,
+            "student_name": student.full_name,
+            "violation_type": violation.violation_type,
+            "severity": violation.severity,
+            "timestamp": now.isoformat()
+        })
+    for exam_id, items in by_exam.items():
+        await manager.broadcast_to_teachers(exam_id, {
+            "type": "violations_batch",
+            "count": len(items),
+            "violations": items
+        })
+    
+    failed = sum(1 for r in results if r["status"] != "success")
+    return {
+        "status": "success" if failed == 0 else ("error" if failed == len(results) else "partial"),
+        "results": results
+    }
+
 @app.post("/api/heartbeat")
 async def heartbeat(data: HeartbeatData, db: Session = Depends(get_db)):
-    """تحديث نبضات القلب للطالب"""
+    """
+    تحديث نبضات القلب للطالب
+    
+    إنشاء الجلسة يبقى متزامناً (commit فوري). بعد ذلك تُسجَّل النبضات في الذاكرة
+    فقط وتُكتب على دفعات بواسطة heartbeats.
+    """
+    session_id = heartbeats.session_for(data.student_id, data.exam_code)
+    if session_id is not None:
+        heartbeats.record(session_id, data.is_active)
+        return {"status": "success"}
+    
     student = db.query(models.Student).filter(models.Student.student_id == data.student_id).first()
     exam = db.query(models.Exam).filter(models.Exam.exam_code == data.exam_code).first()
     
@@ -685,87 +1124,143 @@ async def heartbeat(data: HeartbeatData, db: Session = Depends(get_db)):
             last_updated=datetime.now()
         )
         db.add(stats)
+        db.commit()
     else:
-        session.last_heartbeat = datetime.now()
-        session.is_active = data.is_active
-    
-    db.commit()
+        # جلسة موجودة (مثلاً بعد إعادة تشغيل الخادم): النبضة تمر عبر المخزن المؤقت
+        heartbeats.record(session.id, data.is_active)
     
+    heartbeats.remember(data.student_id, data.exam_code, session.id)
     return {"status": "success"}
 
-@app.get("/api/exams/{exam_code}/students", response_model=List[StudentStatus])
-async def get_students_status(exam_code: str, db: Session = Depends(get_db)):
-    """الحصول على حالة جميع الطلاب في الاختبار"""
-    exam = db.query(models.Exam).filter(models.Exam.exam_code == exam_code).first()
-    if not exam:
-        raise HTTPException(status_code=404, detail="الاختبار غير موجود")
+@app.on_event("startup")
+async def start_heartbeat_flusher():
+    heartbeats.start()
+
+@app.on_event("shutdown")
+async def stop_heartbeat_flusher():
+    await heartbeats.stop()
+
+def students_status_for_exam(db: Session, exam_id: int):
+    """
+    حالة جميع الطلاب المسجلين في الاختبار باستعلام واحد
     
-    # جلب جميع الطلاب المسجلين
-    registrations = db.query(models.ExamRegistration).filter(
-        models.ExamRegistration.exam_id == exam.id
-    ).all()
+    التسجيلات مع outer join على أول جلسة للطالب في الاختبار وأول إحصائيات لتلك الجلسة
+    (أصغر id، كما كان .first() يفعل)، بدلاً من استعلامين لكل طالب.
+    """
+    first_session = db.query(
+        models.ActiveSession.student_id.label("student_id"),
+        func.min(models.ActiveSession.id).label("session_id")
+    ).filter(models.ActiveSession.exam_id == exam_id).group_by(models.ActiveSession.student_id).subquery()
+    
+    first_stats = db.query(
+        models.StudentStats.session_id.label("session_id"),
+        func.min(models.StudentStats.id).label("stats_id")
+    ).join(
+        first_session, first_session.c.session_id == models.StudentStats.session_id
+    ).group_by(models.StudentStats.session_id).subquery()
     
+    rows = db.query(
+        models.Student.student_id,
+        models.Student.full_name,
+        models.ActiveSession.is_active,
+        models.ActiveSession.last_heartbeat,
+        models.StudentStats.total_violations,
+        models.StudentStats.face_violations,
+        models.StudentStats.eye_violations,
+        models.StudentStats.mouth_violations,
+        models.StudentStats.multi_face_violations,
+        models.StudentStats.object_violations,
+        models.StudentStats.audio_violations
+    ).select_from(models.ExamRegistration).join(
+        models.Student, models.Student.id == models.ExamRegistration.student_id
+    ).outerjoin(
+        first_session, first_session.c.student_id == models.Student.id
+    ).outerjoin(
+        models.ActiveSession, models.ActiveSession.id == first_session.c.session_id
+    ).outerjoin(
+        first_stats, first_stats.c.session_id == models.ActiveSession.id
+    ).outerjoin(
+        models.StudentStats, models.StudentStats.id == first_stats.c.stats_id
+    ).filter(
+        models.ExamRegistration.exam_id == exam_id
+    ).order_by(models.ExamRegistration.id).all()
+    
+    now = datetime.now()
     students_status = []
-    for reg in registrations:
-        student = reg.student
-        session = db.query(models.ActiveSession).filter(
-            models.ActiveSession.exam_id == exam.id,
-            models.ActiveSession.student_id == student.id
-        ).first()
-        
-        stats = None
-        if session:
-            stats = db.query(models.StudentStats).filter(
-                models.StudentStats.session_id == session.id
-            ).first()
-        
+    for r in rows:
         # التحقق من النشاط (آخر نبضة قلب خلال 30 ثانية)
         is_active = False
-        last_heartbeat = None
-        if session:
-            last_heartbeat = session.last_heartbeat
-            time_diff = datetime.now() - session.last_heartbeat
-            is_active = time_diff.total_seconds() < 30 and session.is_active
+        if r.last_heartbeat:
+            is_active = (now - r.last_heartbeat).total_seconds() < 30 and bool(r.is_active)
         
         students_status.append({
-            "student_id": student.student_id,
-            "student_name": student.full_name,
+            "student_id": r.student_id,
+            "student_name": r.full_name,
             "is_active": is_active,
-            "last_heartbeat": last_heartbeat or datetime.now(),
-            "total_violations": stats.total_violations if stats else 0,
-            "face_violations": stats.face_violations if stats else 0,
-            "eye_violations": stats.eye_violations if stats else 0,
-            "mouth_violations": stats.mouth_violations if stats else 0,
-            "multi_face_violations": stats.multi_face_violations if stats else 0,
-            "object_violations": stats.object_violations if stats else 0,
-            "audio_violations": stats.audio_violations if stats else 0
+            "last_heartbeat": r.last_heartbeat or now,
+            "total_violations": r.total_violations or 0,
+            "face_violations": r.face_violations or 0,
+            "eye_violations": r.eye_violations or 0,
+            "mouth_violations": r.mouth_violations or 0,
+            "multi_face_violations": r.multi_face_violations or 0,
+            "object_violations": r.object_violations or 0,
+            "audio_violations": r.audio_violations or 0
         })
     
     return students_status
 
-# ==================== WebSocket Endpoints ====================
+def _load_students_status(exam_id: int):
+    """حالة الطلاب بجلسة قاعدة بيانات قصيرة العمر (يستخدمها مُذيع المراقبين)"""
+    db = SessionLocal()
+    try:
+        return students_status_for_exam(db, exam_id)
+    finally:
+        db.close()
 
-@app.websocket("/ws/teacher/{exam_code}")
-async def teacher_websocket(websocket: WebSocket, exam_code: str, db: Session = Depends(get_db)):
-    """WebSocket للمراقب لاستقبال التحديثات الفورية"""
+@app.get("/api/exams/{exam_code}/students", response_model=List[StudentStatus])
+async def get_students_status(exam_code: str, db: Session = Depends(get_db)):
+    """الحصول على حالة جميع الطلاب في الاختبار"""
     exam = db.query(models.Exam).filter(models.Exam.exam_code == exam_code).first()
     if not exam:
+        raise HTTPException(status_code=404, detail="الاختبار غير موجود")
+    
+    return students_status_for_exam(db, exam.id)
+
+# ==================== WebSocket Endpoints ====================
+
+@app.websocket("/ws/teacher/{exam_code}")
+async def teacher_websocket(websocket: WebSocket, exam_code: str):
+    """
+    WebSocket للمراقب لاستقبال التحديثات الفورية
+    
+    يستقبل المراقب students_snapshot ثم students_delta بالطلاب المتغيرين فقط،
+    ويرسل {"type": "ack", "version": N} بعد تطبيق كل رسالة،
+    أو {"type": "resync"} لطلب لقطة كاملة.
+    """
+    db = SessionLocal()
+    try:
+        exam = db.query(models.Exam).filter(models.Exam.exam_code == exam_code).first()
+        exam_id = exam.id if exam else None
+    finally:
+        db.close()
+    
+    if exam_id is None:
         await websocket.close(code=1008)
         return
     
-    await manager.connect_teacher(websocket, exam.id)
+    await manager.connect_teacher(websocket, exam_id)
     
     try:
         while True:
-            # إرسال تحديثات دورية كل 5 ثواني
-            await asyncio.sleep(5)
-            students_status = await get_students_status(exam_code, db)
-            await websocket.send_json({
-                "type": "students_update",
-                "data": [s.dict() for s in students_status]
-            })
+            message = await websocket.receive_json()
+            if message.get("type") == "ack":
+                manager.acknowledge(websocket, message.get("version", 0))
+            elif message.get("type") == "resync":
+                manager.acknowledge(websocket, 0)
     except WebSocketDisconnect:
-        manager.disconnect_teacher(websocket, exam.id)
+        manager.disconnect_teacher(websocket, exam_id)
+    except Exception:
+        manager.disconnect_teacher(websocket, exam_id)
 
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,252 @@
+"""
+Bulk enrollment of student photos
+
+Run this script from the project root (Güvenli Sınav Denetim Sistemi):
+
+    python bulk_enroll.py photos/                 # files named <student_id>[_<name>].jpg
+    python bulk_enroll.py class.csv --workers 8   # CSV columns: id,name,photo[,email]
+
+Face detection and encoding run in a process pool. Photos already in the
+encoding cache are not re-encoded. Quality problems (unreadable image, no
+face, several faces, face too small) are reported per photo, and those
+photos are not enrolled. Enrolled students are written to:
+
+- config/students.yaml (merged by id, replaced atomically)
+- the backend database (one transaction)
+- the Reflex students.db with its face_encoding BLOB, if --reflex-db is given
+- the encoding cache
+"""
+import argparse
+import csv
+import os
+import sqlite3
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import yaml
+
+from src.utils.encoding_cache import EncodingCache, file_hash
+
+CFG_PATH = os.path.join('config', 'students.yaml')
+DB_PATH = os.path.join('backend', 'sinav_guvenlik.db')
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+
+
+def read_roster(source):
+    """Students to enroll from a photo directory or a CSV file"""
+    if os.path.isdir(source):
+        students = []
+        for filename in sorted(os.listdir(source)):
+            stem, ext = os.path.splitext(filename)
+            if ext.lower() not in IMAGE_EXTENSIONS:
+                continue
+            sid, _, name = stem.partition('_')
+            students.append({
+                'id': sid.strip().upper(),
+                'name': name.replace('_', ' ').strip() or sid.strip().upper(),
+                'photo': os.path.join(source, filename),
+            })
+        return students
+
+    with open(source, newline='', encoding='utf-8-sig') as f:
+        students = []
+        for row in csv.DictReader(f):
+            sid = (row.get('id') or '').strip().upper()
+            if not sid or not row.get('photo'):
+                print(f"⚠️  Skipping CSV row without id/photo: {row}")
+                continue
+            students.append({
+                'id': sid,
+                'name': (row.get('name') or sid).strip(),
+                'photo': row['photo'].strip(),
+                'email': (row.get('email') or '').strip(),
+            })
+        return students
+
+
+def encode_photo(photo_path, min_face_size):
+    """
+    Worker: detect and encode one photo
+    
+    Returns:
+        tuple: (photo_path, problem or None, encoding or None)
+    """
+    import face_recognition
+    try:
+        image = face_recognition.load_image_file(photo_path)
+    except Exception as e:
+        return photo_path, f"unreadable ({e})", None
+
+    locations = face_recognition.face_locations(image)
+    if not locations:
+        return photo_path, "no face", None
+    if len(locations) > 1:
+        return photo_path, f"{len(locations)} faces", None
+    top, right, bottom, left = locations[0]
+    if min(bottom - top, right - left) < min_face_size:
+        return photo_path, f"face too small ({right - left}x{bottom - top}px)", None
+
+    encodings = face_recognition.face_encodings(image, locations)
+    if not encodings:
+        return photo_path, "face could not be encoded", None
+    return photo_path, None, encodings[0]
+
+
+def write_yaml_atomic(enrolled, cfg_path):
+    """Merge enrolled students into students.yaml by id and replace the file atomically"""
+    data = {'students': []}
+    if os.path.exists(cfg_path):
+        with open(cfg_path, 'r', encoding='utf-8') as f:
+            data = yaml.safe_load(f) or {'students': []}
+    students = data.setdefault('students', [])
+    by_id = {str(s.get('id', '')).upper(): s for s in students}
+
+    for student in enrolled:
+        entry = by_id.get(student['id'])
+        if entry is None:
+            entry = {'id': student['id'], 'name': student['name'], 'email': student.get('email', ''), 'photo': ''}
+            students.append(entry)
+            by_id[student['id']] = entry
+        entry['name'] = student['name']
+        entry['photo'] = student['photo']
+        if student.get('email'):
+            entry['email'] = student['email']
+
+    os.makedirs(os.path.dirname(cfg_path), exist_ok=True)
+    tmp_path = cfg_path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        yaml.safe_dump(data, f, allow_unicode=True, sort_keys=False)
+    os.replace(tmp_path, cfg_path)
+
+
+def write_backend_db(enrolled, db_path):
+    """Insert or update students in the backend database in one transaction"""
+    conn = sqlite3.connect(db_path)
+    try:
+        with conn:
+            for student in enrolled:
+                email = student.get('email') or f"{student['id'].lower()}@example.com"
+                updated = conn.execute(
+                    "UPDATE students SET full_name = ? WHERE student_id = ?",
+                    (student['name'], student['id'])
+                ).rowcount
+                if not updated:
+                    conn.execute(
+                        "INSERT INTO students (student_id, full_name, email, created_at) VALUES (?, ?, ?, datetime('now'))",
+                        (student['id'], student['name'], email)
+                    )
+    finally:
+        conn.close()
+
+
+def write_reflex_db(enrolled, db_path):
+    """Upsert students with their face_encoding BLOB into the Reflex students.db"""
+    conn = sqlite3.connect(db_path)
+    try:
+        with conn:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS students (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    name TEXT NOT NULL,
+                    student_id TEXT UNIQUE NOT NULL,
+                    photo_path TEXT,
+                    face_encoding BLOB,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+            conn.executemany(
+                "INSERT INTO students (name, student_id, photo_path, face_encoding) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(student_id) DO UPDATE SET name = excluded.name, "
+                "photo_path = excluded.photo_path, face_encoding = excluded.face_encoding",
+                [
+                    (s['name'], s['id'], s['photo'], np.asarray(s['encoding'], dtype=np.float64).tobytes())
+                    for s in enrolled
+                ]
+            )
+    finally:
+        conn.close()
+
+
+def enroll(students, workers=None, min_face_size=60, cache=None):
+    """
+    Encode every student's photo (cached photos are reused)
+    
+    Returns:
+        tuple: (enrolled students with 'encoding', list of (student, problem))
+    """
+    cache = cache or EncodingCache()
+    enrolled, problems, pending = [], [], {}
+
+    for student in students:
+        if not os.path.exists(student['photo']):
+            problems.append((student, "photo not found"))
+            continue
+        student['hash'] = file_hash(student['photo'])
+        found, encoding = cache.lookup(student['hash'], student['id'])
+        if found and encoding is not None:
+            enrolled.append(dict(student, encoding=encoding))
+        else:
+            pending.setdefault(student['photo'], []).append(student)
+
+    if pending:
+        print(f"Encoding {len(pending)} photo(s) with {workers or os.cpu_count()} worker(s)...")
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(encode_photo, path, min_face_size) for path in pending]
+            for done, future in enumerate(as_completed(futures), 1):
+                path, problem, encoding = future.result()
+                for student in pending[path]:
+                    if problem:
+                        problems.append((student, problem))
+                    else:
+                        cache.store(student['hash'], encoding, student['id'])
+                        enrolled.append(dict(student, encoding=encoding))
+                if done % 100 == 0:
+                    print(f"  {done}/{len(pending)}")
+
+    cache.save(prune=False)
+    return enrolled, problems
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bulk-enroll student photos")
+    parser.add_argument('source', help="directory of <student_id>[_<name>] photos or a CSV (id,name,photo[,email])")
+    parser.add_argument('--workers', type=int, default=None, help="encoding processes (default: CPU count)")
+    parser.add_argument('--min-face-size', type=int, default=60, help="reject faces smaller than this (pixels)")
+    parser.add_argument('--config', default=CFG_PATH, help="students.yaml to update")
+    parser.add_argument('--db', default=DB_PATH, help="backend database to update (skipped if missing)")
+    parser.add_argument('--reflex-db', default=None, help="Reflex students.db to update with face encodings")
+    parser.add_argument('--report', default=None, help="write per-photo problems to this CSV")
+    args = parser.parse_args(argv)
+
+    students = read_roster(args.source)
+    if not students:
+        print("❌ No students found to enroll")
+        return 1
+
+    enrolled, problems = enroll(students, args.workers, args.min_face_size)
+
+    for student, problem in problems:
+        print(f"⚠️  {student['id']} ({student['photo']}): {problem}")
+    if args.report:
+        with open(args.report, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(['id', 'name', 'photo', 'problem'])
+            for student, problem in problems:
+                writer.writerow([student['id'], student['name'], student['photo'], problem])
+
+    if enrolled:
+        write_yaml_atomic(enrolled, args.config)
+        if os.path.exists(args.db):
+            write_backend_db(enrolled, args.db)
+        else:
+            print(f"⚠️  Backend database not found, skipped: {args.db}")
+        if args.reflex_db:
+            write_reflex_db(enrolled, args.reflex_db)
+
+    print(f"✅ Enrolled {len(enrolled)} student(s), {len(problems)} problem(s)")
+    return 0 if not problems else 2
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,174 @@
+import argparse
+import json
+import os
+import tempfile
+import time
+from pathlib import Path
+import cv2
+import numpy as np
+import psutil
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Replay recorded exam videos through the src/main.py detector chain and report performance")
+    parser.add_argument('videos', nargs='+', help="video files, e.g. recordings/webcam_*.mp4")
+    parser.add_argument('--config', default=None, help="config profile to benchmark (default: config/config.yaml)")
+    parser.add_argument('--max-frames', type=int, default=None, help="stop each video after this many frames")
+    parser.add_argument('--warmup', type=int, default=5, help="frames per video excluded from latency statistics")
+    parser.add_argument('--gpu', action='store_true', help="allow CUDA (default: CPU only, for comparable runs)")
+    parser.add_argument('--output-dir', default=None,
+                        help="where violation captures and logs go (default: a temporary directory)")
+    parser.add_argument('--json', dest='json_path', default=None, help="also write the report as JSON")
+    return parser.parse_args(argv)
+
+
+def summarize(samples, total_frames):
+    """Latency percentiles (ms) and throughput for one detector"""
+    if not samples:
+        return {'runs': 0, 'run_ratio': 0.0}
+    values = np.asarray(samples) * 1000.0
+    return {
+        'runs': len(samples),
+        'run_ratio': len(samples) / max(1, total_frames),
+        'throughput_per_s': len(samples) / (values.sum() / 1000.0) if values.sum() > 0 else None,
+        'mean_ms': float(values.mean()),
+        'p50_ms': float(np.percentile(values, 50)),
+        'p90_ms': float(np.percentile(values, 90)),
+        'p99_ms': float(np.percentile(values, 99)),
+        'max_ms': float(values.max()),
+    }
+
+
+def instrument(chain, samples, recording):
+    """Wrap every detector call of the chain to record its latency"""
+    def wrap(name, call):
+        def timed_call(frame, analysis):
+            start = time.perf_counter()
+            try:
+                return call(frame, analysis)
+            finally:
+                if recording['on']:
+                    samples.setdefault(name, []).append(time.perf_counter() - start)
+        return timed_call
+    chain.calls = [(name, wrap(name, call)) for name, call in chain.calls]
+
+
+def run(args):
+    # Imported here so the CPU-only setting is in place before torch loads
+    from main import load_config, DetectionChain, handle_violations
+    from utils.violation_logger import ViolationLogger
+    from utils.screenshot_utils import ViolationCapturer
+
+    config = load_config(args.config)
+    output_dir = Path(args.output_dir or tempfile.mkdtemp(prefix='proctoring_benchmark_'))
+    config['global']['output_path'] = str(output_dir)
+    config['logging']['log_path'] = str(output_dir / 'logs')
+
+    process = psutil.Process()
+    peak_rss = process.memory_info().rss
+    samples = {}
+    recording = {'on': False}
+    violations = []
+    frames_measured = 0
+    measured_seconds = 0.0
+    load_seconds = 0.0
+
+    for video in args.videos:
+        # Each video is a separate exam session: fresh detector state per video
+        start = time.perf_counter()
+        chain = DetectionChain(config)
+        load_seconds += time.perf_counter() - start
+        instrument(chain, samples, recording)
+        violation_capturer = ViolationCapturer(config)
+        violation_logger = ViolationLogger(config)
+
+        cap = cv2.VideoCapture(video)
+        if not cap.isOpened():
+            raise SystemExit(f"Cannot open video: {video}")
+        frame_index = 0
+        try:
+            while args.max_frames is None or frame_index < args.max_frames:
+                ret, frame = cap.read()
+                if not ret:
+                    break
+                video_time = cap.get(cv2.CAP_PROP_POS_MSEC) / 1000.0
+                recording['on'] = frame_index >= args.warmup
+
+                start = time.perf_counter()
+                results = chain.process(frame)
+                violation_type = handle_violations(frame, results, None, violation_capturer, violation_logger)
+                elapsed = time.perf_counter() - start
+                if violation_type:
+                    chain.scheduler.notify(violation_type)
+                    violations.append({
+                        'video': str(video),
+                        'frame': frame_index,
+                        'video_time': round(video_time, 3),
+                        'type': violation_type,
+                    })
+
+                if recording['on']:
+                    samples.setdefault('chain', []).append(elapsed)
+                    frames_measured += 1
+                    measured_seconds += elapsed
+                frame_index += 1
+                peak_rss = max(peak_rss, process.memory_info().rss)
+        finally:
+            cap.release()
+
+    return {
+        'config': str(args.config or 'config/config.yaml'),
+        'videos': [str(video) for video in args.videos],
+        'device': 'cuda' if args.gpu else 'cpu',
+        'frames_measured': frames_measured,
+        'fps': frames_measured / measured_seconds if measured_seconds > 0 else None,
+        'model_load_seconds': load_seconds,
+        'peak_rss_mb': peak_rss / (1024 * 1024),
+        'detectors': {name: summarize(values, frames_measured) for name, values in samples.items()},
+        'violations': violations,
+        'output_dir': str(output_dir),
+    }
+
+
+def print_report(report):
+    print(f"Config: {report['config']}  device: {report['device']}")
+    fps = f"{report['fps']:.1f}" if report['fps'] else "n/a"
+    print(f"Frames: {report['frames_measured']}  throughput: {fps} fps  "
+          f"model load: {report['model_load_seconds']:.1f}s  peak RSS: {report['peak_rss_mb']:.0f} MB")
+    print(f"{'stage':<12}{'runs':>7}{'ran %':>7}{'per s':>9}{'mean':>9}{'p50':>9}{'p90':>9}{'p99':>9}{'max':>9}  (ms)")
+    for name, s in report['detectors'].items():
+        if not s['runs']:
+            print(f"{name:<12}{0:>7}")
+            continue
+        per_s = f"{s['throughput_per_s']:.1f}" if s['throughput_per_s'] else "n/a"
+        print(f"{name:<12}{s['runs']:>7}{s['run_ratio'] * 100:>7.0f}{per_s:>9}{s['mean_ms']:>9.1f}"
+              f"{s['p50_ms']:>9.1f}{s['p90_ms']:>9.1f}{s['p99_ms']:>9.1f}{s['max_ms']:>9.1f}")
+    print(f"Violations: {len(report['violations'])}")
+    for v in report['violations']:
+        print(f"  {v['video']} frame {v['frame']} ({v['video_time']:.2f}s): {v['type']}")
+
+
+def main(argv=None):
+    """Offline replay benchmark for the detector chain.
+
+    Frames are processed back to back, with no camera, window, recording or
+    voice alerts. By default it runs on CPU only so results are comparable
+    across machines. The scheduler, motion gate staleness, object max_fps
+    and alert cooldowns run on the wall clock, so which detectors run on
+    which frame depends on replay speed. Disable them in the config profile
+    when you need a frame-exact comparison.
+    """
+    args = parse_args(argv)
+    if not args.gpu:
+        os.environ['CUDA_VISIBLE_DEVICES'] = ''
+    report = run(args)
+    print_report(report)
+    if args.json_path:
+        with open(args.json_path, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Report written to {args.json_path}")
+
+
+if __name__ == '__main__':
+    main()
@@ -8,10 +8,12 @@ import yaml
 import os
 import logging
 import threading
+import time
 from datetime import datetime
-from src.detection.face_id import recognize_student, draw_face_boxes
+from src.detection.face_id import TrackedRecognizer, RecognitionWorker, draw_face_boxes, recognition_config
 from src.detection.multi_face import MultiPersonDetector
 from src.detection.object_detection import ObjectDetector
+from src.detection.motion_gate import MotionGate
 from src.utils.violation_logger import ViolationLogger
 
 logging.basicConfig(level=logging.INFO)
@@ -21,7 +23,7 @@ logger = logging.getLogger(__name__)
 class ClassroomCamera:
     """Handle individual classroom camera"""
     
-    def __init__(self, camera_config, violation_logger):
+    def __init__(self, camera_config, violation_logger, recognition_worker=None):
         self.camera_id = camera_config.get("id", "unknown")
         self.camera_name = camera_config.get("name", "Camera")
         self.rtsp_url = camera_config.get("rtsp", "")
@@ -32,6 +34,18 @@ class ClassroomCamera:
         self.multi_face_detector = MultiPersonDetector()
         self.object_detector = ObjectDetector()
         
+        # Skip the model stack while the classroom is static
+        self.motion_gate = MotionGate(camera_config.get("motion_gate", {}))
+        
+        self.min_reanchor_interval = camera_config.get("min_reanchor_interval", 1.0)
+        
+        # Face boxes and names follow students between recognition passes
+        self.recognizer = TrackedRecognizer(
+            tracker_config=camera_config.get("tracking", {}),
+            exam_code=camera_config.get("exam_code"),
+            worker=recognition_worker
+        )
+        
     def start(self):
         """Start monitoring this camera"""
         self.running = True
@@ -63,9 +77,12 @@ class ClassroomCamera:
         logger.info(f"✅ Camera {self.camera_name} is running")
         
         frame_count = 0
+        recognized_students = []
+        detected_objects = []
         
         while self.running:
             ret, frame = cap.read()
+            captured_at = time.time()
             
             if not ret:
                 logger.warning(f"⚠️  Failed to read frame from {self.camera_name}")
@@ -73,13 +90,26 @@ class ClassroomCamera:
             
             frame_count += 1
             
-            # Process every 5th frame for performance
+            # Process every 5th frame for performance, or early when a tracked face is lost.
+            # Run the models only when the scene changed or the last results are stale;
+            # in between, the tracker moves the previous results
             if frame_count % 5 == 0:
-                # Face recognition
-                recognized_students = recognize_student(frame)
+                self.motion_gate.update(frame)
+            due = frame_count % 5 == 0 and self.motion_gate.should_run("models")
+            
+            # A lost track re-anchors early, but no more often than min_reanchor_interval
+            # and only while the scene is moving
+            reanchor = (
+                self.recognizer.needs_reanchor()
+                and captured_at - self.motion_gate.last_run.get("models", 0.0) >= self.min_reanchor_interval
+                and self.motion_gate.should_run("models")
+            )
+            
+            if due or reanchor:
+                self.motion_gate.mark_run("models", captured_at)
                 
-                # Draw student names with boxes (like the example code)
-                frame = self._draw_student_boxes(frame, recognized_students)
+                # Face recognition
+                recognized_students = self.recognizer.recognize(frame, captured_at)
                 
                 # Check for multiple people (potential cheating)
                 if len(recognized_students) > 1:
@@ -102,12 +132,17 @@ class ClassroomCamera:
                             frame,
                             recognized_students
                         )
-                
-                # Draw object detections
-                frame = self._draw_objects(frame, detected_objects)
+            else:
+                recognized_students = self.recognizer.track(frame)
+            
+            # Draw student names with boxes (like the example code)
+            frame = self._draw_student_boxes(frame, recognized_students)
+            
+            # Draw object detections
+            frame = self._draw_objects(frame, detected_objects)
             
             # Add camera info overlay
-            self._add_camera_overlay(frame, recognized_students if frame_count % 5 == 0 else [])
+            self._add_camera_overlay(frame, recognized_students)
             
             # Display frame
             cv2.imshow(f"{self.camera_name} - {self.camera_id}", frame)
@@ -244,12 +279,21 @@ def start_classroom_monitoring():
     # Initialize violation logger
     violation_logger = ViolationLogger()
     
+    # One encoder shared by every camera, so faces from all rooms are encoded in batches
+    batching = recognition_config.get("batching") or {}
+    recognition_worker = None
+    if len(cameras) > 1 and batching.get("enabled", True):
+        recognition_worker = RecognitionWorker(
+            max_batch=batching.get("max_batch", 8),
+            max_wait=batching.get("max_wait", 0.02)
+        ).start()
+    
     # Create camera monitors
     camera_monitors = []
     threads = []
     
     for cam_config in cameras:
-        cam_monitor = ClassroomCamera(cam_config, violation_logger)
+        cam_monitor = ClassroomCamera(cam_config, violation_logger, recognition_worker)
         camera_monitors.append(cam_monitor)
     
     # Start all cameras
@@ -270,6 +314,8 @@ def start_classroom_monitoring():
     # Stop all cameras
     for monitor in camera_monitors:
         monitor.stop()
+    if recognition_worker is not None:
+        recognition_worker.stop()
     
     cv2.destroyAllWindows()
     logger.info("✅ Classroom monitoring stopped")
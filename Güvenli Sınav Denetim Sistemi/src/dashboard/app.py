@@ -6,6 +6,7 @@ import json
 import time
 import os
 import signal
+import sys
 
 app = Flask(__name__)
 
@@ -16,6 +17,10 @@ SHUTDOWN_FLAG_FILE = Path(__file__).resolve().parents[2] / '.shutdown_flag'
 BASE_DIR = Path(__file__).resolve().parents[2]
 CONFIG_PATH = BASE_DIR / 'config' / 'config.yaml'
 
+# Shared helpers from src/ (the dashboard runs as a standalone script)
+sys.path.insert(0, str(BASE_DIR / 'src'))
+from utils.metrics import render_prometheus
+
 with open(CONFIG_PATH) as f:
     config = yaml.safe_load(f)
 
@@ -274,6 +279,24 @@ def camera_status():
         'last_update': last_update
     })
 
+@app.route('/api/metrics')
+def prometheus_metrics():
+    """Per-stage latency histograms and frame drops in Prometheus text format.
+
+    The proctoring process (src/main.py) writes logs/metrics.json every few
+    seconds; this endpoint only renders the latest snapshot.
+    """
+    from flask import Response
+    metrics_path = BASE_DIR / 'logs' / 'metrics.json'
+    snapshot = {}
+    if metrics_path.exists():
+        try:
+            with open(metrics_path, 'r', encoding='utf-8') as f:
+                snapshot = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Error reading metrics: {e}")
+    return Response(render_prometheus(snapshot), mimetype='text/plain; version=0.0.4')
+
 @app.route('/api/camera_sessions')
 def camera_sessions():
     """Get camera session history with recordings"""
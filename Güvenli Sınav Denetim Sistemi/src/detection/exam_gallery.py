@@ -0,0 +1,129 @@
+"""
+Exam Galleries - Per-exam recognition galleries
+Restricts face matching to the students registered for an exam in the backend
+"""
+
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+
+class ExamGalleryCache:
+    """
+    Sub-galleries of the full roster keyed by exam code
+
+    Registrations come from the backend endpoint
+    /api/exams/{code}/registered-students. They are fetched on a
+    background thread, so matcher_for() never does network I/O in a
+    camera or recognition thread. Until an exam's first fetch succeeds,
+    matching uses the full gallery. Registrations are refreshed every
+    ``ttl`` seconds, and the last known list stays in use while a refresh
+    is pending or failing. After a failed fetch, the next attempt waits
+    ``retry_interval`` seconds, doubling on each failure up to ``ttl``.
+
+    Each exam's sub-gallery is built once by slicing the full
+    GalleryMatcher. A reload of the full gallery invalidates the cached
+    sub-galleries.
+    """
+
+    def __init__(self, api_url="http://localhost:8001", ttl=300, max_exams=16, timeout=5, retry_interval=5):
+        self.api_url = api_url.rstrip("/")
+        self.ttl = ttl
+        self.max_exams = max_exams
+        self.timeout = timeout
+        self.retry_interval = retry_interval
+        self.registrations = OrderedDict()   # exam code -> (registered ids or None, next fetch time, failures)
+        self.galleries = {}                  # exam code -> (source matcher, registered ids, sub-gallery matcher)
+        self.pending = set()
+        self.lock = threading.Lock()
+        self.wakeup = threading.Condition(self.lock)
+        self.thread = None
+
+    def registered_ids(self, exam_code):
+        """Student ids registered for the exam, or None if the backend is unavailable"""
+        try:
+            response = requests.get(f"{self.api_url}/api/exams/{exam_code}/registered-students", timeout=self.timeout)
+            if response.status_code != 200:
+                logger.warning(f"⚠️  Could not fetch registrations for {exam_code}: {response.status_code}")
+                return None
+            return frozenset(str(student["id"]).upper() for student in response.json())
+        except Exception as e:
+            logger.warning(f"⚠️  Could not fetch registrations for {exam_code}: {e}")
+            return None
+
+    def _schedule(self, exam_code):
+        """Queue a background fetch (caller holds the lock)"""
+        registered, _, failures = self.registrations.get(exam_code, (None, 0.0, 0))
+        # No further scheduling until this fetch has finished
+        self.registrations[exam_code] = (registered, float("inf"), failures)
+        if exam_code in self.pending:
+            return
+        self.pending.add(exam_code)
+        if self.thread is None:
+            self.thread = threading.Thread(target=self._run, name="exam-galleries", daemon=True)
+            self.thread.start()
+        self.wakeup.notify()
+
+    def _run(self):
+        while True:
+            with self.lock:
+                while not self.pending:
+                    self.wakeup.wait()
+                exam_code = self.pending.pop()
+
+            registered = self.registered_ids(exam_code)
+            now = time.time()
+            with self.lock:
+                known, _, failures = self.registrations.get(exam_code, (None, 0.0, 0))
+                if registered is not None:
+                    self.registrations[exam_code] = (registered, now + self.ttl, 0)
+                else:
+                    # Keep the last known list and back off before retrying
+                    backoff = min(self.ttl, self.retry_interval * (2 ** failures))
+                    self.registrations[exam_code] = (known, now + backoff, failures + 1)
+                self.registrations.move_to_end(exam_code)
+                while len(self.registrations) > self.max_exams:
+                    evicted, _ = self.registrations.popitem(last=False)
+                    self.galleries.pop(evicted, None)
+
+    def matcher_for(self, exam_code, matcher):
+        """Sub-gallery of ``matcher`` holding only the students registered for ``exam_code``"""
+        exam_code = exam_code.strip().upper()
+        with self.lock:
+            entry = self.registrations.get(exam_code)
+            if entry is None:
+                self._schedule(exam_code)
+                logger.info(f"Using the full gallery for {exam_code} until its registrations are fetched")
+                return matcher
+            registered, next_fetch, _ = entry
+            if time.time() >= next_fetch:
+                self._schedule(exam_code)
+            if registered is None:
+                return matcher
+            cached = self.galleries.get(exam_code)
+            if cached is not None and cached[0] is matcher and cached[1] is registered:
+                return cached[2]
+
+        sub_gallery = matcher.subset([sid for sid in matcher.ids if str(sid).upper() in registered])
+        missing = len(registered) - len(sub_gallery)
+        if missing > 0:
+            logger.warning(f"⚠️  {missing} registered student(s) of {exam_code} have no face encoding")
+        logger.info(f"Exam {exam_code}: matching against {len(sub_gallery)} of {len(matcher)} students")
+
+        with self.lock:
+            if exam_code in self.registrations:
+                self.galleries[exam_code] = (matcher, registered, sub_gallery)
+        return sub_gallery
+
+    def invalidate(self, exam_code=None):
+        """Refetch one exam's registrations (e.g. after they change) or all of them"""
+        with self.lock:
+            codes = list(self.registrations) if exam_code is None else [exam_code.strip().upper()]
+            for code in codes:
+                if code in self.registrations:
+                    self._schedule(code)
@@ -1,16 +1,14 @@
-import cv2
-import mediapipe as mp
 import numpy as np
 from datetime import datetime
+from .face_analysis import FaceAnalyzer
+try:
+    from utils.metrics import timed
+except ImportError:  # imported as src.detection.* from the project root
+    from src.utils.metrics import timed
 
 class EyeTracker:
-    def __init__(self, config):
-        self.mp_face_mesh = mp.solutions.face_mesh
-        self.face_mesh = self.mp_face_mesh.FaceMesh(
-            max_num_faces=1,
-            refine_landmarks=True,
-            min_detection_confidence=0.5,
-            min_tracking_confidence=0.5)
+    def __init__(self, config, analyzer=None):
+        self.analyzer = analyzer or FaceAnalyzer(config)
         
         self.config = config
         self.eye_threshold = config['detection']['eyes']['gaze_threshold']
@@ -45,26 +43,23 @@ class EyeTracker:
         ear = (A + B) / (2.0 * C)
         return ear
 
-    def track_eyes(self, frame):
+    @timed('detector.eyes')
+    def track_eyes(self, frame, analysis=None):
         try:
-            # Convert frame to RGB and process
-            rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            results = self.face_mesh.process(rgb_frame)
+            # Landmarks come from the shared per-frame analysis when available
+            if analysis is None:
+                analysis = self.analyzer.analyze(frame)
+            landmarks = analysis.landmarks
             
-            if not results.multi_face_landmarks:
+            if landmarks is None:
                 return self.gaze_direction, self.eye_ratio  # Return last known values
             
-            face_landmarks = results.multi_face_landmarks[0]
             frame_h, frame_w = frame.shape[:2]
+            scale = np.array([frame_w, frame_h], dtype=np.float32)
             
             # Get eye landmarks in pixel coordinates
-            left_eye_coords = np.array([(face_landmarks.landmark[i].x * frame_w, 
-                                       face_landmarks.landmark[i].y * frame_h) 
-                                      for i in self.LEFT_EYE_INDICES])
-            
-            right_eye_coords = np.array([(face_landmarks.landmark[i].x * frame_w, 
-                                        face_landmarks.landmark[i].y * frame_h) 
-                                       for i in self.RIGHT_EYE_INDICES])
+            left_eye_coords = landmarks[self.LEFT_EYE_INDICES] * scale
+            right_eye_coords = landmarks[self.RIGHT_EYE_INDICES] * scale
             
             # Calculate Eye Aspect Ratio (EAR) for both eyes
             left_ear = self._calculate_ear(left_eye_coords)
@@ -76,8 +71,7 @@ class EyeTracker:
             right_eye_center = np.mean(right_eye_coords, axis=0)
             
             # Calculate horizontal difference between eye centers and nose
-            nose_tip = np.array([face_landmarks.landmark[4].x * frame_w,
-                                face_landmarks.landmark[4].y * frame_h])
+            nose_tip = landmarks[4] * scale
             
             left_diff = left_eye_center[0] - nose_tip[0]
             right_diff = right_eye_center[0] - nose_tip[0]
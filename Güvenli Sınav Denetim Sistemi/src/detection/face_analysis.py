@@ -0,0 +1,262 @@
+import threading
+import time
+import cv2
+import numpy as np
+import torch
+import mediapipe as mp
+from facenet_pytorch import MTCNN
+from .preprocessing import FramePyramid
+try:
+    from utils.metrics import timed
+except ImportError:  # imported as src.detection.* from the project root
+    from src.utils.metrics import timed
+
+
+class FrameAnalysis:
+    """Per-frame face analysis results shared by every detector.
+
+    Color conversion, MTCNN and FaceMesh are computed lazily on first access
+    and cached, so a stage nobody asks for on this frame costs nothing.
+    ``model_costs`` records the seconds MTCNN and FaceMesh took on this
+    frame, so the scheduler can charge them apart from the detectors.
+    """
+
+    def __init__(self, frame, analyzer):
+        self.frame = frame
+        self.analyzer = analyzer
+        self._rgb = None
+        self._pyramid = None
+        self._faces = None
+        self._landmarks = None
+        self._landmarks_done = False
+        self.model_costs = {}
+
+    @property
+    def rgb(self):
+        if self._rgb is None:
+            self._rgb = cv2.cvtColor(self.frame, cv2.COLOR_BGR2RGB)
+        return self._rgb
+
+    @property
+    def shape(self):
+        return self.frame.shape
+
+    @property
+    def pyramid(self):
+        if self._pyramid is None:
+            self._pyramid = FramePyramid(self.frame)
+        return self._pyramid
+
+    def faces(self):
+        """MTCNN boxes (full-resolution pixels) and probabilities: (boxes, probs), either may be None"""
+        if self._faces is None:
+            start = time.perf_counter()
+            self._faces = self.analyzer.detect_faces(self)
+            self.model_costs['mtcnn'] = time.perf_counter() - start
+        return self._faces
+
+    @property
+    def boxes(self):
+        return self.faces()[0]
+
+    @property
+    def probs(self):
+        return self.faces()[1]
+
+    @property
+    def landmarks(self):
+        """FaceMesh landmarks of the first face as an (N, 2) array of
+        normalized (x, y) coordinates, or None when no face was found"""
+        if not self._landmarks_done:
+            start = time.perf_counter()
+            self._landmarks = self.analyzer.face_landmarks(self)
+            self._landmarks_done = True
+            self.model_costs['face_mesh'] = time.perf_counter() - start
+        return self._landmarks
+
+
+class FaceAnalyzer:
+    """Owns the MTCNN and FaceMesh models shared by the face detectors.
+
+    Models are created on first use so a detector running on its own only
+    pays for the model it actually needs.
+
+    With ``detection.preprocessing.enabled``, MTCNN runs on a downscaled
+    pyramid level. FaceMesh runs on an upscaled crop around the last known
+    face box. Results are mapped back to full-resolution coordinates.
+    MTCNN's minimum face size is scaled with the pyramid level, so faces
+    down to ``min_face_size`` full-resolution pixels are still found on
+    large frames; ``mtcnn_min_face_size`` caps it on the level itself.
+
+    Pass ``shared`` to reuse another analyzer's MTCNN across video streams.
+    Per-stream state stays with each analyzer: the last face box and the
+    FaceMesh instance, which tracks the face from frame to frame.
+    """
+
+    def __init__(self, config=None, shared=None):
+        self.config = config
+        self.shared = shared
+        preprocessing = ((config or {}).get('detection') or {}).get('preprocessing', {})
+        self.preprocessing = preprocessing.get('enabled', False)
+        self.mtcnn_width = preprocessing.get('mtcnn_width', 960)
+        self.mtcnn_min_face_size = preprocessing.get('mtcnn_min_face_size', 20) if self.preprocessing else 40
+        self.min_face_size = preprocessing.get('min_face_size', 40)
+        self.max_face_misses = preprocessing.get('max_face_misses', 30)
+        self.face_mesh_width = preprocessing.get('face_mesh_width', 1280)
+        self.face_crop_size = preprocessing.get('face_crop_size', 320)
+        self.device = torch.device('cuda:0' if torch.cuda.is_available() else 'cpu')
+        self.last_face_box = None
+        self.face_misses = 0
+        self._mtcnn = None
+        self._mtcnn_lock = threading.Lock()
+        self._face_mesh = None
+
+    @property
+    def mtcnn(self):
+        if self.shared is not None:
+            return self.shared.mtcnn
+        if self._mtcnn is None:
+            self._mtcnn = MTCNN(
+                keep_all=True,
+                post_process=False,
+                min_face_size=self.mtcnn_min_face_size,
+                thresholds=[0.6, 0.7, 0.7],
+                device=self.device
+            )
+        return self._mtcnn
+
+    @property
+    def face_mesh(self):
+        if self._face_mesh is None:
+            self._face_mesh = mp.solutions.face_mesh.FaceMesh(
+                max_num_faces=1,
+                refine_landmarks=True,
+                min_detection_confidence=0.5,
+                min_tracking_confidence=0.5)
+        return self._face_mesh
+
+    def analyze(self, frame):
+        """Wrap a BGR frame so its analysis is computed at most once"""
+        return FrameAnalysis(frame, self)
+
+    def _mtcnn_input(self, analysis):
+        """RGB image fed to MTCNN and the factor mapping its boxes back to the frame"""
+        if not self.preprocessing:
+            return analysis.rgb, 1.0
+        image, scale = analysis.pyramid.level(self.mtcnn_width)
+        return cv2.cvtColor(image, cv2.COLOR_BGR2RGB), scale
+
+    def _mtcnn_min_face_size(self, scale):
+        """MTCNN min_face_size on an image ``scale`` times smaller than the frame"""
+        return min(self.mtcnn_min_face_size, self.min_face_size / scale)
+
+    @property
+    def mtcnn_lock(self):
+        """Lock guarding the (possibly shared) MTCNN's min_face_size"""
+        return self.shared.mtcnn_lock if self.shared is not None else self._mtcnn_lock
+
+    def _mtcnn_detect(self, images, min_face_size):
+        # facenet-pytorch reads min_face_size on every detect() call. The model
+        # may be shared with other streams, so set it and restore it under the lock
+        mtcnn = self.mtcnn
+        with self.mtcnn_lock:
+            default = mtcnn.min_face_size
+            mtcnn.min_face_size = min_face_size
+            try:
+                return mtcnn.detect(images)
+            finally:
+                mtcnn.min_face_size = default
+
+    @timed('model.mtcnn')
+    def detect_faces(self, analysis):
+        image, scale = self._mtcnn_input(analysis)
+        boxes, probs = self._mtcnn_detect(image, self._mtcnn_min_face_size(scale))
+        return self._finish_faces(analysis, boxes, probs, scale)
+
+    def _finish_faces(self, analysis, boxes, probs, scale):
+        if boxes is not None:
+            boxes = boxes * scale
+        elif self.preprocessing and self.last_face_box is not None and self.face_misses < self.max_face_misses:
+            # Small or distant face: retry on an upscaled crop around the last known box
+            boxes, probs = self._detect_in_crop(analysis, self.last_face_box)
+
+        if boxes is not None and len(boxes) > 0:
+            self.last_face_box = boxes[int(np.argmax(probs))]
+            self.face_misses = 0
+        else:
+            # Not even the crop found it: stop retrying around a stale box. FaceMesh
+            # may set the box again, so retries also stop after max_face_misses misses
+            self.last_face_box = None
+            self.face_misses += 1
+        return boxes, probs
+
+    @timed('model.mtcnn_batch')
+    def detect_faces_batch(self, analyses):
+        """Run MTCNN once for several frames and cache the faces on each analysis.
+
+        Frames may belong to different streams. Each analysis keeps its own
+        analyzer's post-processing and last face box. MTCNN needs equally
+        sized inputs and one minimum face size, so frames are grouped by the
+        shape and scale of their MTCNN input.
+        """
+        groups = {}
+        for analysis in analyses:
+            if analysis._faces is not None:
+                continue
+            image, scale = analysis.analyzer._mtcnn_input(analysis)
+            key = (image.shape, analysis.analyzer._mtcnn_min_face_size(scale))
+            groups.setdefault(key, []).append((analysis, image, scale))
+
+        for (_, min_face_size), members in groups.items():
+            batch_boxes, batch_probs = self._mtcnn_detect(np.stack([image for _, image, _ in members]), min_face_size)
+            for (analysis, _, scale), boxes, probs in zip(members, batch_boxes, batch_probs):
+                analysis._faces = analysis.analyzer._finish_faces(analysis, boxes, probs, scale)
+
+    def _detect_in_crop(self, analysis, box):
+        crop, origin = analysis.pyramid.crop(box, self.face_crop_size, margin=1.0)
+        if crop is None:
+            return None, None
+        x0, y0, side = origin
+        scale = side / self.face_crop_size
+        boxes, probs = self._mtcnn_detect(cv2.cvtColor(crop, cv2.COLOR_BGR2RGB), self._mtcnn_min_face_size(scale))
+        if boxes is None:
+            return None, None
+        return boxes * scale + np.array([x0, y0, x0, y0]), probs
+
+    @timed('model.face_mesh')
+    def face_landmarks(self, analysis):
+        if not self.preprocessing:
+            return self._process_face_mesh(analysis.rgb)
+
+        if self.last_face_box is not None:
+            crop, origin = analysis.pyramid.crop(self.last_face_box, self.face_crop_size)
+            if crop is not None:
+                landmarks = self._process_face_mesh(cv2.cvtColor(crop, cv2.COLOR_BGR2RGB))
+                if landmarks is not None:
+                    # Crop-normalized -> frame-normalized coordinates
+                    x0, y0, side = origin
+                    height, width = analysis.shape[:2]
+                    landmarks[:, 0] = (x0 + landmarks[:, 0] * side) / width
+                    landmarks[:, 1] = (y0 + landmarks[:, 1] * side) / height
+                    self._follow_landmarks(landmarks, analysis)
+                    return landmarks
+
+        image, _ = analysis.pyramid.level(self.face_mesh_width)
+        landmarks = self._process_face_mesh(cv2.cvtColor(image, cv2.COLOR_BGR2RGB))
+        if landmarks is not None:
+            self._follow_landmarks(landmarks, analysis)
+        return landmarks
+
+    def _follow_landmarks(self, landmarks, analysis):
+        """Keep the face crop centred on the face between MTCNN runs"""
+        height, width = analysis.shape[:2]
+        x_min, y_min = landmarks.min(axis=0) * (width, height)
+        x_max, y_max = landmarks.max(axis=0) * (width, height)
+        self.last_face_box = np.array([x_min, y_min, x_max, y_max])
+
+    def _process_face_mesh(self, rgb_frame):
+        results = self.face_mesh.process(rgb_frame)
+        if not results.multi_face_landmarks:
+            return None
+        face_landmarks = results.multi_face_landmarks[0]
+        return np.array([(lm.x, lm.y) for lm in face_landmarks.landmark], dtype=np.float32)
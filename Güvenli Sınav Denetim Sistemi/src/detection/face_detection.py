@@ -1,23 +1,32 @@
-import cv2
-import torch
-from facenet_pytorch import MTCNN
 from datetime import datetime
+from .face_analysis import FaceAnalyzer
+from .face_tracker import FaceTracker
+try:
+    from utils.metrics import timed
+except ImportError:  # imported as src.detection.* from the project root
+    from src.utils.metrics import timed
 
 class FaceDetector:
-    def __init__(self, config):
-        self.device = torch.device('cuda:0' if torch.cuda.is_available() else 'cpu')
-        self.detector = MTCNN(
-            keep_all=True,
-            post_process=False,
-            min_face_size=40,
-            thresholds=[0.6, 0.7, 0.7],
-            device=self.device
-        )
+    def __init__(self, config, analyzer=None):
+        # Shared MTCNN/FaceMesh owner; a private one is created when run standalone
+        self.analyzer = analyzer or FaceAnalyzer(config)
         self.config = config
         self.detection_interval = config['detection']['face']['detection_interval']
+        if config['detection'].get('scheduler', {}).get('enabled'):
+            # DetectorScheduler decides when to run; don't skip frames here too
+            self.detection_interval = 1
         self.min_confidence = config['detection']['face']['min_confidence']
+        # Optical-flow tracking keeps face presence fresh on frames where MTCNN
+        # does not run: the frames between detection_interval runs, or, under the
+        # scheduler, the frames it leaves the face detector out (see track_face).
+        # Without a scheduler and with an interval of 1 there are no such frames.
+        tracking = config['detection']['face'].get('tracking', {})
+        scheduled = config['detection'].get('scheduler', {}).get('enabled')
+        use_tracker = tracking.get('enabled') and (self.detection_interval > 1 or scheduled)
+        self.tracker = FaceTracker(tracking) if use_tracker else None
         self.frame_count = 0
         self.face_present = False
+        self.face_box = None
         self.last_face_time = None
         self.alert_logger = None
         self.face_disappeared_start = None
@@ -25,16 +34,46 @@ class FaceDetector:
     def set_alert_logger(self, alert_logger):
         self.alert_logger = alert_logger
 
-    def detect_face(self, frame):
+    def track_face(self, frame, analysis):
+        """Face presence and box from the optical-flow tracks, without running MTCNN"""
+        tracks = self.tracker.update(frame, analysis.pyramid)
+        if tracks:
+            box = max((track.box for track in tracks), key=lambda b: (b[2] - b[0]) * (b[3] - b[1]))
+            # Keep the FaceMesh crop on the moving face
+            self.analyzer.last_face_box = box
+            return self._set_presence(True, box)
+        if self.tracker.lost:
+            return self._set_presence(False)
+        # Nothing could be tracked (no face, or too few corners on it): keep the last detection
+        return self.face_present
+
+    @timed('detector.face')
+    def detect_face(self, frame, analysis=None):
         self.frame_count += 1
+        if analysis is None:
+            analysis = self.analyzer.analyze(frame)
+            
         if self.frame_count % self.detection_interval != 0:
-            return self.face_present
+            if self.tracker is None:
+                return self.face_present
+            present = self.track_face(frame, analysis)
+            # Re-run MTCNN early only if a tracked face was lost
+            if not self.tracker.needs_reanchor():
+                return present
             
-        rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        boxes, probs = self.detector.detect(rgb_frame)
+        boxes, probs = analysis.faces()
+        if self.tracker is not None:
+            confident = [box for box, prob in zip(boxes, probs) if prob > self.min_confidence] if boxes is not None else []
+            self.tracker.reanchor(frame, confident, pyramid=analysis.pyramid)
         
-        current_time = datetime.now()
         if boxes is not None and len(boxes) > 0 and probs[0] > self.min_confidence:
+            return self._set_presence(True, boxes[0])
+        return self._set_presence(False)
+
+    def _set_presence(self, present, box=None):
+        """Update face presence and log disappear/reappear alerts"""
+        current_time = datetime.now()
+        if present:
             if not self.face_present and self.face_disappeared_start:
                 disappearance_duration = (current_time - self.face_disappeared_start).total_seconds()
                 if disappearance_duration > 5 and self.alert_logger:
@@ -44,6 +83,7 @@ class FaceDetector:
                     )
             
             self.face_present = True
+            self.face_box = box
             self.last_face_time = current_time
             self.face_disappeared_start = None
             return True
@@ -52,10 +92,11 @@ class FaceDetector:
                 self.face_disappeared_start = current_time
                 
             self.face_present = False
+            self.face_box = None
             if self.last_face_time and (current_time - self.last_face_time).total_seconds() > 5:
                 if self.alert_logger:
                     self.alert_logger.log_alert(
                         "FACE_DISAPPEARED",
                         "Face disappeared for more than 5 seconds"
                     )
-            return False
\ No newline at end of file
+            return False
@@ -4,64 +4,291 @@ Real-time student face recognition and identification
 """
 
 import face_recognition
+import face_recognition.api
+import dlib
 import cv2
 import numpy as np
 import logging
-from src.utils.student_loader import load_students
+import queue
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+from src.utils.student_loader import load_recognition_config
+from src.utils.metrics import metrics
+from src.detection.face_tracker import FaceTracker
+from src.detection.face_locator import locate_faces
+from src.detection.gallery_matcher import UNKNOWN
+from src.detection.gallery_service import GalleryService
+from src.detection.exam_gallery import ExamGalleryCache
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Load known faces on module initialization
-known_encodings, known_ids, known_names = load_students()
 
-if len(known_encodings) == 0:
+recognition_config = load_recognition_config()
+
+# Face localisation runs on a downscaled frame (recognition.detection in config.yaml)
+detection_config = recognition_config.get("detection") or {}
+
+# Per-exam sub-galleries, fetched from the backend registrations on first use
+exam_galleries = ExamGalleryCache(**(recognition_config.get("exam_galleries") or {}))
+
+# Load known faces on module initialization and follow later enrollments
+gallery_config = recognition_config.get("gallery") or {}
+gallery = GalleryService(
+    students_path=gallery_config.get("students_path", "config/students.yaml"),
+    students_db=gallery_config.get("students_db"),
+    index_config=recognition_config.get("index"),
+    poll_interval=gallery_config.get("poll_interval", 5.0) if gallery_config.get("watch", True) else 0,
+)
+gallery.refresh(force=True)
+gallery.start()
+
+if len(gallery.matcher) == 0:
     logger.warning("⚠️  No student faces loaded! Please add student photos.")
 
 
-def recognize_student(frame, tolerance=0.45):
+def _gallery_for(exam_code=None):
+    """Current matcher, narrowed to the exam's registered students when exam_code is given"""
+    # Read the matcher once so a gallery swap mid-frame cannot mix two rosters
+    matcher = gallery.matcher
+    if exam_code:
+        matcher = exam_galleries.matcher_for(exam_code, matcher)
+    return matcher
+
+
+def _unknown_faces(locations):
+    """recognize_student-style results marking every face as unknown"""
+    return [UNKNOWN + (loc, 0.0) for loc in locations]
+
+
+def _locate(rgb):
+    """Face locations found on a downscaled copy, in full-resolution pixels"""
+    return locate_faces(
+        rgb,
+        scale=detection_config.get("scale", 1.0),
+        upsample=detection_config.get("upsample", 1),
+        model=detection_config.get("model", "hog"),
+    )
+
+
+def recognize_student(frame, tolerance=0.45, exam_code=None):
     """
     Recognize students in a video frame
     
     Args:
         frame: BGR image from OpenCV
         tolerance: Face matching tolerance (lower is more strict)
+        exam_code: Only match students registered for this exam
         
     Returns:
         list: List of tuples (student_id, student_name, face_location, confidence)
     """
-    if len(known_encodings) == 0:
-        return []
+    matcher = _gallery_for(exam_code)
     
     # Convert BGR to RGB
     rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
     
-    # Find all faces in the frame
-    face_locations = face_recognition.face_locations(rgb)
+    # Find faces on a downscaled copy; encode them from the full-resolution frame
+    face_locations = _locate(rgb)
+    if len(matcher) == 0:
+        # Nobody to match against (e.g. no registered student has an encoding),
+        # but the faces still count for presence and multiple-face checks
+        return _unknown_faces(face_locations)
     face_encs = face_recognition.face_encodings(rgb, face_locations)
     
-    results = []
+    if not face_encs:
+        return []
+    
+    # Match every face in the frame against the whole gallery at once
+    matches = matcher.identify(face_encs, tolerance=tolerance)
+    return [(sid, sname, loc, confidence) for (sid, sname, confidence), loc in zip(matches, face_locations)]
+
+
+class RecognitionWorker:
+    """
+    Shared face encoder and matcher for several cameras
+    
+    Each camera thread locates faces in its own frame and cuts the
+    aligned 150x150 face chips the dlib encoder works on. It then submits
+    the chips here. One worker thread collects the chips from every
+    camera for up to ``max_wait`` seconds, or until ``max_batch`` frames
+    are queued. It encodes them in one batched dlib call and matches
+    each exam's faces in one vectorized call. Each camera gets a Future
+    resolving to (frame timestamp, results), so the encoder cost per
+    frame shrinks as more cameras share a tick.
+    
+    The exam gallery is resolved in the submitting thread, so the shared
+    thread only encodes and matches. After stop(), queued requests fail
+    and submit() raises RuntimeError. Callers wait at most
+    ``result_timeout`` seconds for a result.
+    """
+    
+    def __init__(self, tolerance=0.45, max_batch=8, max_wait=0.02, result_timeout=5.0):
+        self.tolerance = tolerance
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.result_timeout = result_timeout
+        self.requests = queue.Queue()
+        self.stop_event = threading.Event()
+        self.lock = threading.Lock()
+        self.thread = None
     
-    for enc, loc in zip(face_encs, face_locations):
-        # Compare with known faces
-        matches = face_recognition.compare_faces(known_encodings, enc, tolerance=tolerance)
-        distances = face_recognition.face_distance(known_encodings, enc)
+    @property
+    def running(self):
+        return not self.stop_event.is_set()
+    
+    def start(self):
+        with self.lock:
+            if self.thread is None and self.running:
+                self.thread = threading.Thread(target=self._run, name="recognition-worker", daemon=True)
+                self.thread.start()
+        return self
+    
+    def stop(self):
+        """Stop the worker and fail every request still queued"""
+        with self.lock:
+            self.stop_event.set()
+        self._drain()
+    
+    def _drain(self):
+        while True:
+            try:
+                future = self.requests.get_nowait()[0]
+            except queue.Empty:
+                return
+            if not future.done():
+                future.set_exception(RuntimeError("Recognition worker stopped"))
+    
+    def submit(self, frame, exam_code=None, timestamp=None):
+        """
+        Locate faces in the caller's thread and queue their chips for encoding
         
-        if len(distances) > 0:
-            best_match_idx = np.argmin(distances)
-            confidence = 1 - distances[best_match_idx]
-            
-            if matches[best_match_idx]:
-                sid = known_ids[best_match_idx]
-                sname = known_names[best_match_idx]
-                results.append((sid, sname, loc, confidence))
-            else:
-                # Unknown person
-                results.append(("unknown", "Unknown Person", loc, 0.0))
-        else:
-            results.append(("unknown", "Unknown Person", loc, 0.0))
+        Returns:
+            Future: resolves to (timestamp, recognize_student-style results)
+        """
+        if not self.running:
+            raise RuntimeError("Recognition worker stopped")
+        timestamp = time.time() if timestamp is None else timestamp
+        future = Future()
+        matcher = _gallery_for(exam_code)
+        rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        locations = _locate(rgb)
+        if not locations or len(matcher) == 0:
+            future.set_result((timestamp, _unknown_faces(locations)))
+            return future
+        
+        chips = []
+        for top, right, bottom, left in locations:
+            shape = face_recognition.api.pose_predictor_5_point(rgb, dlib.rectangle(left, top, right, bottom))
+            chips.append(dlib.get_face_chip(rgb, shape, size=150, padding=0.25))
+        self.start()
+        with self.lock:
+            if not self.running:
+                raise RuntimeError("Recognition worker stopped")
+            self.requests.put((future, timestamp, matcher, locations, chips))
+        return future
+    
+    def _run(self):
+        while not self.stop_event.is_set():
+            try:
+                batch = [self.requests.get(timeout=0.5)]
+            except queue.Empty:
+                continue
+            deadline = time.time() + self.max_wait
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self.requests.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            try:
+                self._process(batch)
+            except Exception as e:
+                logger.error(f"❌ Batched recognition failed: {e}")
+                for future, *_ in batch:
+                    if not future.done():
+                        future.set_exception(e)
+        self._drain()
+    
+    def _process(self, batch):
+        chips = [chip for _, _, _, _, frame_chips in batch for chip in frame_chips]
+        with metrics.timer("recognition.encode_batch"):
+            encodings = np.array(face_recognition.api.face_encoder.compute_face_descriptor(chips))
+        
+        # Split the encodings back per frame and match frames sharing a gallery together
+        by_gallery, start = {}, 0
+        for request in batch:
+            count = len(request[3])
+            by_gallery.setdefault(id(request[2]), []).append((request, encodings[start:start + count]))
+            start += count
+        
+        for members in by_gallery.values():
+            matcher = members[0][0][2]
+            matches = matcher.identify(np.concatenate([encs for _, encs in members]), tolerance=self.tolerance)
+            offset = 0
+            for (future, timestamp, _, locations, _), encs in members:
+                frame_matches = matches[offset:offset + len(encs)]
+                offset += len(encs)
+                future.set_result((timestamp, [
+                    (sid, sname, loc, confidence)
+                    for (sid, sname, confidence), loc in zip(frame_matches, locations)
+                ]))
+
+
+class TrackedRecognizer:
+    """
+    Carry recognized face boxes and identities across frames
+    
+    Full recognition (detection + encoding + matching) only runs when
+    recognize() is called; track() moves the last results with optical flow.
+    Callers re-anchor periodically or when needs_reanchor() is True.
+    
+    With a shared RecognitionWorker, encoding and matching are batched
+    with the other cameras; ``last_timestamp`` is the capture time of the
+    frame the latest results belong to.
+    """
+    
+    def __init__(self, tolerance=0.45, tracker_config=None, exam_code=None, worker=None):
+        self.tolerance = tolerance
+        self.exam_code = exam_code
+        self.worker = worker
+        self.tracker = FaceTracker(tracker_config)
+        self.last_timestamp = None
+    
+    def recognize(self, frame, timestamp=None):
+        """Run full recognition and re-anchor the tracks on its results"""
+        results = None
+        if self.worker is not None and self.worker.running:
+            try:
+                future = self.worker.submit(frame, self.exam_code, timestamp)
+                timestamp, results = future.result(timeout=self.worker.result_timeout)
+            except FutureTimeout:
+                logger.warning("⚠️  Batched recognition timed out, recognizing inline")
+            except Exception as e:
+                logger.warning(f"⚠️  Batched recognition failed ({e}), recognizing inline")
+        if results is None:
+            timestamp = time.time() if timestamp is None else timestamp
+            results = recognize_student(frame, tolerance=self.tolerance, exam_code=self.exam_code)
+        self.last_timestamp = timestamp
+        boxes = [(left, top, right, bottom) for _, _, (top, right, bottom, left), _ in results]
+        identities = [(sid, name, confidence) for sid, name, _, confidence in results]
+        self.tracker.reanchor(frame, boxes, identities)
+        return results
     
-    return results
+    def track(self, frame):
+        """Return the tracked results for this frame without running the recognizer"""
+        results = []
+        for track in self.tracker.update(frame):
+            sid, name, confidence = track.identity or ("unknown", "Unknown Person", 0.0)
+            left, top, right, bottom = (int(round(v)) for v in track.box)
+            results.append((sid, name, (top, right, bottom, left), confidence))
+        return results
+    
+    def needs_reanchor(self):
+        return self.tracker.needs_reanchor()
 
 
 def draw_face_boxes(frame, recognition_results):
@@ -142,13 +369,11 @@ def get_primary_student(recognition_results):
 
 def reload_students():
     """
-    Reload student data (call this if students.yaml changes)
+    Reload student data now instead of waiting for the next poll
     """
-    global known_encodings, known_ids, known_names
-    
     logger.info("Reloading student data...")
-    known_encodings, known_ids, known_names = load_students()
-    logger.info(f"Reloaded {len(known_encodings)} students")
+    gallery.refresh(force=True)
+    logger.info(f"Reloaded {len(gallery.matcher)} students")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,49 @@
+"""
+Face Locator - Face localisation on a downscaled frame
+Runs face_recognition's detector on a smaller image and maps the boxes back to full resolution
+"""
+
+import cv2
+import face_recognition
+
+
+def locate_faces(rgb, scale=1.0, upsample=1, model="hog"):
+    """
+    Find faces on a downscaled copy of the frame
+
+    The HOG detector's cost grows with the pixel count, so ``scale`` 0.5
+    makes it about four times cheaper. Each ``upsample`` pass doubles the
+    image inside the detector and lets it find faces half as large. Boxes
+    are returned in full-resolution pixels, so face_recognition.face_encodings
+    can take its landmarks and encodings from the full-resolution frame.
+
+    Args:
+        rgb: RGB image
+        scale: Detection scale in (0, 1]; 1 runs on the full frame
+        upsample: number_of_times_to_upsample passed to face_locations
+        model: "hog" (CPU) or "cnn" (dlib CUDA build)
+
+    Returns:
+        list: (top, right, bottom, left) tuples in full-resolution pixels
+    """
+    scale = scale if 0 < scale < 1 else 1.0
+    small = cv2.resize(rgb, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA) if scale != 1.0 else rgb
+    locations = face_recognition.face_locations(small, number_of_times_to_upsample=upsample, model=model)
+
+    h, w = rgb.shape[:2]
+    return [
+        (
+            max(0, int(top / scale)),
+            min(w, int(right / scale)),
+            min(h, int(bottom / scale)),
+            max(0, int(left / scale)),
+        )
+        for top, right, bottom, left in locations
+    ]
+
+
+def largest_face(locations):
+    """Largest (top, right, bottom, left) box, or None"""
+    if not locations:
+        return None
+    return max(locations, key=lambda l: (l[2] - l[0]) * (l[1] - l[3]))
@@ -0,0 +1,152 @@
+import itertools
+import cv2
+import numpy as np
+
+
+class FaceTrack:
+    """A face box (full-resolution x1, y1, x2, y2) carried across frames"""
+
+    def __init__(self, track_id, box, identity=None):
+        self.id = track_id
+        self.box = np.asarray(box, dtype=np.float32)
+        self.identity = identity
+        self.points = None
+        self.confidence = 1.0
+        self.age = 0
+
+
+class FaceTracker:
+    """Sparse optical-flow tracker that moves face boxes between detections.
+
+    Corner features inside each box are followed with pyramidal Lucas-Kanade
+    on a downscaled grayscale frame. A forward-backward check rejects bad
+    points. The box moves by the median point displacement and scales with
+    the median change in point spread. A track's confidence is the fraction
+    of its points that survive. A track seeded with fewer than
+    ``min_points`` corners is dropped without counting as lost. Heavy detectors only need to re-anchor the
+    tracks periodically or when ``needs_reanchor()`` reports a lost track.
+    """
+
+    def __init__(self, config=None):
+        config = config or {}
+        self.width = config.get('width', 480)
+        self.min_points = config.get('min_points', 6)
+        self.min_confidence = config.get('min_confidence', 0.5)
+        self.max_age = config.get('max_age', 30)
+        self.match_iou = config.get('match_iou', 0.3)
+        self.tracks = []
+        self.lost = False
+        self.prev_gray = None
+        self.scale = 1.0
+        self._ids = itertools.count(1)
+        self._lk_params = dict(
+            winSize=(15, 15),
+            maxLevel=2,
+            criteria=(cv2.TERM_CRITERIA_EPS | cv2.TERM_CRITERIA_COUNT, 10, 0.03)
+        )
+
+    def _gray(self, frame, pyramid=None):
+        if pyramid is not None:
+            # Reuse the frame's cached pyramid level
+            frame, self.scale = pyramid.level(self.width)
+        else:
+            h, w = frame.shape[:2]
+            self.scale = w / self.width if w > self.width else 1.0
+            if self.scale != 1.0:
+                frame = cv2.resize(frame, (self.width, max(1, int(h / self.scale))), interpolation=cv2.INTER_AREA)
+        return cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+
+    def _seed_points(self, gray, box):
+        x1, y1, x2, y2 = (box / self.scale).astype(int)
+        h, w = gray.shape[:2]
+        x1, y1 = max(x1, 0), max(y1, 0)
+        x2, y2 = min(x2, w), min(y2, h)
+        if x2 - x1 < 4 or y2 - y1 < 4:
+            return None
+        mask = np.zeros_like(gray)
+        mask[y1:y2, x1:x2] = 255
+        points = cv2.goodFeaturesToTrack(gray, maxCorners=40, qualityLevel=0.01, minDistance=3, mask=mask)
+        return points
+
+    @staticmethod
+    def _iou(a, b):
+        ix1, iy1 = max(a[0], b[0]), max(a[1], b[1])
+        ix2, iy2 = min(a[2], b[2]), min(a[3], b[3])
+        inter = max(0.0, ix2 - ix1) * max(0.0, iy2 - iy1)
+        union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+        return inter / union if union > 0 else 0.0
+
+    def reanchor(self, frame, boxes, identities=None, pyramid=None):
+        """Replace the tracks with fresh detector boxes, keeping track ids by IoU"""
+        gray = self._gray(frame, pyramid)
+        identities = identities if identities is not None else [None] * len(boxes)
+        previous = list(self.tracks)
+        tracks = []
+        for box, identity in zip(boxes, identities):
+            box = np.asarray(box, dtype=np.float32)
+            match = max(previous, key=lambda t: self._iou(t.box, box), default=None)
+            if match is not None and self._iou(match.box, box) >= self.match_iou:
+                previous.remove(match)
+                track = match
+                track.box = box
+                track.age = 0
+                track.confidence = 1.0
+                if identity is not None:
+                    track.identity = identity
+            else:
+                track = FaceTrack(next(self._ids), box, identity)
+            track.points = self._seed_points(gray, box)
+            tracks.append(track)
+
+        self.tracks = tracks
+        self.prev_gray = gray
+        self.lost = False
+        return self.tracks
+
+    def update(self, frame, pyramid=None):
+        """Move every track to the new frame; returns the surviving tracks"""
+        gray = self._gray(frame, pyramid)
+        if self.prev_gray is None or self.prev_gray.shape != gray.shape:
+            self.prev_gray = gray
+            return self.tracks
+
+        survivors = []
+        for track in self.tracks:
+            track.age += 1
+            if track.points is None or len(track.points) < self.min_points:
+                # Too few corners were seeded (typically a small face): there is
+                # nothing to follow, so drop the track without asking for a re-anchor
+                continue
+
+            new_points, status, _ = cv2.calcOpticalFlowPyrLK(self.prev_gray, gray, track.points, None, **self._lk_params)
+            back_points, back_status, _ = cv2.calcOpticalFlowPyrLK(gray, self.prev_gray, new_points, None, **self._lk_params)
+            fb_error = np.linalg.norm((track.points - back_points).reshape(-1, 2), axis=1)
+            good = (status.ravel() == 1) & (back_status.ravel() == 1) & (fb_error < 1.0)
+
+            track.confidence = float(np.count_nonzero(good)) / len(track.points)
+            if np.count_nonzero(good) < self.min_points or track.confidence < self.min_confidence:
+                self.lost = True
+                continue
+
+            old = track.points.reshape(-1, 2)[good]
+            new = new_points.reshape(-1, 2)[good]
+            shift = np.median(new - old, axis=0) * self.scale
+            old_spread = np.linalg.norm(old - old.mean(axis=0), axis=1)
+            new_spread = np.linalg.norm(new - new.mean(axis=0), axis=1)
+            valid = old_spread > 1e-3
+            zoom = float(np.median(new_spread[valid] / old_spread[valid])) if np.any(valid) else 1.0
+
+            cx, cy = (track.box[0] + track.box[2]) / 2 + shift[0], (track.box[1] + track.box[3]) / 2 + shift[1]
+            half_w = (track.box[2] - track.box[0]) * zoom / 2
+            half_h = (track.box[3] - track.box[1]) * zoom / 2
+            track.box = np.array([cx - half_w, cy - half_h, cx + half_w, cy + half_h], dtype=np.float32)
+            track.points = new.reshape(-1, 1, 2)
+            survivors.append(track)
+
+        self.tracks = survivors
+        self.prev_gray = gray
+        return self.tracks
+
+    def needs_reanchor(self):
+        """True when a track was lost or has been coasting for too long"""
+        return self.lost or any(track.age >= self.max_age for track in self.tracks)
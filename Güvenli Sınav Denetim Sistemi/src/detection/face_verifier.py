@@ -0,0 +1,110 @@
+"""
+Face Verification Module
+1:1 check that the person at the webcam is the enrolled student
+"""
+
+import time
+import logging
+
+import cv2
+import face_recognition
+import numpy as np
+
+from src.utils.student_loader import load_student_encoding
+from src.detection.face_tracker import FaceTracker
+from src.detection.face_locator import locate_faces, largest_face
+
+logger = logging.getLogger(__name__)
+
+
+class FaceVerifier:
+    """
+    Verify a single enrolled student instead of searching the whole roster
+    
+    Only the enrolled student's encoding is loaded. Between checks, the
+    face box is followed with optical flow, which is cheap. The dlib
+    encoder runs only every ``encode_interval`` seconds, when the tracked
+    box has moved away from where it was last encoded (IoU below
+    ``box_change_iou``), or when the track is lost. A track that is merely
+    old waits for ``encode_interval``. While no face is visible, the
+    locator runs at most every ``locate_interval`` seconds.
+    ``wrong_student`` is set when the distance to the enrolled encoding
+    exceeds ``threshold``.
+    """
+    
+    def __init__(self, student_id, threshold=0.5, encode_interval=3.0, box_change_iou=0.5,
+                 detect_scale=0.5, upsample=1, locate_interval=0.5, tracker_config=None):
+        self.student_id = student_id
+        self.reference, self.student_name = load_student_encoding(student_id)
+        if self.reference is None:
+            raise ValueError(f"No face encoding available for student {student_id}")
+        self.reference = np.asarray(self.reference, dtype=np.float64)
+        self.threshold = threshold
+        self.encode_interval = encode_interval
+        self.box_change_iou = box_change_iou
+        self.detect_scale = detect_scale
+        self.upsample = upsample
+        self.locate_interval = locate_interval
+        self.tracker = FaceTracker(tracker_config)
+        
+        self.last_encode_time = 0.0
+        self.last_encode_box = None
+        self.last_locate_time = 0.0
+        self.distance = None
+        self.wrong_student = False
+        self.checked = False   # True if the encoder ran on the last frame
+    
+    def _locate_face(self, rgb):
+        """Largest face as (top, right, bottom, left) in full-resolution pixels, or None"""
+        return largest_face(locate_faces(rgb, self.detect_scale, self.upsample))
+    
+    def _needs_encoding(self, box, now):
+        if box is None or self.last_encode_box is None:
+            return True
+        if now - self.last_encode_time >= self.encode_interval:
+            return True
+        return FaceTracker._iou(box, self.last_encode_box) < self.box_change_iou
+    
+    def verify(self, frame):
+        """
+        Check the frame against the enrolled student
+        
+        Returns:
+            list: recognize_student-style results, [(student_id, name, location, confidence)]
+                  for the face at the camera, or [] when no face is visible
+        """
+        now = time.time()
+        self.checked = False
+        tracks = self.tracker.update(frame)
+        # Only a lost track (or one failing the forward-backward check) forces an
+        # early re-encode; the track's age is left to encode_interval
+        box = tracks[0].box if tracks and not self.tracker.lost else None
+        
+        if self._needs_encoding(box, now):
+            if self.last_encode_box is None and now - self.last_locate_time < self.locate_interval:
+                # No face at the last look
+                return []
+            rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+            self.last_locate_time = now
+            location = self._locate_face(rgb)
+            if location is None:
+                self.tracker.reanchor(frame, [])
+                self.last_encode_box = None
+                return []
+            
+            encodings = face_recognition.face_encodings(rgb, [location])
+            top, right, bottom, left = location
+            box = np.array([left, top, right, bottom], dtype=np.float32)
+            self.tracker.reanchor(frame, [box])
+            self.last_encode_time = now
+            self.last_encode_box = box
+            self.checked = True
+            if encodings:
+                self.distance = float(np.linalg.norm(encodings[0] - self.reference))
+                self.wrong_student = self.distance > self.threshold
+        
+        left, top, right, bottom = (int(round(v)) for v in box)
+        location = (top, right, bottom, left)
+        if self.wrong_student:
+            return [("unknown", "Unknown Person", location, 0.0)]
+        return [(self.student_id, self.student_name, location, 1.0 - (self.distance or 0.0))]
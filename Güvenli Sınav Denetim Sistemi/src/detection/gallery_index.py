@@ -0,0 +1,204 @@
+"""
+Gallery Index - Approximate nearest-neighbour search for large rosters
+Inverted-file (IVF) index over the student gallery, trained offline from the encoding cache
+
+Build the index (from the project root):
+    python -m src.detection.gallery_index --nlist 256
+"""
+
+import argparse
+import logging
+import os
+from pathlib import Path
+
+import numpy as np
+
+from .gallery_matcher import GalleryMatcher
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = Path(__file__).resolve().parents[2]
+DEFAULT_INDEX_PATH = BASE_DIR / "cache" / "gallery_ivf.npz"
+
+
+def _nearest_centroid(encodings, centroids, chunk_size=8192):
+    """Index of the closest centroid for every row (computed in chunks to bound memory)"""
+    c_norms = np.einsum('ij,ij->i', centroids, centroids)
+    labels = np.empty(len(encodings), dtype=np.int64)
+    for start in range(0, len(encodings), chunk_size):
+        block = encodings[start:start + chunk_size]
+        # ||x||^2 is the same for every centroid, so it can be left out of the argmin
+        labels[start:start + chunk_size] = np.argmin(c_norms[None, :] - 2.0 * (block @ centroids.T), axis=1)
+    return labels
+
+
+def train_centroids(encodings, nlist, iterations=20, seed=0):
+    """Plain k-means on the gallery; returns (nlist, 128) float32 centroids"""
+    encodings = np.asarray(encodings, dtype=np.float32)
+    nlist = max(1, min(int(nlist), len(encodings)))
+    rng = np.random.default_rng(seed)
+    centroids = encodings[rng.choice(len(encodings), nlist, replace=False)].copy()
+    for _ in range(iterations):
+        labels = _nearest_centroid(encodings, centroids)
+        counts = np.bincount(labels, minlength=nlist)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, labels, encodings)
+        empty = counts == 0
+        centroids[~empty] = sums[~empty] / counts[~empty, None]
+        if np.any(empty):
+            # Re-seed empty lists with random gallery rows
+            centroids[empty] = encodings[rng.choice(len(encodings), int(empty.sum()), replace=False)]
+    return centroids
+
+
+def default_nlist(gallery_size):
+    """Roughly 4 * sqrt(N) lists, the usual IVF starting point"""
+    return max(1, int(4 * np.sqrt(max(gallery_size, 1))))
+
+
+def save_centroids(centroids, path=None):
+    path = Path(path or DEFAULT_INDEX_PATH)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(path.name + ".tmp")
+    with open(tmp_path, "wb") as f:
+        np.savez(f, centroids=np.asarray(centroids, dtype=np.float32))
+    os.replace(tmp_path, path)
+
+
+def load_centroids(path=None):
+    path = Path(path or DEFAULT_INDEX_PATH)
+    if not path.exists():
+        return None
+    with np.load(path, allow_pickle=False) as data:
+        return data["centroids"].astype(np.float32)
+
+
+class IVFGalleryMatcher(GalleryMatcher):
+    """
+    GalleryMatcher backed by an inverted-file index
+    
+    Gallery rows are grouped by their nearest k-means centroid. A query
+    is compared only with the rows of its ``nprobe`` nearest lists, so
+    raising nprobe trades latency for recall. Distances to those
+    candidates are exact. A registered student whose encoding sits in an
+    unprobed list is reported as unknown; raise nprobe to make that rarer.
+    ``exact_fallback`` re-checks every face the index rejects against the
+    full gallery, which removes those misses but costs a brute-force scan
+    per unknown face, and unknown faces are common (visitors, proctors,
+    bad angles). It is off by default for that reason.
+    
+    Centroids are trained offline (see the module docstring) and stay
+    valid as students are added. New rows simply join their nearest
+    list. Retrain when the roster changes substantially.
+    """
+    
+    def __init__(self, encodings=None, ids=None, names=None, centroids=None, nprobe=8, exact_fallback=False):
+        self.centroids = None if centroids is None else np.ascontiguousarray(centroids, dtype=np.float32)
+        self.nprobe = nprobe
+        self.exact_fallback = exact_fallback
+        super().__init__(encodings, ids, names)
+    
+    def set_gallery(self, encodings, ids, names):
+        super().set_gallery(encodings, ids, names)
+        if len(self) == 0:
+            self.list_rows = np.zeros(0, dtype=np.int64)
+            self.list_offsets = np.zeros(1, dtype=np.int64)
+            return
+        if self.centroids is None:
+            logger.warning("⚠️  No trained IVF centroids found, training on the current gallery")
+            self.centroids = train_centroids(self.encodings, default_nlist(len(self)))
+        labels = _nearest_centroid(self.encodings, self.centroids)
+        self.list_rows = np.argsort(labels, kind='stable')
+        self.list_offsets = np.searchsorted(labels[self.list_rows], np.arange(len(self.centroids) + 1))
+        self.c_norms = np.einsum('ij,ij->i', self.centroids, self.centroids)
+    
+    def search(self, queries, k=1):
+        queries = np.asarray(queries, dtype=np.float32).reshape(-1, 128)
+        if len(self) == 0 or self.nprobe >= len(self.centroids):
+            return super().search(queries, k)
+        
+        k = min(k, len(self))
+        out_d = np.full((len(queries), k), np.inf, dtype=np.float32)
+        out_i = np.full((len(queries), k), -1, dtype=np.int64)
+        probe_scores = self.c_norms[None, :] - 2.0 * (queries @ self.centroids.T)
+        probes = np.argpartition(probe_scores, self.nprobe - 1, axis=1)[:, :self.nprobe]
+        
+        for q, (query, lists) in enumerate(zip(queries, probes)):
+            rows = np.concatenate([self.list_rows[self.list_offsets[c]:self.list_offsets[c + 1]] for c in lists])
+            if len(rows) == 0:
+                continue
+            candidates = self.encodings[rows]
+            sq = float(query @ query) + self.sq_norms[rows] - 2.0 * (candidates @ query)
+            dist = np.sqrt(np.maximum(sq, 0.0))
+            n = min(k, len(rows))
+            best = np.argpartition(dist, n - 1)[:n] if n < len(rows) else np.arange(len(rows))
+            best = best[np.argsort(dist[best])]
+            out_d[q, :n] = dist[best]
+            out_i[q, :n] = rows[best]
+        return out_d, out_i
+    
+    def top_k(self, queries, k=5):
+        # Probed lists may hold fewer than k rows; drop the padding
+        return [[match for match in row if np.isfinite(match[2])] for row in super().top_k(queries, k)]
+    
+    def identify(self, queries, tolerance=0.45):
+        results = super().identify(queries, tolerance)
+        if self.exact_fallback:
+            queries = np.asarray(queries, dtype=np.float32).reshape(-1, 128)
+            rejected = [i for i, result in enumerate(results) if result[0] == "unknown"]
+            if rejected:
+                exact = GalleryMatcher.search(self, queries[rejected], k=1)
+                for i, row_d, row_i in zip(rejected, *exact):
+                    if len(row_i) and row_d[0] <= tolerance:
+                        j = int(row_i[0])
+                        results[i] = (self.ids[j], self.names[j], 1.0 - float(row_d[0]))
+        return results
+
+
+def create_matcher(encodings, ids, names, config=None):
+    """
+    Matcher for the recognition.index settings in config.yaml
+    
+    The exact GalleryMatcher is used unless ``backend: ivf`` is set and
+    the gallery has at least ``min_gallery_size`` students. Below that
+    size, brute force is already cheap. ``exact_fallback: true`` trades
+    the IVF speed-up on unknown faces for exact recall (see
+    IVFGalleryMatcher).
+    """
+    config = config or {}
+    if config.get('backend', 'exact') != 'ivf' or len(ids) < config.get('min_gallery_size', 5000):
+        return GalleryMatcher(encodings, ids, names)
+    path = config.get('path')
+    if path and not Path(path).is_absolute():
+        path = BASE_DIR / path
+    return IVFGalleryMatcher(
+        encodings, ids, names,
+        centroids=load_centroids(path),
+        nprobe=config.get('nprobe', 8),
+        exact_fallback=config.get('exact_fallback', False),
+    )
+
+
+def main(argv=None):
+    from src.utils.encoding_cache import EncodingCache
+    
+    parser = argparse.ArgumentParser(description="Train the IVF gallery index from the face encoding cache")
+    parser.add_argument('--cache', default=None, help="encoding cache (default: cache/face_encodings.npz)")
+    parser.add_argument('--output', default=None, help="index file (default: cache/gallery_ivf.npz)")
+    parser.add_argument('--nlist', type=int, default=None, help="number of lists (default: 4 * sqrt(N))")
+    parser.add_argument('--iterations', type=int, default=20)
+    args = parser.parse_args(argv)
+    
+    logging.basicConfig(level=logging.INFO)
+    encodings, _ = EncodingCache(args.cache).matrix()
+    if len(encodings) == 0:
+        raise SystemExit("Encoding cache is empty; run the student loader first")
+    nlist = args.nlist or default_nlist(len(encodings))
+    logger.info(f"Training {nlist} lists on {len(encodings)} encodings...")
+    centroids = train_centroids(encodings, nlist, iterations=args.iterations)
+    save_centroids(centroids, args.output)
+    logger.info(f"✅ Index saved to {args.output or DEFAULT_INDEX_PATH}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Gallery Matcher - Vectorized face matching
+Matches face encodings against the student gallery with one matrix operation
+"""
+
+import numpy as np
+
+UNKNOWN = ("unknown", "Unknown Person")
+
+
+class GalleryMatcher:
+    """
+    Student gallery held as one contiguous float32 matrix
+    
+    Squared norms of the gallery rows are precomputed, so the Euclidean
+    distances from every face in a frame to every student come from a
+    single matrix product:
+    ||q - g||^2 = ||q||^2 + ||g||^2 - 2 q.g
+    This is the same distance face_recognition.face_distance computes.
+    """
+    
+    def __init__(self, encodings=None, ids=None, names=None):
+        self.set_gallery(encodings if encodings is not None else [], ids or [], names or [])
+    
+    def set_gallery(self, encodings, ids, names):
+        encodings = np.ascontiguousarray(np.asarray(encodings, dtype=np.float32).reshape(-1, 128))
+        if not (len(encodings) == len(ids) == len(names)):
+            raise ValueError("encodings, ids and names must have the same length")
+        self.encodings = encodings
+        self.sq_norms = np.einsum('ij,ij->i', encodings, encodings)
+        self.ids = list(ids)
+        self.names = list(names)
+    
+    def __len__(self):
+        return len(self.ids)
+    
+    def subset(self, ids):
+        """Exact matcher over the rows whose student id is in ``ids`` (e.g. one exam's students)"""
+        wanted = set(ids)
+        rows = [i for i, sid in enumerate(self.ids) if sid in wanted]
+        return GalleryMatcher(
+            self.encodings[rows],
+            [self.ids[i] for i in rows],
+            [self.names[i] for i in rows],
+        )
+    
+    def distances(self, queries):
+        """(M, N) Euclidean distances from M query encodings to the N gallery rows"""
+        queries = np.asarray(queries, dtype=np.float32).reshape(-1, 128)
+        sq = np.einsum('ij,ij->i', queries, queries)[:, None] + self.sq_norms[None, :] - 2.0 * (queries @ self.encodings.T)
+        return np.sqrt(np.maximum(sq, 0.0, out=sq), out=sq)
+    
+    def search(self, queries, k=1):
+        """
+        Top-k gallery rows for each query
+        
+        Returns:
+            tuple: (distances, indices), both (M, k) and sorted nearest first
+        """
+        queries = np.asarray(queries, dtype=np.float32).reshape(-1, 128)
+        k = min(k, len(self))
+        if k == 0 or len(queries) == 0:
+            return np.zeros((len(queries), 0), np.float32), np.zeros((len(queries), 0), np.int64)
+        dist = self.distances(queries)
+        if k < dist.shape[1]:
+            idx = np.argpartition(dist, k - 1, axis=1)[:, :k]
+        else:
+            idx = np.tile(np.arange(dist.shape[1]), (len(queries), 1))
+        part = np.take_along_axis(dist, idx, axis=1)
+        order = np.argsort(part, axis=1)
+        return np.take_along_axis(part, order, axis=1), np.take_along_axis(idx, order, axis=1)
+    
+    def top_k(self, queries, k=5):
+        """Top-k (student_id, student_name, distance) lists, one per query"""
+        distances, indices = self.search(queries, k)
+        return [
+            [(self.ids[i], self.names[i], float(d)) for d, i in zip(row_d, row_i)]
+            for row_d, row_i in zip(distances, indices)
+        ]
+    
+    def identify(self, queries, tolerance=0.45):
+        """
+        Best match for each query
+        
+        Returns:
+            list: (student_id, student_name, confidence) per query;
+                  unknown faces get ("unknown", "Unknown Person", 0.0)
+        """
+        distances, indices = self.search(queries, k=1)
+        results = []
+        for row_d, row_i in zip(distances, indices):
+            if len(row_i) and row_d[0] <= tolerance:
+                i = int(row_i[0])
+                results.append((self.ids[i], self.names[i], 1.0 - float(row_d[0])))
+            else:
+                results.append(UNKNOWN + (0.0,))
+        return results
@@ -0,0 +1,209 @@
+"""
+Gallery Service - Hot-reloadable recognition gallery
+Watches students.yaml and the students DB and swaps in a new matcher when they change
+"""
+
+import logging
+import os
+import sqlite3
+import threading
+
+import numpy as np
+import yaml
+
+from src.utils.encoding_cache import EncodingCache
+from src.utils.student_loader import _photo_encoding
+from .gallery_index import create_matcher
+
+logger = logging.getLogger(__name__)
+
+
+def _file_signature(path):
+    """(mtime, size) of a file, or None if it does not exist"""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+class GalleryService:
+    """
+    Student gallery that follows config/students.yaml and the students DB
+
+    Students come from two places:
+    - students.yaml, where each entry points to a photo
+    - the Reflex students.db, whose rows carry a face_encoding BLOB
+    If a student id is in both, the students.yaml entry wins.
+
+    refresh() only does work when one of the files changed. Photos are
+    re-encoded only when the entry's path, mtime or size changed, and
+    those go through the encoding cache. The matcher is rebuilt off to
+    the side and published by rebinding ``self.matcher``. Callers read
+    ``service.matcher`` once per recognition, so a recognition in flight
+    keeps using the matcher it started with.
+
+    With ``poll_interval`` > 0, start() polls the files on a daemon thread.
+    """
+
+    def __init__(self, students_path="config/students.yaml", students_db=None,
+                 index_config=None, poll_interval=5.0, on_swap=None):
+        self.students_path = students_path
+        self.students_db = students_db
+        self.index_config = index_config or {}
+        self.poll_interval = poll_interval
+        self.on_swap = on_swap
+        self.matcher = create_matcher([], [], [], self.index_config)
+        self.photo_entries = {}   # student id -> ((photo, mtime, size), name, encoding or None)
+        self.db_entries = {}      # student id -> (name, encoding)
+        self.signatures = (None, None)
+        self.lock = threading.Lock()
+        self.thread = None
+        self.stop_event = threading.Event()
+
+    def _read_yaml(self):
+        """students.yaml entries as a list of dicts (empty if unavailable)"""
+        try:
+            with open(self.students_path, "r", encoding="utf-8") as f:
+                data = yaml.safe_load(f) or {}
+            return data.get("students") or []
+        except Exception as e:
+            logger.error(f"❌ Error reading {self.students_path}: {e}")
+            return []
+
+    def _read_db(self):
+        """{student id: (name, encoding)} from the students DB (empty if unavailable)"""
+        if not self.students_db or not os.path.exists(self.students_db):
+            return {}
+        conn = sqlite3.connect(self.students_db)
+        try:
+            rows = conn.execute(
+                "SELECT student_id, name, face_encoding FROM students WHERE face_encoding IS NOT NULL"
+            ).fetchall()
+        except Exception as e:
+            logger.error(f"❌ Error reading {self.students_db}: {e}")
+            return {}
+        finally:
+            conn.close()
+
+        entries = {}
+        for sid, name, blob in rows:
+            encoding = np.frombuffer(blob, dtype=np.float64)
+            if encoding.size == 128:
+                entries[sid] = (name, encoding)
+        return entries
+
+    def _update_photos(self, students):
+        """
+        Photo entries for the current students.yaml, re-encoding only what changed
+
+        Returns:
+            tuple: (entries, number of students added or changed, number removed)
+        """
+        entries, changed = {}, 0
+        cache = None
+        for student in students:
+            sid = student.get("id", "unknown")
+            name = student.get("name", "Unknown")
+            img_path = student.get("photo", "")
+            signature = _file_signature(img_path) if img_path else None
+            if signature is None:
+                continue
+
+            key = (img_path,) + signature
+            previous = self.photo_entries.get(sid)
+            if previous is not None and previous[0] == key:
+                entries[sid] = (key, name, previous[2])
+                changed += previous[1] != name
+                continue
+
+            if cache is None:
+                cache = EncodingCache()
+            try:
+                encoding, _ = _photo_encoding(img_path, cache, sid)
+            except Exception as e:
+                logger.error(f"❌ Error processing {img_path} for {name}: {e}")
+                continue
+            if encoding is None:
+                logger.warning(f"⚠️  No face detected in photo: {img_path} for {name}")
+            entries[sid] = (key, name, encoding)
+            changed += 1
+
+        if cache is not None:
+            try:
+                cache.save(prune=False)
+            except Exception as e:
+                logger.warning(f"⚠️  Could not save encoding cache: {e}")
+        removed = len(set(self.photo_entries) - set(entries))
+        return entries, changed, removed
+
+    def refresh(self, force=False):
+        """
+        Apply changes in students.yaml and the students DB
+
+        Returns:
+            bool: True if a new matcher was published
+        """
+        with self.lock:
+            signatures = (_file_signature(self.students_path), _file_signature(self.students_db) if self.students_db else None)
+            if not force and signatures == self.signatures:
+                return False
+
+            photo_entries, changed, removed = self.photo_entries, 0, 0
+            if force or signatures[0] != self.signatures[0]:
+                photo_entries, changed, removed = self._update_photos(self._read_yaml())
+
+            db_entries = self.db_entries
+            if force or signatures[1] != self.signatures[1]:
+                db_entries = self._read_db()
+                old, new = set(self.db_entries), set(db_entries)
+                removed += len(old - new)
+                changed += sum(
+                    1 for sid in new
+                    if sid not in old or self.db_entries[sid][0] != db_entries[sid][0]
+                    or not np.array_equal(self.db_entries[sid][1], db_entries[sid][1])
+                )
+
+            self.signatures = signatures
+            if not force and not changed and not removed:
+                return False
+
+            encodings, ids, names = [], [], []
+            for sid, (_, name, encoding) in photo_entries.items():
+                if encoding is not None:
+                    encodings.append(encoding)
+                    ids.append(sid)
+                    names.append(name)
+            for sid, (name, encoding) in db_entries.items():
+                if sid not in photo_entries:
+                    encodings.append(encoding)
+                    ids.append(sid)
+                    names.append(name)
+
+            matcher = create_matcher(encodings, ids, names, self.index_config)
+            self.photo_entries = photo_entries
+            self.db_entries = db_entries
+            self.matcher = matcher
+
+        logger.info(f"Gallery updated: {len(matcher)} student(s) ({changed} added/changed, {removed} removed)")
+        if self.on_swap is not None:
+            self.on_swap(matcher)
+        return True
+
+    def start(self):
+        """Poll for changes every ``poll_interval`` seconds on a daemon thread"""
+        if self.thread is not None or not self.poll_interval or self.poll_interval <= 0:
+            return
+
+        def _run():
+            while not self.stop_event.wait(self.poll_interval):
+                try:
+                    self.refresh()
+                except Exception as e:
+                    logger.error(f"❌ Gallery refresh failed: {e}")
+
+        self.thread = threading.Thread(target=_run, name="gallery-service", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
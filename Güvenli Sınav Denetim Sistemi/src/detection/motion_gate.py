@@ -0,0 +1,77 @@
+import time
+import cv2
+import numpy as np
+
+
+class MotionGate:
+    """Cheap scene-change check used to skip heavy detectors on static scenes.
+
+    Each frame is reduced to a small blurred grayscale image and compared to
+    a running-average background. The scene counts as changed when more than
+    ``min_changed_ratio`` of the pixels inside the optional ``regions``
+    (normalized [x1, y1, x2, y2] boxes) differ by more than ``pixel_threshold``.
+    A detector is still forced to run once its last run is older than
+    ``max_staleness`` seconds.
+    """
+
+    def __init__(self, config=None):
+        config = config or {}
+        self.enabled = config.get('enabled', False)
+        self.width = config.get('width', 160)
+        self.pixel_threshold = config.get('pixel_threshold', 25)
+        self.min_changed_ratio = config.get('min_changed_ratio', 0.01)
+        self.max_staleness = config.get('max_staleness', 5.0)
+        self.background_alpha = config.get('background_alpha', 0.05)
+        self.regions = config.get('regions') or []
+        self.background = None
+        self.mask = None
+        self.changed = True
+        self.changed_ratio = 1.0
+        self.last_run = {}
+
+    def _prepare(self, frame):
+        h, w = frame.shape[:2]
+        if w > self.width:
+            frame = cv2.resize(frame, (self.width, max(1, int(h * self.width / w))), interpolation=cv2.INTER_AREA)
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+        return cv2.GaussianBlur(gray, (5, 5), 0)
+
+    def _build_mask(self, shape):
+        if not self.regions:
+            return None
+        h, w = shape
+        mask = np.zeros(shape, dtype=bool)
+        for x1, y1, x2, y2 in self.regions:
+            mask[int(y1 * h):int(np.ceil(y2 * h)), int(x1 * w):int(np.ceil(x2 * w))] = True
+        return mask
+
+    def update(self, frame):
+        """Feed a BGR frame (full size or already downscaled); returns True if the scene changed"""
+        if not self.enabled:
+            self.changed = True
+            return True
+
+        small = self._prepare(frame)
+        if self.background is None or self.background.shape != small.shape:
+            self.background = small.astype(np.float32)
+            self.mask = self._build_mask(small.shape)
+            self.changed, self.changed_ratio = True, 1.0
+            return True
+
+        diff = cv2.absdiff(small, cv2.convertScaleAbs(self.background)) > self.pixel_threshold
+        if self.mask is not None:
+            diff = diff[self.mask]
+        self.changed_ratio = float(np.count_nonzero(diff)) / max(1, diff.size)
+        self.changed = self.changed_ratio >= self.min_changed_ratio
+        cv2.accumulateWeighted(small, self.background, self.background_alpha)
+        return self.changed
+
+    def should_run(self, name, now=None):
+        """True if detector ``name`` must run: the scene changed or its result is stale"""
+        if not self.enabled or self.changed:
+            return True
+        now = now or time.time()
+        return now - self.last_run.get(name, 0.0) >= self.max_staleness
+
+    def mark_run(self, name, now=None):
+        self.last_run[name] = now or time.time()
@@ -1,15 +1,12 @@
-import cv2
-import mediapipe as mp
-import numpy as np
+from .face_analysis import FaceAnalyzer
+try:
+    from utils.metrics import timed
+except ImportError:  # imported as src.detection.* from the project root
+    from src.utils.metrics import timed
 
 class MouthMonitor:
-    def __init__(self, config):
-        self.mp_face_mesh = mp.solutions.face_mesh
-        self.face_mesh = self.mp_face_mesh.FaceMesh(
-            max_num_faces=1,
-            refine_landmarks=True,
-            min_detection_confidence=0.5,
-            min_tracking_confidence=0.5)
+    def __init__(self, config, analyzer=None):
+        self.analyzer = analyzer or FaceAnalyzer(config)
             
         self.mouth_threshold = config['detection']['mouth']['movement_threshold']
         self.mouth_movement_count = 0
@@ -19,13 +16,14 @@ class MouthMonitor:
     def set_alert_logger(self, alert_logger):
         self.alert_logger = alert_logger
         
-    def monitor_mouth(self, frame):
-        results = self.face_mesh.process(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+    @timed('detector.mouth')
+    def monitor_mouth(self, frame, analysis=None):
+        if analysis is None:
+            analysis = self.analyzer.analyze(frame)
+        landmarks = analysis.landmarks
         
-        if not results.multi_face_landmarks:
+        if landmarks is None:
             return False
-            
-        face_landmarks = results.multi_face_landmarks[0]
         
         # Get mouth landmarks (using more points for better accuracy)
         mouth_points = [
@@ -38,13 +36,13 @@ class MouthMonitor:
         ]
         
         # Calculate mouth openness
-        upper_lip = face_landmarks.landmark[13].y
-        lower_lip = face_landmarks.landmark[14].y
+        upper_lip = landmarks[13, 1]
+        lower_lip = landmarks[14, 1]
         mouth_open = lower_lip - upper_lip
         
         # Calculate mouth width
-        right_corner = face_landmarks.landmark[78].x
-        left_corner = face_landmarks.landmark[306].x
+        right_corner = landmarks[78, 0]
+        left_corner = landmarks[306, 0]
         mouth_width = abs(right_corner - left_corner)
         
         if mouth_open > 0.03 or mouth_width > 0.2:  # Thresholds for mouth movement
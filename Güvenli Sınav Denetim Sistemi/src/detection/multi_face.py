@@ -1,17 +1,12 @@
-import cv2
-import torch
-from facenet_pytorch import MTCNN
+from .face_analysis import FaceAnalyzer
+try:
+    from utils.metrics import timed
+except ImportError:  # imported as src.detection.* from the project root
+    from src.utils.metrics import timed
 
 class MultiFaceDetector:
-    def __init__(self, config):
-        self.device = torch.device('cuda:0' if torch.cuda.is_available() else 'cpu')
-        self.detector = MTCNN(
-            keep_all=True,
-            post_process=False,
-            min_face_size=40,
-            thresholds=[0.6, 0.7, 0.7],
-            device=self.device
-        )
+    def __init__(self, config, analyzer=None):
+        self.analyzer = analyzer or FaceAnalyzer(config)
         self.threshold = config['detection']['multi_face']['alert_threshold']
         self.consecutive_frames = 0
         self.alert_logger = None
@@ -19,9 +14,11 @@ class MultiFaceDetector:
     def set_alert_logger(self, alert_logger):
         self.alert_logger = alert_logger
 
-    def detect_multiple_faces(self, frame):
-        rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        boxes, probs = self.detector.detect(rgb_frame)
+    @timed('detector.multi_face')
+    def detect_multiple_faces(self, frame, analysis=None):
+        if analysis is None:
+            analysis = self.analyzer.analyze(frame)
+        boxes, probs = analysis.faces()
         
         if boxes is not None and len(boxes) > 1:
             # Count faces with high confidence
@@ -75,19 +75,29 @@ import cv2
 import torch
 from ultralytics import YOLO
 from datetime import datetime
+try:
+    from utils.metrics import timed
+except ImportError:  # imported as src.detection.* from the project root
+    from src.utils.metrics import timed
 
 class ObjectDetector:
-    def __init__(self, config):
+    def __init__(self, config, model=None):
         self.config = config['detection']['objects']
-        self.model = None
+        # Pass an already loaded YOLO model to share it between video streams
+        self.model = model
         self.class_map = {
             73: 'book',
             67: 'cell phone'
         }
         self.alert_logger = None
         self.detection_interval = self.config['detection_interval']
+        self.max_fps = self.config['max_fps']
+        if config['detection'].get('scheduler', {}).get('enabled'):
+            # DetectorScheduler decides when to run; don't rate-limit here too
+            self.max_fps = None
         self.frame_count = 0
-        self._initialize_model()
+        if self.model is None:
+            self._initialize_model()
         self.last_detection_time = datetime.now()
 
     def _initialize_model(self):
@@ -114,24 +124,48 @@ class ObjectDetector:
     def set_alert_logger(self, alert_logger):
         self.alert_logger = alert_logger
 
-    def detect_objects(self, frame, visualize=False):
-        """Optimized object detection with frame skipping"""
+    def is_due(self):
+        """False while max_fps rate limiting says to skip this frame"""
+        time_since_last = (datetime.now() - self.last_detection_time).total_seconds()
+        return not (self.max_fps and time_since_last < (1.0 / self.max_fps))
+
+    def prepare_input(self, frame, analysis=None):
+        """Resize frame for faster processing (maintaining aspect ratio)"""
+        new_w = 320
+        if analysis is not None:
+            # Reuse the shared pyramid level instead of resizing the full frame again
+            resized_frame, _ = analysis.pyramid.level(new_w)
+        else:
+            orig_h, orig_w = frame.shape[:2]
+            resized_frame = cv2.resize(frame, (new_w, int(orig_h * (new_w / orig_w))))
+        return resized_frame
+
+    @timed('model.yolo_batch')
+    def predict_batch(self, images):
+        """Run YOLO once on several prepared inputs; returns one result per image"""
+        return self.model(list(images), verbose=False)
+
+    @timed('detector.objects')
+    def detect_objects(self, frame, visualize=False, analysis=None, results=None):
+        """Optimized object detection with frame skipping.
+
+        ``results`` are YOLO results already computed for this frame, for
+        example by ``predict_batch``. When given, inference is skipped.
+        """
         current_time = datetime.now()
-        time_since_last = (current_time - self.last_detection_time).total_seconds()
         
         # Skip detection if not enough time has passed
-        if time_since_last < (1.0 / self.config['max_fps']):
+        if results is None and not self.is_due():
             return False
             
         try:
-            # Resize frame for faster processing (maintaining aspect ratio)
             orig_h, orig_w = frame.shape[:2]
-            new_w = 320
-            new_h = int(orig_h * (new_w / orig_w))
-            resized_frame = cv2.resize(frame, (new_w, new_h))
+            resized_frame = self.prepare_input(frame, analysis)
+            new_h, new_w = resized_frame.shape[:2]
             
             # Run inference
-            results = self.model(resized_frame, verbose=False)  # Disable logging
+            if results is None:
+                results = self.model(resized_frame, verbose=False)  # Disable logging
             
             detected = False
             for result in results:
@@ -0,0 +1,48 @@
+import cv2
+
+
+class FramePyramid:
+    """Downscaled views of one frame, built on demand and cached.
+
+    Each detector asks for the width it needs. A level is resized from the
+    smallest cached level that is still wider, so a 4K frame is read in full
+    at most once per frame.
+    """
+
+    def __init__(self, frame):
+        self.frame = frame
+        self.height, self.width = frame.shape[:2]
+        self.levels = {self.width: frame}
+
+    def level(self, width):
+        """Return (image, scale) where full-resolution coords = image coords * scale"""
+        width = int(width)
+        if width >= self.width:
+            return self.frame, 1.0
+        if width not in self.levels:
+            source_width = min(w for w in self.levels if w > width)
+            source = self.levels[source_width]
+            height = max(1, int(round(self.height * width / self.width)))
+            self.levels[width] = cv2.resize(source, (width, height), interpolation=cv2.INTER_AREA)
+        return self.levels[width], self.width / width
+
+    def crop(self, box, size, margin=0.4):
+        """Crop a square region around a full-resolution (x1, y1, x2, y2) box.
+
+        The crop is resized to ``size`` x ``size`` pixels, upscaling small faces.
+        Returns (image, (x0, y0, side)), where (x0, y0) and side are the crop's
+        origin and edge length in full-resolution pixels. Returns (None, None)
+        when the box does not overlap the frame.
+        """
+        x1, y1, x2, y2 = box
+        cx, cy = (x1 + x2) / 2.0, (y1 + y2) / 2.0
+        side = max(x2 - x1, y2 - y1) * (1.0 + 2 * margin)
+        side = int(min(max(side, 1), self.width, self.height))
+        x0 = int(min(max(cx - side / 2.0, 0), self.width - side))
+        y0 = int(min(max(cy - side / 2.0, 0), self.height - side))
+        if side <= 1:
+            return None, None
+
+        region = self.frame[y0:y0 + side, x0:x0 + side]
+        interpolation = cv2.INTER_CUBIC if side < size else cv2.INTER_AREA
+        return cv2.resize(region, (size, size), interpolation=interpolation), (x0, y0, side)
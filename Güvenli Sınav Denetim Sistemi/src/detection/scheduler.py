@@ -0,0 +1,130 @@
+import time
+
+# Detectors whose priority is raised for a while after a violation event
+DEFAULT_BOOSTS = {
+    'MULTIPLE_FACES': ['objects', 'multi_face'],
+    'OBJECT_DETECTED': ['objects'],
+    'FACE_DISAPPEARED': ['face'],
+    'MOUTH_MOVING': ['mouth'],
+}
+
+
+class DetectorScheduler:
+    """Chooses which detectors run on each frame within a latency budget.
+
+    Every detector is timed when it runs and its cost is tracked as an
+    exponential moving average. On each frame, detectors are ranked by
+    priority, by how long they have been waiting and by recent activity.
+    They are then picked greedily until the frame budget is used up. A
+    detector that has not run for ``max_interval`` seconds always runs, so
+    no detector is starved.
+
+    Detectors can share models that run at most once per frame (MTCNN,
+    FaceMesh). Those are timed on their own and left out of the detectors'
+    costs, and a plan adds each shared model's cost once, with the first
+    selected detector that uses it.
+    """
+
+    def __init__(self, config):
+        self.config = config['detection'].get('scheduler', {})
+        self.enabled = self.config.get('enabled', False)
+        self.frame_budget = self.config.get('frame_budget_ms', 60) / 1000.0
+        self.default_max_interval = self.config.get('max_interval', 2.0)
+        self.boost_duration = self.config.get('boost_duration', 5.0)
+        self.boost_factor = self.config.get('boost_factor', 3.0)
+        self.cost_smoothing = self.config.get('cost_smoothing', 0.2)
+        self.boosts = self.config.get('boosts', DEFAULT_BOOSTS)
+        self.detectors = {}
+        self.models = {}   # shared model -> cost EMA
+
+    def register(self, name, priority=1.0, max_interval=None, models=()):
+        overrides = self.config.get('detectors', {}).get(name, {})
+        self.detectors[name] = {
+            'priority': overrides.get('priority', priority),
+            'max_interval': overrides.get('max_interval', max_interval or self.default_max_interval),
+            'cost': None,
+            'last_run': 0.0,
+            'boost_until': 0.0,
+            'runs': 0,
+            'models': tuple(models),
+        }
+
+    def _score(self, state, now):
+        waited = now - state['last_run']
+        score = state['priority'] * (1.0 + waited / state['max_interval'])
+        if now < state['boost_until']:
+            score *= self.boost_factor
+        return score
+
+    def plan(self, now=None):
+        """Return the set of detector names that should run on this frame"""
+        now = now or time.time()
+        selected = set()
+        charged = set()
+        spent = 0.0
+
+        ranked = sorted(self.detectors.items(), key=lambda item: self._score(item[1], now), reverse=True)
+        for name, state in ranked:
+            models = [model for model in state['models'] if model not in charged]
+            cost = (state['cost'] or 0.0) + sum(self.models.get(model, 0.0) for model in models)
+            boosted = now < state['boost_until']
+            max_interval = state['max_interval'] / (self.boost_factor if boosted else 1.0)
+            overdue = now - state['last_run'] >= max_interval
+            # Unmeasured detectors run once so their cost becomes known
+            if overdue or state['cost'] is None or spent + cost <= self.frame_budget or not selected:
+                selected.add(name)
+                spent += cost
+                charged.update(models)
+        return selected
+
+    def record(self, name, elapsed, now=None):
+        state = self.detectors[name]
+        if state['cost'] is None:
+            state['cost'] = elapsed
+        else:
+            state['cost'] += self.cost_smoothing * (elapsed - state['cost'])
+        state['last_run'] = now or time.time()
+        state['runs'] += 1
+
+    def record_model(self, model, elapsed):
+        previous = self.models.get(model)
+        self.models[model] = elapsed if previous is None else previous + self.cost_smoothing * (elapsed - previous)
+
+    def run(self, name, func, *args, model_costs=None, **kwargs):
+        """Call a detector, measuring its cost
+
+        ``model_costs`` is the frame's {shared model: seconds} record
+        (FrameAnalysis.model_costs). Shared models that run during the call
+        are charged to themselves rather than to this detector.
+        """
+        already_run = set(model_costs or ())
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            elapsed = time.perf_counter() - start
+            for model, spent in (model_costs or {}).items():
+                if model not in already_run:
+                    self.record_model(model, spent)
+                    elapsed -= spent
+            self.record(name, max(elapsed, 0.0))
+
+    def boost(self, name, duration=None):
+        if name in self.detectors:
+            until = time.time() + (duration or self.boost_duration)
+            self.detectors[name]['boost_until'] = max(self.detectors[name]['boost_until'], until)
+
+    def notify(self, event):
+        """Raise the priority of detectors related to a violation event"""
+        for name in self.boosts.get(event, []):
+            self.boost(name)
+
+    def stats(self):
+        return {
+            name: {
+                'cost_ms': round((state['cost'] or 0.0) * 1000, 2),
+                'runs': state['runs'],
+                'boosted': time.time() < state['boost_until'],
+            }
+            for name, state in self.detectors.items()
+        }
@@ -1,12 +1,19 @@
+import argparse
 import cv2
+import signal
+import threading
+import time
 import yaml
 from datetime import datetime
 from pathlib import Path
+from detection.face_analysis import FaceAnalyzer
 from detection.face_detection import FaceDetector
 from detection.eye_tracking import EyeTracker
 from detection.mouth_detection import MouthMonitor
 from detection.object_detection import ObjectDetector
 from detection.multi_face import MultiFaceDetector
+from detection.scheduler import DetectorScheduler
+from detection.motion_gate import MotionGate
 # from detection.audio_detection import AudioMonitor  # Disabled - requires webrtcvad
 from utils.video_utils import VideoRecorder
 from utils.screen_capture import ScreenRecorder
@@ -14,16 +21,42 @@ from utils.logging import AlertLogger
 from utils.alert_system import AlertSystem
 from utils.violation_logger import ViolationLogger
 from utils.screenshot_utils import ViolationCapturer
+from utils.pipeline import FrameQueue, Pipeline
+from utils.metrics import metrics
 # from reporting.report_generator import ReportGenerator  # Disabled temporarily
 
 BASE_DIR = Path(__file__).resolve().parents[1]
 
 
-def load_config():
-    config_path = BASE_DIR / 'config' / 'config.yaml'
+def load_config(config_path=None):
+    config_path = config_path or BASE_DIR / 'config' / 'config.yaml'
     with open(config_path) as f:
         return yaml.safe_load(f)
 
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Exam proctoring loop")
+    parser.add_argument('--headless', action='store_true', default=None,
+                        help="run without a preview window (overrides display.headless)")
+    parser.add_argument('--annotate', action=argparse.BooleanOptionalAction, default=None,
+                        help="draw detection overlays on recorded/published frames (overrides display.annotate)")
+    parser.add_argument('--no-publish', dest='publish_frames', action='store_false', default=None,
+                        help="do not write logs/current_frame.jpg for the dashboard")
+    return parser.parse_args(argv)
+
+def display_settings(config, args):
+    """Resolve headless/annotate/publish flags: CLI first, then config.yaml.
+
+    Overlays default to on with a window and off when headless, so a
+    display-less server only draws them if something actually consumes them.
+    """
+    display_config = config.get('display') or {}
+    headless = args.headless if args.headless is not None else display_config.get('headless', False)
+    annotate = args.annotate if args.annotate is not None else display_config.get('annotate')
+    if annotate is None:
+        annotate = not headless
+    publish_frames = args.publish_frames if args.publish_frames is not None else display_config.get('publish_frames', True)
+    return headless, annotate, publish_frames
+
 def display_detection_results(frame, results):
     y_offset = 30
     line_height = 30
@@ -71,8 +104,154 @@ def display_detection_results(frame, results):
                (frame.shape[1] - 250, 30), 
                cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
 
-def main():
+def new_results():
+    return {
+        'face_present': False,
+        'gaze_direction': 'Center',
+        'eye_ratio': 0.3,
+        'mouth_moving': False,
+        'multiple_faces': False,
+        'objects_detected': False,
+        'timestamp': datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    }
+
+# Models computed once per frame by FrameAnalysis and shared between detectors
+SHARED_MODELS = {
+    'face': ('mtcnn',),
+    'eyes': ('face_mesh',),
+    'mouth': ('face_mesh',),
+    'multi_face': ('mtcnn',),
+}
+
+class DetectionChain:
+    """The per-frame detector chain: shared face analysis, scheduler and motion gate.
+
+    ``calls`` lists (name, callable) pairs in run order; wrap them to
+    instrument individual detectors (see src/benchmark.py).
+
+    Pass ``shared`` (a FaceAnalyzer) and ``object_model`` to reuse models
+    loaded once for several streams (see src/worker.py). Callers that batch
+    model inference across chains use ``due()``, ``run()`` and ``results()``
+    instead of ``process()``.
+    """
+
+    def __init__(self, config, alert_logger=None, shared=None, object_model=None):
+        # The face detectors share one MTCNN and one FaceMesh
+        self.face_analyzer = FaceAnalyzer(config, shared=shared)
+        self.detectors = [
+            FaceDetector(config, analyzer=self.face_analyzer),
+            EyeTracker(config, analyzer=self.face_analyzer),
+            MouthMonitor(config, analyzer=self.face_analyzer),
+            MultiFaceDetector(config, analyzer=self.face_analyzer),
+            ObjectDetector(config, model=object_model),
+        ]
+        
+        for detector in self.detectors:
+            if alert_logger and hasattr(detector, 'set_alert_logger'):
+                detector.set_alert_logger(alert_logger)
+
+        detectors = self.detectors
+        # YOLO output computed outside the chain for the current frame, if any
+        self.object_results = None
+        self.calls = [
+            ('face', lambda frame, analysis: detectors[0].detect_face(frame, analysis)),
+            ('eyes', lambda frame, analysis: detectors[1].track_eyes(frame, analysis)),
+            ('mouth', lambda frame, analysis: detectors[2].monitor_mouth(frame, analysis)),
+            ('multi_face', lambda frame, analysis: detectors[3].detect_multiple_faces(frame, analysis)),
+            ('objects', lambda frame, analysis: detectors[4].detect_objects(frame, analysis=analysis, results=self.object_results)),
+        ]
+        self.scheduler = DetectorScheduler(config)
+        for priority, (name, _) in zip([3, 1, 1, 2, 2], self.calls):
+            self.scheduler.register(name, priority, models=SHARED_MODELS.get(name, ()))
+        self.motion_gate = MotionGate(config['detection'].get('motion_gate', {}))
+        # Last output of every detector, reused on frames where it is not scheduled
+        # or the scene has not changed
+        self.outputs = {}
+
+    def due(self, analysis):
+        """Names of the detectors to run on this frame, in run order"""
+        motion_gate, scheduler, outputs = self.motion_gate, self.scheduler, self.outputs
+        if motion_gate.enabled:
+            motion_gate.update(analysis.pyramid.level(motion_gate.width)[0])
+        planned = scheduler.plan() if scheduler.enabled else None
+        due = []
+        for name, _ in self.calls:
+            if name in outputs:
+                if not motion_gate.should_run(name):
+                    continue
+                if planned is not None and name not in planned:
+                    continue
+            due.append(name)
+        return due
+
+    def run(self, names, frame, analysis):
+        """Run the named detectors and keep their outputs"""
+        for name, call in self.calls:
+            if name not in names:
+                continue
+            if self.scheduler.enabled:
+                self.outputs[name] = self.scheduler.run(name, call, frame, analysis, model_costs=analysis.model_costs)
+            else:
+                self.outputs[name] = call(frame, analysis)
+            self.motion_gate.mark_run(name)
+        face = self.detectors[0]
+        if 'face' not in names and 'face' in self.outputs and face.tracker is not None:
+            # Left out this frame: follow the face with optical flow instead of MTCNN
+            self.outputs['face'] = face.track_face(frame, analysis)
+            if face.tracker.lost and self.scheduler.enabled:
+                # Have MTCNN confirm the loss soon
+                self.scheduler.boost('face')
+
+    def results(self):
+        """Combined results from the latest output of every detector"""
+        outputs = self.outputs
+        results = new_results()
+        results['face_present'] = outputs['face']
+        results['gaze_direction'], results['eye_ratio'] = outputs['eyes']
+        results['mouth_moving'] = outputs['mouth']
+        results['multiple_faces'] = outputs['multi_face']
+        results['objects_detected'] = outputs['objects']
+        return results
+
+    def process(self, frame):
+        """Run the detectors due on this frame and return the combined results"""
+        # Color conversion, MTCNN and FaceMesh run at most once per frame
+        analysis = self.face_analyzer.analyze(frame)
+        self.run(self.due(analysis), frame, analysis)
+        return self.results()
+
+def handle_violations(frame, results, alert_system, violation_capturer, violation_logger):
+    if not results['face_present']:
+        violation_type = "FACE_DISAPPEARED"
+    elif results['multiple_faces']:
+        violation_type = "MULTIPLE_FACES"
+    elif results['objects_detected']:
+        violation_type = "OBJECT_DETECTED"
+    # elif results['gaze_direction'] != "Center":
+    #     violation_type = "GAZE_AWAY"
+    elif results['mouth_moving']:
+        violation_type = "MOUTH_MOVING"
+    else:
+        return None
+
+    if alert_system is not None:
+        alert_system.speak_alert(violation_type)
+    
+    # Capture and log violation
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+    violation_capturer.capture_violation(frame, violation_type, timestamp)
+    violation_logger.log_violation(
+        violation_type,
+        timestamp,
+        {'duration': '5+ seconds', 'frame': results}
+    )
+    return violation_type
+
+def main(argv=None):
+    args = parse_args(argv)
     config = load_config()
+    headless, annotate, publish_frames = display_settings(config, args)
+    pipeline_config = config.get('pipeline', {})
     alert_logger = AlertLogger(config)
     alert_system = AlertSystem(config)
     violation_capturer = ViolationCapturer(config)
@@ -102,21 +281,37 @@ def main():
     # if config['detection']['audio_monitoring']['enabled']:
     #     audio_monitor.start()
 
+    # Capture, detection, recording and publishing run as separate stages so a
+    # slow detector never stalls recording or the live feed
+    pipeline = Pipeline()
+    detect_queue = pipeline.add_queue('detect', pipeline_config.get('detect_queue_size', 1), FrameQueue.DROP_OLDEST)
+    record_queue = pipeline.add_queue('record', pipeline_config.get('record_queue_size', 60), FrameQueue.DROP_OLDEST)
+    publish_queue = pipeline.add_queue('publish', pipeline_config.get('publish_queue_size', 1), FrameQueue.DROP_OLDEST) if publish_frames else None
+    display_queue = pipeline.add_queue('display', 1, FrameQueue.DROP_OLDEST) if not headless else None
+    stats_interval = pipeline_config.get('stats_interval', 30)
+
+    # Per-stage latency/drop metrics, served by the dashboard at /api/metrics
+    metrics.start_publisher(BASE_DIR / 'logs' / 'metrics.json', config.get('metrics', {}).get('publish_interval', 5))
+
+    # Latest detection results, used to annotate every recorded frame
+    latest = {'results': new_results()}
+    latest_lock = threading.Lock()
+    cap = None
+
+    # SIGINT/SIGTERM stop the pipeline cleanly (the only way to quit when headless)
+    def request_stop(signum, _frame):
+        print(f"Received signal {signum}, stopping...")
+        pipeline.stop()
+
+    signal.signal(signal.SIGINT, request_stop)
+    signal.signal(signal.SIGTERM, request_stop)
+
     try:
         if config['screen']['recording']:
             screen_recorder.start_recording()
         # Initialize detectors
-        detectors = [
-            FaceDetector(config),
-            EyeTracker(config),
-            MouthMonitor(config),
-            MultiFaceDetector(config),
-            ObjectDetector(config),
-        ]
-        
-        for detector in detectors:
-            if hasattr(detector, 'set_alert_logger'):
-                detector.set_alert_logger(alert_logger)
+        chain = DetectionChain(config, alert_logger)
+        scheduler = chain.scheduler
 
         # Start webcam recording
         video_recorder.start_recording()
@@ -124,103 +319,39 @@ def main():
         cap.set(cv2.CAP_PROP_FRAME_WIDTH, config['video']['resolution'][0])
         cap.set(cv2.CAP_PROP_FRAME_HEIGHT, config['video']['resolution'][1])
         
-        # Create fullscreen window
-        cv2.namedWindow('Exam Proctoring', cv2.WINDOW_NORMAL)
-        cv2.setWindowProperty('Exam Proctoring', cv2.WND_PROP_FULLSCREEN, cv2.WINDOW_FULLSCREEN)
-        
-        while True:
+        def capture_stage():
             ret, frame = cap.read()
             if not ret:
-                break
-                
-            results = {
-                'face_present': False,
-                'gaze_direction': 'Center',
-                'eye_ratio': 0.3,
-                'mouth_moving': False,
-                'multiple_faces': False,
-                'objects_detected': False,
-                'timestamp': datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            }
-            
-            # Perform detections
-            results['face_present'] = detectors[0].detect_face(frame)
-            results['gaze_direction'], results['eye_ratio'] = detectors[1].track_eyes(frame)
-            results['mouth_moving'] = detectors[2].monitor_mouth(frame)
-            results['multiple_faces'] = detectors[3].detect_multiple_faces(frame)
-            results['objects_detected'] = detectors[4].detect_objects(frame)
-
-            if not results['face_present']:
-                violation_type = "FACE_DISAPPEARED"
-                alert_system.speak_alert(violation_type)
-                
-                # Capture and log violation
-                timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
-                violation_image = violation_capturer.capture_violation(frame, violation_type, timestamp)
-                violation_logger.log_violation(
-                    violation_type,
-                    timestamp,
-                    {'duration': '5+ seconds', 'frame': results}
-                )
-                # alert_system.speak_alert("FACE_DISAPPEARED")
-            elif results['multiple_faces']:
-                violation_type = "MULTIPLE_FACES"
-                alert_system.speak_alert(violation_type)
-                
-                # Capture and log violation
-                timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
-                violation_image = violation_capturer.capture_violation(frame, violation_type, timestamp)
-                violation_logger.log_violation(
-                    violation_type,
-                    timestamp,
-                    {'duration': '5+ seconds', 'frame': results}
-                )
-                # alert_system.speak_alert("MULTIPLE_FACES")
-            elif results['objects_detected']:
-                violation_type = "OBJECT_DETECTED"
-                alert_system.speak_alert(violation_type)
-                
-                # Capture and log violation
-                timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
-                violation_image = violation_capturer.capture_violation(frame, violation_type, timestamp)
-                violation_logger.log_violation(
-                    violation_type,
-                    timestamp,
-                    {'duration': '5+ seconds', 'frame': results}
-                )
-                # alert_system.speak_alert("OBJECT_DETECTED")
-            # elif results['gaze_direction'] != "Center":
-            #     violation_type = "GAZE_AWAY"
-            #     alert_system.speak_alert(violation_type)
-                
-            #     # Capture and log violation
-            #     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
-            #     violation_image = violation_capturer.capture_violation(frame, violation_type, timestamp)
-            #     violation_logger.log_violation(
-            #         violation_type,
-            #         timestamp,
-            #         {'duration': '5+ seconds', 'frame': results}
-            #     )
-                # alert_system.speak_alert("GAZE_AWAY")
-            elif results['mouth_moving']:
-                violation_type = "MOUTH_MOVING"
-                alert_system.speak_alert(violation_type)
-                
-                # Capture and log violation
-                timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
-                violation_image = violation_capturer.capture_violation(frame, violation_type, timestamp)
-                violation_logger.log_violation(
-                    violation_type,
-                    timestamp,
-                    {'duration': '5+ seconds', 'frame': results}
-                )
-                # alert_system.speak_alert("MOUTH_MOVING")
+                return False
+            detect_queue.put(frame)
+            record_queue.put(frame)
+            return True
+
+        def detect_stage(frame):
+            results = chain.process(frame)
 
+            with latest_lock:
+                latest['results'] = results
+            violation_type = handle_violations(frame, results, alert_system, violation_capturer, violation_logger)
+            if violation_type:
+                scheduler.notify(violation_type)
+
+        def record_stage(frame):
+            with latest_lock:
+                results = dict(latest['results'])
+            results['timestamp'] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
             
-            # Display and record
-            display_detection_results(frame, results)
+            if annotate:
+                # Annotate a copy; the detect stage may still be reading the raw frame
+                frame = frame.copy()
+                display_detection_results(frame, results)
             video_recorder.record_frame(frame)
-            
+            if publish_queue is not None:
+                publish_queue.put(frame)
+            if display_queue is not None:
+                display_queue.put(frame)
+
+        def publish_stage(frame):
             # Save current frame for dashboard streaming
             try:
                 _, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, 85])
@@ -228,13 +359,44 @@ def main():
                     f.write(buffer.tobytes())
             except Exception as e:
                 print(f"Error saving frame for streaming: {e}")
+
+        pipeline.add_source('capture', capture_stage)
+        pipeline.add_stage('detect', detect_queue, detect_stage)
+        pipeline.add_stage('record', record_queue, record_stage)
+        if publish_queue is not None:
+            pipeline.add_stage('publish', publish_queue, publish_stage)
+        
+        if not headless:
+            # Create fullscreen window
+            cv2.namedWindow('Exam Proctoring', cv2.WINDOW_NORMAL)
+            cv2.setWindowProperty('Exam Proctoring', cv2.WND_PROP_FULLSCREEN, cv2.WINDOW_FULLSCREEN)
+        
+        pipeline.start()
+        last_stats = time.time()
+        
+        # OpenCV windows must be driven from the main thread
+        while pipeline.running:
+            if headless:
+                pipeline.stop_event.wait(0.5)
+            else:
+                frame = display_queue.get(timeout=0.05)
+                if frame is not None:
+                    # Show preview
+                    cv2.imshow('Exam Proctoring', frame)
+                if cv2.waitKey(1) & 0xFF == ord('q'):
+                    break
             
-            # Show preview
-            cv2.imshow('Exam Proctoring', frame)
-            if cv2.waitKey(1) & 0xFF == ord('q'):
-                break
+            if stats_interval and time.time() - last_stats >= stats_interval:
+                print(f"Pipeline: {pipeline.format_stats()}")
+                if scheduler.enabled:
+                    print(f"Scheduler: {scheduler.stats()}")
+                last_stats = time.time()
                 
     finally:
+        pipeline.stop()
+        pipeline.join()
+        print(f"Pipeline: {pipeline.format_stats()}")
+        
         violations = violation_logger.get_violations()
         # report_path = report_generator.generate_report(student_info, violations)
         # print(f"Report generated: {report_path}")
@@ -246,9 +408,10 @@ def main():
         video_data = video_recorder.stop_recording()
         print(f"Webcam recording saved: {video_data['filename']}")
         
-        if cap.isOpened():
+        if cap is not None and cap.isOpened():
             cap.release()
-        cv2.destroyAllWindows()
+        if not headless:
+            cv2.destroyAllWindows()
 
 
 if __name__ == '__main__':
@@ -8,12 +8,12 @@ import logging
 import requests
 import time
 from datetime import datetime
-from src.detection.face_id import recognize_student, draw_face_boxes, get_primary_student
+from src.detection.face_verifier import FaceVerifier
 from src.detection.eye_tracking import EyeTracker
 from src.detection.mouth_detection import MouthDetector
 from src.detection.object_detection import ObjectDetector
 from src.utils.violation_logger import ViolationLogger
-from src.utils.student_loader import list_all_students
+from src.utils.student_loader import list_all_students, load_recognition_config
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -33,6 +33,15 @@ class OnlineStudentMonitor:
         self.mouth_detector = MouthDetector()
         self.object_detector = ObjectDetector()
         
+        # 1:1 verification of the selected student (no roster search per frame)
+        self.verifier = None
+        verification = load_recognition_config().get("verification") or {}
+        if student_id and verification.pop("enabled", True):
+            try:
+                self.verifier = FaceVerifier(student_id, **verification)
+            except ValueError as e:
+                logger.warning(f"⚠️  Verification disabled, falling back to recognition: {e}")
+        
         self.running = False
         self.frame_count = 0
         
@@ -128,14 +137,24 @@ class OnlineStudentMonitor:
             
             self.frame_count += 1
             
-            # Face recognition
-            recognized = recognize_student(frame)
+            # Face verification / recognition
+            if self.verifier is not None:
+                recognized = self.verifier.verify(frame)
+            else:
+                recognized = self._recognize(frame)
             
             if recognized:
                 detected_id, detected_name, loc, conf = recognized[0]
                 
                 # Check if the right student
-                if self.student_id and detected_id != self.student_id and detected_id != "unknown":
+                if self.verifier is not None:
+                    if self.verifier.checked and self.verifier.wrong_student:
+                        self._log_violation(
+                            "wrong_student",
+                            f"Face does not match {self.student_name} (distance {self.verifier.distance:.2f})",
+                            frame
+                        )
+                elif self.student_id and detected_id != self.student_id and detected_id != "unknown":
                     self._log_violation(
                         "wrong_student",
                         f"Different student detected: {detected_name}",
@@ -222,6 +241,11 @@ class OnlineStudentMonitor:
         print(f"\n✅ Monitoring session ended for {self.student_name}")
         input("Press Enter to return to menu...")
     
+    def _recognize(self, frame):
+        """1:N recognition; imported lazily since it loads the whole student gallery"""
+        from src.detection.face_id import recognize_student
+        return recognize_student(frame, exam_code=self.exam_code)
+    
     def _log_violation(self, violation_type, description, frame):
         """Log a violation"""
         self.violation_logger.log_violation(
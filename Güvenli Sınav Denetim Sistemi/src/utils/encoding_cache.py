@@ -0,0 +1,126 @@
+"""
+Encoding Cache - Persistent face encodings
+Stores face encodings keyed by the content hash of each student photo
+"""
+
+import hashlib
+import logging
+import os
+import tempfile
+from pathlib import Path
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = Path(__file__).resolve().parents[2]
+DEFAULT_CACHE_PATH = BASE_DIR / "cache" / "face_encodings.npz"
+
+# Bump when the encoding model or its parameters change
+CACHE_VERSION = 1
+ENCODING_SIZE = 128
+
+
+def file_hash(path, chunk_size=1 << 20):
+    """SHA-256 of a file's contents (photos are identified by content, not name)"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class EncodingCache:
+    """
+    Content-hash keyed cache of face encodings stored as one .npz file
+    
+    The file holds a float32 (N, 128) matrix with the photo hash and
+    student id of every row. It also lists photos where no face was
+    found, so those photos are not re-encoded on every launch either.
+    Only new or changed photos need face_recognition. Saving keeps just
+    the entries used by the current roster.
+    """
+    
+    def __init__(self, path=None):
+        self.path = Path(path or DEFAULT_CACHE_PATH)
+        self.entries = {}      # hash -> (encoding or None, student_id)
+        self.used = set()
+        self.dirty = False
+        self.load()
+    
+    def load(self):
+        if not self.path.exists():
+            return
+        try:
+            with np.load(self.path, allow_pickle=False) as data:
+                if int(data["version"]) != CACHE_VERSION:
+                    logger.info("Encoding cache version changed, rebuilding")
+                    self.dirty = True
+                    return
+                for digest, encoding, student_id in zip(data["hashes"], data["encodings"], data["ids"]):
+                    self.entries[str(digest)] = (encoding, str(student_id))
+                for digest in data["no_face"]:
+                    self.entries[str(digest)] = (None, "")
+        except Exception as e:
+            logger.warning(f"⚠️  Ignoring unreadable encoding cache {self.path}: {e}")
+            self.entries = {}
+            self.dirty = True
+    
+    def lookup(self, digest, student_id=None):
+        """Return (found, encoding); encoding is None for photos without a face"""
+        entry = self.entries.get(digest)
+        if entry is None:
+            return False, None
+        self.used.add(digest)
+        if student_id is not None and entry[0] is not None and entry[1] != str(student_id):
+            # Same photo, re-assigned student id
+            self.entries[digest] = (entry[0], str(student_id))
+            self.dirty = True
+        return True, entry[0]
+    
+    def store(self, digest, encoding, student_id=""):
+        if encoding is not None:
+            encoding = np.asarray(encoding, dtype=np.float32)
+        self.entries[digest] = (encoding, str(student_id))
+        self.used.add(digest)
+        self.dirty = True
+    
+    def save(self, prune=True):
+        """Write the cache atomically, dropping entries not looked up since loading"""
+        if prune and set(self.entries) != self.used:
+            self.entries = {d: e for d, e in self.entries.items() if d in self.used}
+            self.dirty = True
+        if not self.dirty:
+            return
+        
+        rows = [(d, enc, sid) for d, (enc, sid) in self.entries.items() if enc is not None]
+        no_face = [d for d, (enc, _) in self.entries.items() if enc is None]
+        encodings = np.stack([enc for _, enc, _ in rows]) if rows else np.zeros((0, ENCODING_SIZE), np.float32)
+        
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # A unique temp name, so processes saving at the same time (e.g. the
+        # gallery service and bulk_enroll) cannot write into each other's file
+        with tempfile.NamedTemporaryFile(dir=self.path.parent, prefix=self.path.name + ".", suffix=".tmp", delete=False) as f:
+            tmp_path = f.name
+            try:
+                np.savez(
+                    f,
+                    version=np.array(CACHE_VERSION),
+                    hashes=np.array([d for d, _, _ in rows], dtype="U64"),
+                    encodings=encodings.astype(np.float32),
+                    ids=np.array([sid for _, _, sid in rows], dtype=str),
+                    no_face=np.array(no_face, dtype="U64"),
+                )
+            except BaseException:
+                f.close()
+                os.unlink(tmp_path)
+                raise
+        os.replace(tmp_path, self.path)
+        self.dirty = False
+    
+    def matrix(self):
+        """All cached encodings as (encodings, ids), e.g. to build a search index offline"""
+        rows = [(enc, sid) for enc, sid in self.entries.values() if enc is not None]
+        if not rows:
+            return np.zeros((0, ENCODING_SIZE), np.float32), []
+        return np.stack([enc for enc, _ in rows]), [sid for _, sid in rows]
@@ -35,6 +35,7 @@
 
 import os
 from datetime import datetime
+from .metrics import timed
 
 class AlertLogger:
     def __init__(self, config):
@@ -46,6 +47,7 @@ class AlertLogger:
         # Create log directory if it doesn't exist
         os.makedirs(self.log_path, exist_ok=True)
         
+    @timed('logger.alert')
     def log_alert(self, alert_type, message):
         """Log an alert with type and message"""
         current_time = datetime.now().timestamp()
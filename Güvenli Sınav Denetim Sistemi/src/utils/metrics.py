@@ -0,0 +1,163 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+# Latency bucket upper bounds in seconds (Prometheus histogram "le" values)
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+class LatencyHistogram:
+    """Cumulative latency histogram for one stage"""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * len(self.buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, seconds):
+        self.count += 1
+        self.sum += seconds
+        for i, bound in enumerate(self.buckets):
+            if seconds <= bound:
+                self.counts[i] += 1
+                break
+
+    def snapshot(self):
+        cumulative = []
+        total = 0
+        for count in self.counts:
+            total += count
+            cumulative.append(total)
+        return {
+            'buckets': list(self.buckets),
+            'cumulative': cumulative,
+            'count': self.count,
+            'sum': self.sum,
+        }
+
+
+class MetricsRegistry:
+    """Per-stage latency histograms, call counts and frame drops.
+
+    Stages are free-form names such as ``detector.face`` or ``recorder.video``.
+    The proctoring process publishes snapshots to a JSON file that the Flask
+    dashboard renders at ``/api/metrics``.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.histograms = {}
+        self.calls = {}
+        self.drops = {}
+        self.started = time.time()
+
+    def observe(self, stage, seconds):
+        with self.lock:
+            histogram = self.histograms.get(stage)
+            if histogram is None:
+                histogram = self.histograms[stage] = LatencyHistogram()
+            histogram.observe(seconds)
+            self.calls[stage] = self.calls.get(stage, 0) + 1
+
+    def count(self, stage, n=1):
+        with self.lock:
+            self.calls[stage] = self.calls.get(stage, 0) + n
+
+    def drop(self, stage, n=1):
+        with self.lock:
+            self.drops[stage] = self.drops.get(stage, 0) + n
+
+    @contextmanager
+    def timer(self, stage):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - start)
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                'timestamp': time.time(),
+                'started': self.started,
+                'pid': os.getpid(),
+                'latency': {stage: h.snapshot() for stage, h in self.histograms.items()},
+                'calls': dict(self.calls),
+                'drops': dict(self.drops),
+            }
+
+    def save(self, path):
+        """Write a snapshot atomically so readers never see a partial file"""
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(self.snapshot(), f)
+        os.replace(tmp_path, path)
+
+    def start_publisher(self, path, interval=5.0):
+        """Save a snapshot every ``interval`` seconds on a daemon thread"""
+        def _run():
+            while True:
+                try:
+                    self.save(path)
+                except Exception as e:
+                    print(f"Error saving metrics: {e}")
+                time.sleep(interval)
+
+        thread = threading.Thread(target=_run, name='metrics-publisher', daemon=True)
+        thread.start()
+        return thread
+
+
+# Process-wide registry used by detectors, recorders and loggers
+metrics = MetricsRegistry()
+
+
+def timed(stage):
+    """Decorator recording the latency of every call under ``stage``"""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with metrics.timer(stage):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def _label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def render_prometheus(snapshot, prefix='proctoring'):
+    """Render a snapshot in the Prometheus text exposition format"""
+    lines = []
+
+    lines.append(f"# HELP {prefix}_stage_latency_seconds Latency of each processing stage")
+    lines.append(f"# TYPE {prefix}_stage_latency_seconds histogram")
+    for stage, h in sorted(snapshot.get('latency', {}).items()):
+        label = f'stage="{_label(stage)}"'
+        for bound, count in zip(h['buckets'], h['cumulative']):
+            lines.append(f'{prefix}_stage_latency_seconds_bucket{{{label},le="{bound}"}} {count}')
+        lines.append(f'{prefix}_stage_latency_seconds_bucket{{{label},le="+Inf"}} {h["count"]}')
+        lines.append(f'{prefix}_stage_latency_seconds_sum{{{label}}} {h["sum"]}')
+        lines.append(f'{prefix}_stage_latency_seconds_count{{{label}}} {h["count"]}')
+
+    lines.append(f"# HELP {prefix}_stage_calls_total Number of calls per stage")
+    lines.append(f"# TYPE {prefix}_stage_calls_total counter")
+    for stage, count in sorted(snapshot.get('calls', {}).items()):
+        lines.append(f'{prefix}_stage_calls_total{{stage="{_label(stage)}"}} {count}')
+
+    lines.append(f"# HELP {prefix}_frames_dropped_total Frames dropped per stage")
+    lines.append(f"# TYPE {prefix}_frames_dropped_total counter")
+    for stage, count in sorted(snapshot.get('drops', {}).items()):
+        lines.append(f'{prefix}_frames_dropped_total{{stage="{_label(stage)}"}} {count}')
+
+    if 'timestamp' in snapshot:
+        lines.append(f"# HELP {prefix}_metrics_timestamp_seconds When the proctoring process wrote this snapshot")
+        lines.append(f"# TYPE {prefix}_metrics_timestamp_seconds gauge")
+        lines.append(f"{prefix}_metrics_timestamp_seconds {snapshot['timestamp']}")
+
+    return "\n".join(lines) + "\n"
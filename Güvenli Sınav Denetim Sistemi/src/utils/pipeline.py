@@ -0,0 +1,166 @@
+import threading
+import time
+from collections import deque
+from .metrics import metrics
+
+
+class FrameQueue:
+    """Bounded frame queue with an explicit policy for when it is full.
+
+    - ``drop_oldest``: discard the oldest queued item (keep the freshest frames)
+    - ``drop_newest``: discard the incoming item
+    - ``block``: wait until the consumer makes room
+    """
+    DROP_OLDEST = 'drop_oldest'
+    DROP_NEWEST = 'drop_newest'
+    BLOCK = 'block'
+
+    def __init__(self, name, maxsize=1, policy=DROP_OLDEST):
+        if policy not in (self.DROP_OLDEST, self.DROP_NEWEST, self.BLOCK):
+            raise ValueError(f"Unknown drop policy: {policy}")
+        self.name = name
+        self.maxsize = max(1, int(maxsize))
+        self.policy = policy
+        self.items = deque()
+        self.cond = threading.Condition()
+        self.closed = False
+        self.put_count = 0
+        self.get_count = 0
+        self.dropped = 0
+
+    def put(self, item):
+        """Queue an item; returns False when the item (or an older one) was dropped"""
+        with self.cond:
+            if self.closed:
+                return False
+            self.put_count += 1
+            accepted = True
+            if len(self.items) >= self.maxsize:
+                if self.policy == self.DROP_NEWEST:
+                    self.dropped += 1
+                    metrics.drop(f"pipeline.{self.name}")
+                    return False
+                if self.policy == self.DROP_OLDEST:
+                    self.items.popleft()
+                    self.dropped += 1
+                    metrics.drop(f"pipeline.{self.name}")
+                    accepted = False
+                else:
+                    while len(self.items) >= self.maxsize and not self.closed:
+                        self.cond.wait(0.1)
+                    if self.closed:
+                        return False
+            self.items.append(item)
+            self.cond.notify_all()
+            return accepted
+
+    def get(self, timeout=0.1):
+        """Return the next item, or None if nothing arrived within timeout"""
+        with self.cond:
+            if not self.items and not self.closed:
+                self.cond.wait(timeout)
+            if not self.items:
+                return None
+            item = self.items.popleft()
+            self.get_count += 1
+            self.cond.notify_all()
+            return item
+
+    def close(self):
+        with self.cond:
+            self.closed = True
+            self.cond.notify_all()
+
+    def stats(self):
+        with self.cond:
+            return {
+                'depth': len(self.items),
+                'maxsize': self.maxsize,
+                'policy': self.policy,
+                'put': self.put_count,
+                'processed': self.get_count,
+                'dropped': self.dropped,
+            }
+
+
+class Pipeline:
+    """Runs each stage on its own thread, connected by FrameQueues"""
+
+    def __init__(self):
+        self.queues = {}
+        self.threads = []
+        self.stop_event = threading.Event()
+        self.errors = {}
+
+    @property
+    def running(self):
+        return not self.stop_event.is_set()
+
+    def add_queue(self, name, maxsize=1, policy=FrameQueue.DROP_OLDEST):
+        queue = FrameQueue(name, maxsize, policy)
+        self.queues[name] = queue
+        return queue
+
+    def add_source(self, name, produce, stop_pipeline=True):
+        """Run ``produce()`` in a loop until it returns False or the pipeline stops.
+
+        With ``stop_pipeline=False`` only this source ends, e.g. one of
+        several independent camera streams.
+        """
+        def _run():
+            try:
+                while self.running:
+                    if produce() is False:
+                        break
+            except Exception as e:
+                self.errors[name] = str(e)
+                print(f"Pipeline stage '{name}' failed: {e}")
+            finally:
+                if stop_pipeline:
+                    self.stop()
+        self._add_thread(name, _run)
+
+    def add_stage(self, name, queue, handle):
+        """Run ``handle(item)`` for every item taken from ``queue``"""
+        def _run():
+            # Keeps draining queued items after stop() so nothing already captured is lost
+            while True:
+                item = queue.get()
+                if item is None:
+                    if not self.running:
+                        break
+                    continue
+                try:
+                    with metrics.timer(f"pipeline.{name}"):
+                        handle(item)
+                except Exception as e:
+                    self.errors[name] = str(e)
+                    print(f"Pipeline stage '{name}' error: {e}")
+        self._add_thread(name, _run)
+
+    def _add_thread(self, name, target):
+        self.threads.append(threading.Thread(target=target, name=name, daemon=True))
+
+    def start(self):
+        for thread in self.threads:
+            thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        for queue in self.queues.values():
+            queue.close()
+
+    def join(self, timeout=5.0):
+        deadline = time.time() + timeout
+        for thread in self.threads:
+            if thread is not threading.current_thread():
+                thread.join(max(0.0, deadline - time.time()))
+
+    def stats(self):
+        return {name: queue.stats() for name, queue in self.queues.items()}
+
+    def format_stats(self):
+        return ", ".join(
+            f"{name}: depth={s['depth']}/{s['maxsize']} processed={s['processed']} dropped={s['dropped']}"
+            for name, s in self.stats().items()
+        )
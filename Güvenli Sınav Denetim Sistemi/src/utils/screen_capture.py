@@ -5,6 +5,7 @@ from datetime import datetime
 import os
 import threading
 import time
+from .metrics import metrics
 
 class ScreenRecorder:
     def __init__(self, config):
@@ -53,7 +54,7 @@ class ScreenRecorder:
         self._initialize_sct()  # Initialize MSS in this thread
         
         while not self.stop_event.is_set():
-            with self.lock:
+            with self.lock, metrics.timer('recorder.screen'):
                 screenshot = self.sct.grab(self.monitor)
                 frame = np.array(screenshot)
                 frame = cv2.cvtColor(frame, cv2.COLOR_BGRA2BGR)
@@ -1,12 +1,14 @@
 import cv2
 import os
 from datetime import datetime
+from .metrics import timed
 
 class ViolationCapturer:
     def __init__(self, config):
         self.output_dir = os.path.join(config['global']['output_path'], "violation_captures")
         os.makedirs(self.output_dir, exist_ok=True)
         
+    @timed('logger.capture')
     def capture_violation(self, frame, violation_type, timestamp=None):
         """Saves violation screenshot with metadata"""
         timestamp = timestamp or datetime.now().strftime("%Y%m%d_%H%M%S_%f")
@@ -9,14 +9,52 @@ import cv2
 import os
 import logging
 
+try:
+    from .encoding_cache import EncodingCache, file_hash
+except ImportError:  # run directly as a script
+    from encoding_cache import EncodingCache, file_hash
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
-def load_students():
+def _photo_encoding(img_path, cache, student_id):
+    """
+    Face encoding of one photo, served from the cache when the photo is unchanged
+    
+    Returns:
+        tuple: (encoding or None if no face was found, whether face_recognition ran)
+    """
+    digest = file_hash(img_path)
+    found, encoding = cache.lookup(digest, student_id) if cache is not None else (False, None)
+    if found:
+        return encoding, False
+    
+    # Load image file
+    image = face_recognition.load_image_file(img_path)
+    
+    # Extract face encoding
+    enc = face_recognition.face_encodings(image)
+    
+    if len(enc) > 1:
+        logger.warning(f"⚠️  Multiple faces detected in: {img_path}. Using first face.")
+    
+    encoding = enc[0] if len(enc) > 0 else None
+    if cache is not None:
+        cache.store(digest, encoding, student_id)
+    return encoding, True
+
+
+def load_students(use_cache=True):
     """
     Load students from config/students.yaml and prepare face encodings
     
+    Encodings are reused from the on-disk encoding cache; only new or
+    changed photos are run through face_recognition.
+    
+    Args:
+        use_cache: Set False to re-encode every photo
+        
     Returns:
         tuple: (known_encodings, known_ids, known_names)
     """
@@ -43,6 +81,9 @@ def load_students():
     
     logger.info("Loading student face encodings...")
     
+    cache = EncodingCache() if use_cache else None
+    encoded = 0
+    
     for student in data["students"]:
         student_id = student.get("id", "unknown")
         student_name = student.get("name", "Unknown")
@@ -57,20 +98,14 @@ def load_students():
             continue
         
         try:
-            # Load image file
-            image = face_recognition.load_image_file(img_path)
-            
-            # Extract face encoding
-            enc = face_recognition.face_encodings(image)
+            encoding, was_encoded = _photo_encoding(img_path, cache, student_id)
+            encoded += was_encoded
             
-            if len(enc) == 0:
+            if encoding is None:
                 logger.warning(f"⚠️  No face detected in photo: {img_path} for {student_name}")
                 continue
             
-            if len(enc) > 1:
-                logger.warning(f"⚠️  Multiple faces detected in: {img_path}. Using first face.")
-            
-            known_encodings.append(enc[0])
+            known_encodings.append(encoding)
             known_ids.append(student_id)
             known_names.append(student_name)
             
@@ -80,11 +115,72 @@ def load_students():
             logger.error(f"❌ Error processing {img_path} for {student_name}: {e}")
             continue
     
-    logger.info(f"✅ Successfully loaded {len(known_encodings)} student(s)")
+    if cache is not None:
+        try:
+            cache.save()
+        except Exception as e:
+            logger.warning(f"⚠️  Could not save encoding cache: {e}")
+    
+    logger.info(f"✅ Successfully loaded {len(known_encodings)} student(s) ({encoded} photo(s) encoded)")
     
     return known_encodings, known_ids, known_names
 
 
+def load_student_encoding(student_id, use_cache=True):
+    """
+    Face encoding of a single student, without loading the whole roster
+    
+    Args:
+        student_id: Student ID to load
+        use_cache: Set False to re-encode the photo
+        
+    Returns:
+        tuple: (encoding, student_name) or (None, None) if unavailable
+    """
+    student = get_student_by_id(student_id)
+    if not student:
+        logger.error(f"❌ Student not found: {student_id}")
+        return None, None
+    
+    img_path = student.get("photo", "")
+    if not img_path or not os.path.exists(img_path):
+        logger.error(f"❌ Photo not found for student: {student_id}")
+        return None, None
+    
+    cache = EncodingCache() if use_cache else None
+    try:
+        encoding, _ = _photo_encoding(img_path, cache, student_id)
+        if cache is not None:
+            # Other students' entries were not looked up; keep them
+            cache.save(prune=False)
+    except Exception as e:
+        logger.error(f"❌ Error processing {img_path} for {student_id}: {e}")
+        return None, None
+    
+    if encoding is None:
+        logger.error(f"❌ No face detected in photo: {img_path} for {student_id}")
+        return None, None
+    return encoding, student.get("name", "Unknown")
+
+
+def load_recognition_config(config_path="config/config.yaml"):
+    """
+    recognition settings (matcher index, exam galleries, verification) from config.yaml
+    
+    Returns:
+        dict: The recognition section, empty if unavailable
+    """
+    if not os.path.exists(config_path):
+        return {}
+    try:
+        with open(config_path, "r", encoding="utf-8") as f:
+            config = yaml.safe_load(f) or {}
+        return config.get("recognition") or {}
+    except Exception as e:
+        logger.error(f"Error reading recognition settings: {e}")
+        return {}
+
+
 def get_student_by_id(student_id):
     """
     Get student information by ID
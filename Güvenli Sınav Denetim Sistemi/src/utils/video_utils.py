@@ -33,6 +33,7 @@
 import cv2
 import os
 from datetime import datetime
+from .metrics import timed
 
 class VideoRecorder:
     def __init__(self, config):
@@ -59,6 +60,7 @@ class VideoRecorder:
             self.resolution
         )
         
+    @timed('recorder.video')
     def record_frame(self, frame):
         if self.writer:
             self.writer.write(frame)
@@ -1,12 +1,14 @@
 import os
 import json
 from datetime import datetime
+from .metrics import timed
 
 class ViolationLogger:
     def __init__(self, config):
         self.log_file = os.path.join(config['global']['output_path'], "violations.json")
         self.violations = []
         
+    @timed('logger.violation')
     def log_violation(self, violation_type, timestamp=None, metadata=None):
         """Logs a violation with timestamp and metadata"""
         entry = {
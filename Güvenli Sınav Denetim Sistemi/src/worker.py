@@ -0,0 +1,200 @@
+import argparse
+import copy
+import signal
+import time
+import cv2
+from pathlib import Path
+from main import load_config, new_results, handle_violations, DetectionChain, BASE_DIR
+from detection.face_analysis import FaceAnalyzer
+from detection.object_detection import ObjectDetector
+from utils.logging import AlertLogger
+from utils.alert_system import AlertSystem
+from utils.violation_logger import ViolationLogger
+from utils.screenshot_utils import ViolationCapturer
+from utils.pipeline import FrameQueue, Pipeline
+from utils.metrics import metrics
+
+# Detectors that read MTCNN boxes and can therefore share a batched MTCNN call
+FACE_BOX_DETECTORS = {'face', 'multi_face'}
+
+
+class StreamSession:
+    """Detector state for one student stream hosted by the worker.
+
+    MTCNN and YOLO are shared by every session and run in batches across
+    streams. Everything that depends on a stream's history stays in the
+    session's DetectionChain: the detectors' counters and alert timers, face
+    boxes, the scheduler, the motion gate and FaceMesh, which tracks the face
+    from one video frame to the next. The violation logs are per session too.
+    """
+
+    def __init__(self, stream_id, source, config, face_models, object_model, alert_system):
+        self.id = stream_id
+        self.source = int(source) if str(source).isdigit() else source
+        self.config = self._stream_config(config, stream_id)
+        self.alert_system = alert_system
+        self.alert_logger = AlertLogger(self.config)
+        self.chain = DetectionChain(self.config, self.alert_logger, shared=face_models, object_model=object_model)
+        self.analyzer = self.chain.face_analyzer
+        self.objects = self.chain.detectors[4]
+        self.violation_capturer = ViolationCapturer(self.config)
+        self.violation_logger = ViolationLogger(self.config)
+        self.results = new_results()
+
+        self.queue = None
+        self.cap = None
+        self.finished = False
+        self.frame = None
+        self.analysis = None
+        self.pending = set()
+
+    @staticmethod
+    def _stream_config(config, stream_id):
+        """Copy of the config with logs and violation captures under a per-stream directory"""
+        config = copy.deepcopy(config)
+        for section, key in (('global', 'output_path'), ('logging', 'log_path')):
+            path = Path(config[section][key])
+            if not path.is_absolute():
+                path = BASE_DIR / path
+            config[section][key] = str(path / str(stream_id))
+        return config
+
+    def capture_frame(self):
+        """Pipeline source: read one frame into this session's queue"""
+        if self.cap is None:
+            self.cap = cv2.VideoCapture(self.source)
+        ret, frame = self.cap.read()
+        if not ret:
+            print(f"Stream {self.id}: no more frames")
+            self.finished = True
+            self.cap.release()
+            return False
+        self.queue.put(frame)
+        return True
+
+    def begin(self, frame):
+        """Decide which detectors run on this frame, before the batched model calls"""
+        self.frame = frame
+        self.analysis = self.analyzer.analyze(frame)
+        self.chain.object_results = None
+        self.pending = set(self.chain.due(self.analysis))
+        if 'objects' in self.chain.outputs and not self.objects.is_due():
+            self.pending.discard('objects')
+
+    def finish(self):
+        """Run the scheduled detectors on cached/batched model outputs and log violations"""
+        self.chain.run(self.pending, self.frame, self.analysis)
+        self.results = results = self.chain.results()
+
+        violation_type = handle_violations(self.frame, results, self.alert_system, self.violation_capturer, self.violation_logger)
+        if violation_type:
+            self.chain.scheduler.notify(violation_type)
+        self.frame = self.analysis = self.chain.object_results = None
+
+
+def process_batch(batch, face_models, object_detector):
+    """One worker tick: batched MTCNN and YOLO, then per-stream detectors"""
+    for session, frame in batch:
+        session.begin(frame)
+
+    face_analyses = [session.analysis for session, _ in batch if session.pending & FACE_BOX_DETECTORS]
+    if face_analyses:
+        face_models.detect_faces_batch(face_analyses)
+
+    object_sessions = [session for session, _ in batch if 'objects' in session.pending]
+    if object_sessions:
+        images = [session.objects.prepare_input(session.frame, session.analysis) for session in object_sessions]
+        for session, result in zip(object_sessions, object_detector.predict_batch(images)):
+            session.chain.object_results = [result]
+
+    for session, _ in batch:
+        session.finish()
+
+
+def parse_streams(values):
+    streams = []
+    for value in values or []:
+        stream_id, sep, source = value.partition('=')
+        if not sep:
+            raise ValueError(f"Invalid stream '{value}', expected ID=SOURCE")
+        streams.append({'id': stream_id, 'source': source})
+    return streams
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Proctor several student streams in one process")
+    parser.add_argument('--stream', action='append', metavar='ID=SOURCE',
+                        help="camera index, file or RTSP URL for one student (repeatable, overrides worker.streams)")
+    parser.add_argument('--max-batch-size', type=int, default=None,
+                        help="frames per batched MTCNN/YOLO call (overrides worker.max_batch_size)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    config = load_config()
+    worker_config = config.get('worker') or {}
+    streams = parse_streams(args.stream) or worker_config.get('streams') or []
+    if not streams:
+        raise SystemExit("No streams configured: pass --stream ID=SOURCE or set worker.streams in config.yaml")
+    max_batch_size = max(1, args.max_batch_size or worker_config.get('max_batch_size', 8))
+    stats_interval = worker_config.get('stats_interval', 30)
+
+    # Models are loaded once and shared by every stream
+    face_models = FaceAnalyzer(config)
+    object_detector = ObjectDetector(config)
+    alert_system = AlertSystem(config)
+    sessions = [
+        StreamSession(stream['id'], stream['source'], config, face_models, object_detector.model, alert_system)
+        for stream in streams
+    ]
+
+    pipeline = Pipeline()
+    for session in sessions:
+        session.queue = pipeline.add_queue(f"{session.id}.detect", 1, FrameQueue.DROP_OLDEST)
+        pipeline.add_source(f"{session.id}.capture", session.capture_frame, stop_pipeline=False)
+
+    def request_stop(signum, _frame):
+        print(f"Received signal {signum}, stopping...")
+        pipeline.stop()
+
+    signal.signal(signal.SIGINT, request_stop)
+    signal.signal(signal.SIGTERM, request_stop)
+    metrics.start_publisher(BASE_DIR / 'logs' / 'metrics.json', config.get('metrics', {}).get('publish_interval', 5))
+
+    pipeline.start()
+    print(f"Worker started with {len(sessions)} stream(s), batch size {max_batch_size}")
+    last_stats = time.time()
+    try:
+        while pipeline.running:
+            # Take the newest frame of every stream that produced one since the last tick
+            ready = []
+            for session in sessions:
+                frame = session.queue.get(timeout=0)
+                if frame is not None:
+                    ready.append((session, frame))
+            if not ready:
+                if all(session.finished for session in sessions):
+                    break
+                time.sleep(0.005)
+                continue
+
+            for start in range(0, len(ready), max_batch_size):
+                with metrics.timer('worker.tick'):
+                    process_batch(ready[start:start + max_batch_size], face_models, object_detector)
+            metrics.count('worker.frames', len(ready))
+
+            if stats_interval and time.time() - last_stats >= stats_interval:
+                print(f"Pipeline: {pipeline.format_stats()}")
+                last_stats = time.time()
+    finally:
+        pipeline.stop()
+        pipeline.join()
+        for session in sessions:
+            if session.cap is not None and session.cap.isOpened():
+                session.cap.release()
+            print(f"Stream {session.id}: {len(session.violation_logger.get_violations())} violations logged")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+"""
+Tests for the shared face analysis
+Run from the project root: python -m pytest test_face_analysis.py
+"""
+
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("cv2")
+pytest.importorskip("facenet_pytorch")
+pytest.importorskip("mediapipe")
+
+from src.detection.face_analysis import FaceAnalyzer
+
+CONFIG = {'detection': {'preprocessing': {'enabled': True, 'mtcnn_width': 960, 'max_face_misses': 3}}}
+
+
+class EmptyMTCNN:
+    """MTCNN stand-in that never finds a face and counts its calls"""
+
+    min_face_size = 20
+
+    def __init__(self):
+        self.calls = 0
+
+    def detect(self, images):
+        self.calls += 1
+        return None, None
+
+
+def test_crop_retry_stops_once_the_face_is_gone():
+    analyzer = FaceAnalyzer(CONFIG)
+    analyzer._mtcnn = EmptyMTCNN()
+    analyzer.last_face_box = np.array([900, 500, 960, 560], dtype=np.float32)
+    frame = np.zeros((1080, 1920, 3), dtype=np.uint8)
+
+    analyzer.analyze(frame).faces()
+    assert analyzer._mtcnn.calls == 2   # full frame and crop retry
+    assert analyzer.last_face_box is None
+
+    for _ in range(5):
+        analyzer.analyze(frame).faces()
+    assert analyzer._mtcnn.calls == 7   # full frame only
+
+
+def test_crop_retry_stops_after_max_misses_when_the_box_keeps_coming_back():
+    analyzer = FaceAnalyzer(CONFIG)
+    analyzer._mtcnn = EmptyMTCNN()
+    frame = np.zeros((1080, 1920, 3), dtype=np.uint8)
+
+    for _ in range(6):
+        # e.g. FaceMesh or the face tracker setting the box between MTCNN runs
+        analyzer.last_face_box = np.array([900, 500, 960, 560], dtype=np.float32)
+        analyzer.analyze(frame).faces()
+    assert analyzer._mtcnn.calls == 6 + 3
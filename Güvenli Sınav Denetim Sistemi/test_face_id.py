@@ -0,0 +1,47 @@
+"""
+Tests for exam-restricted face recognition
+Run from the project root: python -m pytest test_face_id.py
+"""
+
+import math
+
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("face_recognition")
+
+from src.detection import face_id
+from src.detection.exam_gallery import ExamGalleryCache
+from src.detection.gallery_matcher import GalleryMatcher
+
+LOCATIONS = [(10, 60, 60, 10), (10, 160, 60, 110)]
+
+
+@pytest.fixture
+def exam_without_encodings(monkeypatch):
+    """Exam whose only registered student has no face encoding in the gallery"""
+    matcher = GalleryMatcher(np.ones((1, 128), dtype=np.float32), ["S001"], ["Enrolled Student"])
+    exam_galleries = ExamGalleryCache()
+    exam_galleries.registrations["EXAM1"] = (frozenset({"S999"}), math.inf, 0)
+    monkeypatch.setattr(face_id.gallery, "matcher", matcher)
+    monkeypatch.setattr(face_id, "exam_galleries", exam_galleries)
+    monkeypatch.setattr(face_id, "_locate", lambda rgb: list(LOCATIONS))
+    assert len(face_id._gallery_for("EXAM1")) == 0
+    return "EXAM1"
+
+
+def test_recognize_student_reports_faces_of_exam_without_encodings(exam_without_encodings):
+    frame = np.zeros((120, 200, 3), dtype=np.uint8)
+    results = face_id.recognize_student(frame, exam_code=exam_without_encodings)
+    assert [(sid, loc) for sid, _, loc, _ in results] == [("unknown", loc) for loc in LOCATIONS]
+
+
+def test_worker_reports_faces_of_exam_without_encodings(exam_without_encodings):
+    worker = face_id.RecognitionWorker()
+    try:
+        frame = np.zeros((120, 200, 3), dtype=np.uint8)
+        _, results = worker.submit(frame, exam_without_encodings, timestamp=1.0).result(timeout=1)
+    finally:
+        worker.stop()
+    assert len(results) == len(LOCATIONS)
+    assert all(sid == "unknown" and confidence == 0.0 for sid, _, _, confidence in results)
@@ -3,6 +3,17 @@ import requests
 from datetime import datetime
 
 API_URL = "http://localhost:8000"
+PAGE_SIZE = 100
+
+# Dashboard tab -> (API section, state list)
+TAB_SECTIONS = {
+    "teachers": ("teachers", "teachers_list"),
+    "exams": ("exams", "exams_list"),
+    "registrations": ("registrations", "registrations_list"),
+    "sessions": ("active_sessions", "sessions_list"),
+    "violations": ("violations", "violations_list"),
+}
+SECTION_LISTS = dict(TAB_SECTIONS.values())
 
 class SystemDashboardState(rx.State):
     """حالة لوحة تحكم النظام"""
@@ -15,57 +26,113 @@ class SystemDashboardState(rx.State):
     active_sessions_count: int = 0
     violations_count: int = 0
     
-    # Detailed Lists
+    # Detailed Lists (one page at a time, newest first)
     teachers_list: list[dict] = []
     exams_list: list[dict] = []
     registrations_list: list[dict] = []
     sessions_list: list[dict] = []
     violations_list: list[dict] = []
     
+    # Pagination: next cursor of each loaded section that has more rows
+    next_cursors: dict[str, int] = {}
+    loaded_sections: list[str] = []
+    
     # UI State
     selected_tab: str = "summary"
     is_loading: bool = False
     error_message: str = ""
     last_update: str = ""
     
+    @rx.var
+    def has_more(self) -> bool:
+        """هل توجد صفحة أخرى للتبويب الحالي"""
+        section = TAB_SECTIONS.get(self.selected_tab)
+        return section is not None and section[0] in self.next_cursors
+    
+    def _fetch(self, **params):
+        """طلب /api/dashboard/stats؛ يعيد JSON أو None عند الخطأ"""
+        try:
+            response = requests.get(f"{API_URL}/api/dashboard/stats", params=params, timeout=10)
+            if response.status_code == 200:
+                return response.json()
+            self.error_message = f"خطأ في تحميل البيانات: {response.status_code}"
+        except Exception as e:
+            self.error_message = f"خطأ في الاتصال: {str(e)}"
+        return None
+    
+    def _load_section(self, section: str, append: bool = False):
+        """تحميل صفحة من قسم واحد (الصفحة الأولى أو التالية)"""
+        params = {"sections": section, "limit": PAGE_SIZE}
+        if append:
+            params["cursor"] = self.next_cursors[section]
+        data = self._fetch(**params)
+        if data is None:
+            return
+        attr = SECTION_LISTS[section]
+        rows = data.get(section, [])
+        setattr(self, attr, (getattr(self, attr) + rows) if append else rows)
+        
+        next_cursors = dict(self.next_cursors)
+        next_cursor = data.get("next_cursors", {}).get(section)
+        if next_cursor is None:
+            next_cursors.pop(section, None)
+        else:
+            next_cursors[section] = next_cursor
+        self.next_cursors = next_cursors
+        if section not in self.loaded_sections:
+            self.loaded_sections = self.loaded_sections + [section]
+    
     def load_dashboard_data(self):
-        """تحميل بيانات لوحة التحكم"""
+        """تحميل بيانات لوحة التحكم: العدادات فقط، ثم قائمة التبويب الحالي"""
         self.is_loading = True
         self.error_message = ""
         
         try:
-            response = requests.get(f"{API_URL}/api/dashboard/stats", timeout=10)
+            data = self._fetch(sections="summary")
+            if data is None:
+                return
             
-            if response.status_code == 200:
-                data = response.json()
-                
-                # Update summary
-                summary = data.get("summary", {})
-                self.teachers_count = summary.get("teachers_count", 0)
-                self.exams_count = summary.get("exams_count", 0)
-                self.students_count = summary.get("students_count", 0)
-                self.registrations_count = summary.get("registrations_count", 0)
-                self.active_sessions_count = summary.get("active_sessions_count", 0)
-                self.violations_count = summary.get("violations_count", 0)
-                
-                # Update lists
-                self.teachers_list = data.get("teachers", [])
-                self.exams_list = data.get("exams", [])
-                self.registrations_list = data.get("registrations", [])
-                self.sessions_list = data.get("active_sessions", [])
-                self.violations_list = data.get("violations", [])
-                
-                self.last_update = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            else:
-                self.error_message = f"خطأ في تحميل البيانات: {response.status_code}"
-        except Exception as e:
-            self.error_message = f"خطأ في الاتصال: {str(e)}"
+            # Update summary
+            summary = data.get("summary", {})
+            self.teachers_count = summary.get("teachers_count", 0)
+            self.exams_count = summary.get("exams_count", 0)
+            self.students_count = summary.get("students_count", 0)
+            self.registrations_count = summary.get("registrations_count", 0)
+            self.active_sessions_count = summary.get("active_sessions_count", 0)
+            self.violations_count = summary.get("violations_count", 0)
+            
+            # Lists are loaded again when their tab is opened
+            self.next_cursors = {}
+            self.loaded_sections = []
+            section = TAB_SECTIONS.get(self.selected_tab)
+            if section is not None:
+                self._load_section(section[0])
+            
+            self.last_update = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        finally:
+            self.is_loading = False
+    
+    def load_more(self):
+        """تحميل الصفحة التالية من قائمة التبويب الحالي"""
+        section = TAB_SECTIONS.get(self.selected_tab)
+        if section is None or section[0] not in self.next_cursors:
+            return
+        self.is_loading = True
+        try:
+            self._load_section(section[0], append=True)
         finally:
             self.is_loading = False
     
     def set_tab(self, tab: str):
-        """تغيير التبويب النشط"""
+        """تغيير التبويب النشط وتحميل قائمته عند أول فتح"""
         self.selected_tab = tab
+        section = TAB_SECTIONS.get(tab)
+        if section is not None and section[0] not in self.loaded_sections:
+            self.is_loading = True
+            try:
+                self._load_section(section[0])
+            finally:
+                self.is_loading = False
 
 
 def system_dashboard_page() -> rx.Component:
@@ -497,6 +564,21 @@ def system_dashboard_page() -> rx.Component:
                     rx.fragment()
                 ),
                 
+                # Next page of the current tab
+                rx.cond(
+                    SystemDashboardState.has_more,
+                    rx.el.div(
+                        rx.button(
+                            "⬇️ تحميل المزيد",
+                            on_click=SystemDashboardState.load_more,
+                            disabled=SystemDashboardState.is_loading,
+                            class_name="bg-blue-500 hover:bg-blue-600 text-white px-4 py-2 rounded-lg"
+                        ),
+                        class_name="flex justify-center mt-4"
+                    ),
+                    rx.fragment()
+                ),
+                
                 class_name="max-w-7xl mx-auto px-4 mb-8"
             ),
             
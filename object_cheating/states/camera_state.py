@@ -253,7 +253,7 @@ class CameraState(ThresholdState):
     
     def _apply_pose_detection(self, frame):
         """Apply MediaPipe pose detection and YOLO object detection"""
-        start_time = time.time()
+        start_time = time.perf_counter()
         
         # Convert to RGB for MediaPipe
         rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
@@ -345,7 +345,7 @@ class CameraState(ThresholdState):
                 "coords": coords
             })
         
-        process_time = time.time() - start_time
+        process_time = time.perf_counter() - start_time
         
         return processed_frame, total_detections, process_time, highest_class, highest_conf, coords, all_detections
     
@@ -550,10 +550,7 @@ class CameraState(ThresholdState):
             
     def _apply_yolo_prediction(self, model, frame, is_model_1=True):
         """Helper method to apply YOLO prediction with current thresholds"""
-        start_time = time.time()
-        
-        # Debug: Print current thresholds
-        print(f"[DEBUG] Model: {'1' if is_model_1 else '2'}, Conf: {self.confidence_threshold}, IOU: {self.iou_threshold}")
+        start_time = time.perf_counter()
         
         # Run prediction
         results = model(
@@ -623,15 +620,7 @@ class CameraState(ThresholdState):
                         cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 2)
         
         # Calculate runtime
-        end_time = time.time()
-        process_time = round((end_time - start_time), 1)
-        
-        # Debug output
-        print(f"[DEBUG] Total detections: {total_detections}, Process time: {process_time}s")
-        if total_detections > 0:
-            print(f"[DEBUG] Highest: {highest_class} ({highest_conf:.2f})")
-        else:
-            print(f"[DEBUG] No detections found. Check if model is loaded correctly.")
+        process_time = round(time.perf_counter() - start_time, 3)
         
         return processed_frame, total_detections, process_time, highest_class, round(highest_conf * 100), coords, all_detections
     
@@ -1203,8 +1192,7 @@ class CameraState(ThresholdState):
                 recognized_names = []
                 try:
                     from object_cheating.states.students_state import StudentsState
-                    if hasattr(StudentsState, 'face_encodings') and StudentsState.face_encodings:
-                        recognized_names = StudentsState.recognize_face(frame, StudentsState.face_encodings, StudentsState.face_names)
+                    recognized_names = StudentsState.recognize_face(frame)
                 except Exception as e:
                     print(f"Face recognition not available: {e}")
 
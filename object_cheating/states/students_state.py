@@ -5,6 +5,7 @@ import os
 import cv2
 import numpy as np
 import base64
+import threading
 try:
     import face_recognition
     FACE_RECOGNITION_AVAILABLE = True
@@ -13,6 +14,115 @@ except ImportError:
     print("Warning: face_recognition library not available. Face recognition features will be disabled.")
 from datetime import datetime
 
+# face_recognition encodings are float64; add_student stores them with tobytes()
+ENCODING_SIZE = 128
+ENCODING_DTYPE = np.float64
+
+
+class FaceGallery:
+    """
+    In-memory gallery of student face encodings, shared with the camera loop.
+    
+    Encodings live in one contiguous (N, 128) matrix loaded straight from
+    the face_encoding BLOBs in students.db. Adding or deleting a student
+    updates a single row instead of re-encoding every photo. Capacity
+    doubles on growth, and a deleted row is replaced by the last one.
+    """
+    
+    def __init__(self):
+        self.lock = threading.Lock()
+        self._buffer = np.zeros((0, ENCODING_SIZE), dtype=ENCODING_DTYPE)
+        self.size = 0
+        self.student_ids = []
+        self.names = []
+        self._rows = {}  # student_id -> row
+    
+    @property
+    def encodings(self):
+        return self._buffer[:self.size]
+    
+    def __len__(self):
+        return self.size
+    
+    @staticmethod
+    def decode(blob):
+        if blob is None or len(blob) != ENCODING_SIZE * np.dtype(ENCODING_DTYPE).itemsize:
+            return None
+        return np.frombuffer(blob, dtype=ENCODING_DTYPE)
+    
+    def load(self, db_path):
+        """Replace the gallery with the encodings stored in the database"""
+        conn = sqlite3.connect(db_path)
+        cursor = conn.cursor()
+        cursor.execute("SELECT student_id, name, face_encoding FROM students WHERE face_encoding IS NOT NULL")
+        rows = [(sid, name, self.decode(blob)) for sid, name, blob in cursor.fetchall()]
+        conn.close()
+        rows = [row for row in rows if row[2] is not None]
+        
+        with self.lock:
+            self._buffer = np.zeros((max(len(rows), 16), ENCODING_SIZE), dtype=ENCODING_DTYPE)
+            if rows:
+                self._buffer[:len(rows)] = np.stack([enc for _, _, enc in rows])
+            self.size = len(rows)
+            self.student_ids = [sid for sid, _, _ in rows]
+            self.names = [name for _, name, _ in rows]
+            self._rows = {sid: i for i, sid in enumerate(self.student_ids)}
+    
+    def add(self, student_id, name, encoding):
+        """Add or replace one student's encoding"""
+        with self.lock:
+            row = self._rows.get(student_id)
+            if row is None:
+                if self.size == len(self._buffer):
+                    grown = np.zeros((max(16, 2 * len(self._buffer)), ENCODING_SIZE), dtype=ENCODING_DTYPE)
+                    grown[:self.size] = self._buffer[:self.size]
+                    self._buffer = grown
+                row = self.size
+                self.size += 1
+                self.student_ids.append(student_id)
+                self.names.append(name)
+                self._rows[student_id] = row
+            self._buffer[row] = encoding
+            self.names[row] = name
+    
+    def remove(self, student_id):
+        with self.lock:
+            row = self._rows.pop(student_id, None)
+            if row is None:
+                return
+            last = self.size - 1
+            if row != last:
+                # Move the last row into the hole
+                self._buffer[row] = self._buffer[last]
+                self.student_ids[row] = self.student_ids[last]
+                self.names[row] = self.names[last]
+                self._rows[self.student_ids[row]] = row
+            self.student_ids.pop()
+            self.names.pop()
+            self.size = last
+    
+    def match(self, encodings, tolerance=0.5):
+        """Name of the nearest student within tolerance for each encoding, or Unknown"""
+        if len(encodings) == 0:
+            return []
+        with self.lock:
+            if self.size == 0:
+                return ["Unknown"] * len(encodings)
+            gallery = self.encodings
+            queries = np.asarray(encodings, dtype=ENCODING_DTYPE)
+            sq = (queries ** 2).sum(axis=1)[:, None] + (gallery ** 2).sum(axis=1)[None, :] - 2.0 * queries @ gallery.T
+            distances = np.sqrt(np.maximum(sq, 0.0))
+            best = distances.argmin(axis=1)
+            return [
+                self.names[j] if distances[i, j] <= tolerance else "Unknown"
+                for i, j in enumerate(best)
+            ]
+
+
+# One gallery per process, shared by every StudentsState and the camera loop
+gallery = FaceGallery()
+
+
 class Student:
     def __init__(self, id: int, name: str, student_id: str, photo_path: str = None, face_encoding = None):
         self.id = id
@@ -30,8 +140,7 @@ class StudentsState(rx.State):
     new_student_id: str = ""
     uploaded_photo: str = ""
     
-    # Face recognition
-    face_encodings: List = []
+    # Face recognition (encodings are kept in the module-level gallery)
     face_names: List[str] = []
     
     # Database path
@@ -78,23 +187,12 @@ class StudentsState(rx.State):
         conn.close()
     
     def load_face_encodings(self):
-        """Load face encodings for recognition"""
+        """Load the stored face encodings into the shared gallery (no photo re-encoding)"""
         if not FACE_RECOGNITION_AVAILABLE:
             return
-            
-        self.face_encodings = []
-        self.face_names = []
         
-        for student in self.students:
-            if student["photo_path"] and os.path.exists(student["photo_path"]):
-                try:
-                    image = face_recognition.load_image_file(student["photo_path"])
-                    encodings = face_recognition.face_encodings(image)
-                    if encodings:
-                        self.face_encodings.append(encodings[0])
-                        self.face_names.append(student["name"])
-                except Exception as e:
-                    print(f"Error loading face encoding for {student['name']}: {e}")
+        gallery.load(self.db_path)
+        self.face_names = list(gallery.names)
     
     @rx.event
     def initialize_students(self):
@@ -102,63 +200,6 @@ class StudentsState(rx.State):
         self.init_database()
         self.load_students()
         self.load_face_encodings()
-        """Initialize SQLite database for students"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        # Create students table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS students (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT NOT NULL,
-                student_id TEXT UNIQUE NOT NULL,
-                photo_path TEXT,
-                face_encoding BLOB,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        conn.commit()
-        conn.close()
-    
-    def load_students(self):
-        """Load students from database"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute("SELECT id, name, student_id, photo_path FROM students")
-        rows = cursor.fetchall()
-        
-        self.students = [
-            {
-                "id": row[0],
-                "name": row[1],
-                "student_id": row[2],
-                "photo_path": row[3]
-            }
-            for row in rows
-        ]
-        
-        conn.close()
-    
-    def load_face_encodings(self):
-        """Load face encodings for recognition"""
-        if not FACE_RECOGNITION_AVAILABLE:
-            return
-            
-        self.face_encodings = []
-        self.face_names = []
-        
-        for student in self.students:
-            if student["photo_path"] and os.path.exists(student["photo_path"]):
-                try:
-                    image = face_recognition.load_image_file(student["photo_path"])
-                    encodings = face_recognition.face_encodings(image)
-                    if encodings:
-                        self.face_encodings.append(encodings[0])
-                        self.face_names.append(student["name"])
-                except Exception as e:
-                    print(f"Error loading face encoding for {student['name']}: {e}")
     
     @rx.event
     async def handle_upload(self, files: list[rx.UploadFile]):
@@ -217,7 +258,7 @@ class StudentsState(rx.State):
                     image = face_recognition.load_image_file(photo_path)
                     encodings = face_recognition.face_encodings(image)
                     if encodings:
-                        face_encoding = encodings[0].tobytes()
+                        face_encoding = encodings[0].astype(ENCODING_DTYPE).tobytes()
                     
             except Exception as e:
                 print(f"Error processing photo: {e}")
@@ -234,14 +275,20 @@ class StudentsState(rx.State):
         conn.commit()
         conn.close()
         
+        # Update the gallery in place
+        if face_encoding is not None:
+            gallery.add(self.new_student_id, self.new_student_name, FaceGallery.decode(face_encoding))
+        else:
+            gallery.remove(self.new_student_id)
+        self.face_names = list(gallery.names)
+        
         # Reset form
         self.new_student_name = ""
         self.new_student_id = ""
         self.uploaded_photo = ""
         
-        # Reload students
+        # Reload the student list (names and photos only)
         self.load_students()
-        self.load_face_encodings()
     
     @rx.event
     def delete_student(self, student_id: int):
@@ -250,13 +297,16 @@ class StudentsState(rx.State):
         cursor = conn.cursor()
         
         # Get photo path before deleting
-        cursor.execute("SELECT photo_path FROM students WHERE id = ?", (student_id,))
+        cursor.execute("SELECT photo_path, student_id FROM students WHERE id = ?", (student_id,))
         row = cursor.fetchone()
         if row and row[0]:
             try:
                 os.remove(row[0])
             except:
                 pass
+        if row:
+            gallery.remove(row[1])
+            self.face_names = list(gallery.names)
         
         # Delete from database
         cursor.execute("DELETE FROM students WHERE id = ?", (student_id,))
@@ -264,14 +314,13 @@ class StudentsState(rx.State):
         conn.commit()
         conn.close()
         
-        # Reload students
+        # Reload the student list (names and photos only)
         self.load_students()
-        self.load_face_encodings()
     
     @staticmethod
-    def recognize_face(frame, face_encodings, face_names):
+    def recognize_face(frame, tolerance=0.5):
         """Recognize faces in frame and return student names"""
-        if not FACE_RECOGNITION_AVAILABLE:
+        if not FACE_RECOGNITION_AVAILABLE or len(gallery) == 0:
             return []
             
         try:
@@ -282,20 +331,8 @@ class StudentsState(rx.State):
             face_locations = face_recognition.face_locations(rgb_frame)
             face_encodings_frame = face_recognition.face_encodings(rgb_frame, face_locations)
             
-            recognized_names = []
-            
-            for face_encoding in face_encodings_frame:
-                # Compare with known faces
-                matches = face_recognition.compare_faces(face_encodings, face_encoding, tolerance=0.5)
-                name = "Unknown"
-                
-                if True in matches:
-                    first_match_index = matches.index(True)
-                    name = face_names[first_match_index]
-                
-                recognized_names.append(name)
-            
-            return recognized_names
+            # Compare all faces with the gallery at once
+            return gallery.match(face_encodings_frame, tolerance=tolerance)
             
         except Exception as e:
             print(f"Face recognition error: {e}")